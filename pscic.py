@@ -19,38 +19,93 @@ try:
     import readline
 except ImportError:
     pass
+import argparse
+import sys
 
 import pyparsing
+import pint
 
 from psciclib import parseexpr
 from psciclib.exceptions import Error
 from psciclib.units import Q_
 from psciclib import unitbridge
-from psciclib.result import Mode
-
-while True:
-    try:
-        expr = input("> ")
-    except EOFError:
-        print()
-        break
-    try:
-        tree = parseexpr.parse(expr)
-    except (Error, pyparsing.ParseException) as e:
-        print(e)
-        continue
-    print(tree)
-    try:
-        val = tree.evaluate()
-    except ValueError as e:
-        print("ValueError:", e)
-        continue
-    # Solve numerically if needed. TODO: some way for the user to provide x0 
-    if val.is_unsolved:
-        val_ = val.nsolve(1.0) # TODO: x0 from user 
-        if val_ is not None:
-            # We found a numerical solution.
-            val = val_
-        del val_
-    # TODO: make format options available somehow
-    print(val.as_string())
+from psciclib import bulkconvert
+from psciclib.result import Mode, DEFAULT_NSOLVE_INTERVAL
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--interval", nargs=2, type=float,
+                           metavar=("LOWER", "UPPER"),
+                           default=DEFAULT_NSOLVE_INTERVAL,
+                           help="interval to search for numerical "
+                           "solutions of equations")
+    argparser.add_argument("--convert", nargs=2, metavar=("FROM", "TO"),
+                           help="convert numbers read from stdin (one "
+                           "per line) from unit FROM to unit TO and exit")
+    argparser.add_argument("--column", type=int, metavar="N",
+                           help="with --convert, read CSV and convert only "
+                           "column N (counting from 0)")
+    argparser.add_argument("--delimiter", default=",",
+                           help="CSV delimiter for --column")
+    argparser.add_argument("--all-digits", action="store_true",
+                           help="print huge integers with all digits "
+                           "instead of abbreviating them")
+    args = argparser.parse_args()
+
+    if args.convert:
+        try:
+            for line in bulkconvert.convert_lines(
+                    (line.rstrip("\n") for line in sys.stdin),
+                    *args.convert, column=args.column,
+                    delimiter=args.delimiter):
+                print(line)
+        except (Error, pint.PintError) as e:
+            sys.exit(str(e))
+        return
+
+    while True:
+        try:
+            expr = input("> ")
+        except EOFError:
+            print()
+            break
+        try:
+            tree = parseexpr.parse(expr)
+        except (Error, pyparsing.ParseException) as e:
+            print(e)
+            continue
+        print(tree)
+        try:
+            val = tree.evaluate(args.interval)
+        except ValueError as e:
+            print("ValueError:", e)
+            continue
+        # Solve numerically if needed.
+        if val.is_unsolved:
+            try:
+                val_ = val.nsolve_interval(*args.interval)
+            except ValueError:
+                val_ = None
+            if val_ is None:
+                val_ = val.nsolve(1.0) # last resort
+            if val_ is not None:
+                # We found a numerical solution.
+                val = val_
+            del val_
+        # TODO: make format options available somehow
+        if args.all_digits and val.has_abbreviated_digits:
+            sys.stdout.write("= ")
+            val.write_digits(sys.stdout)
+            print()
+        else:
+            print(val.as_string())
+        # sympy may still find the exact solutions.
+        if val.upgrade is not None:
+            upgraded = val.upgrade.result()
+            if upgraded is not None:
+                print(upgraded.as_string())
+
+
+if __name__ == "__main__":
+    main()
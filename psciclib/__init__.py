@@ -26,4 +26,7 @@ def init():
     # Set up currencies and get exchange rates from the ECB.
     from . import units
     units._init()
+    # Index the units for UnitMode.to_best.
+    from . import bestunits
+    bestunits.build_index()
 init()
@@ -0,0 +1,151 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Choose a "nice" unit for a quantity.
+
+When the unit registry is set up, we build an index from the
+dimensions of a unit (the exponent vector of a UnitVec) to a ranked
+list of SI units. Finding the best unit of a quantity is then a single
+dictionary lookup plus choosing the SI prefix which puts the magnitude
+between 1 and 1000 (1 and 1000**n for units like m**n, the prefixes
+are powers of 1000).
+
+"""
+
+import math
+
+import sympy
+
+from .units import ureg
+from .unitvec import UnitVec
+from . import unitbridge
+
+
+# Candidates, ordered by preference if several have the same
+# dimensions. Every entry is (name, exponent, rest): the unit is
+# name**exponent * rest, and the prefix is only put on name.
+CANDIDATES = [
+    ("meter", 1, ""),
+    ("gram", 1, ""),
+    ("second", 1, ""),
+    ("ampere", 1, ""),
+    ("kelvin", 1, ""),
+    ("mole", 1, ""),
+    ("candela", 1, ""),
+    ("newton", 1, ""),
+    ("joule", 1, ""),
+    ("watt", 1, ""),
+    ("pascal", 1, ""),
+    ("hertz", 1, ""),
+    ("coulomb", 1, ""),
+    ("volt", 1, ""),
+    ("farad", 1, ""),
+    ("ohm", 1, ""),
+    ("siemens", 1, ""),
+    ("weber", 1, ""),
+    ("tesla", 1, ""),
+    ("henry", 1, ""),
+    ("meter", 2, ""),
+    ("meter", 3, ""),
+    ("meter", 1, "1/second"),
+    ("meter", 1, "1/second**2"),
+    ("gram", 1, "1/meter**3"),
+    ("newton", 1, "meter"),
+]
+
+# Exponents of 10 of the SI prefixes we use, with their names.
+PREFIXES = {
+    -24: "yocto", -21: "zepto", -18: "atto", -15: "femto", -12: "pico",
+    -9: "nano", -6: "micro", -3: "milli", 0: "", 3: "kilo", 6: "mega",
+    9: "giga", 12: "tera", 15: "peta", 18: "exa", 21: "zetta",
+    24: "yotta",
+}
+
+
+class _Candidate:
+    def __init__(self, name, exponent, rest):
+        self.name = name
+        self.exponent = exponent
+        self.rest = ureg.Unit(rest) if rest else ureg.dimensionless
+        self.unit = UnitVec.from_pint(self.unit_with_prefix(0))
+
+    def unit_with_prefix(self, power):
+        unit = ureg.Unit(PREFIXES[power] + self.name)
+        if self.exponent != 1:
+            unit = unit ** self.exponent
+        return unit * self.rest
+
+
+# Dimensions -> list of candidates, best first.
+_index = None
+
+
+def build_index():
+    """(Re)build the index, call after changing the unit registry."""
+    global _index
+    index = {}
+    for name, exponent, rest in CANDIDATES:
+        candidate = _Candidate(name, exponent, rest)
+        index.setdefault(candidate.unit.exps, []).append(candidate)
+    _index = index
+
+
+def candidates(quantity):
+    """Ranked candidate units for the dimensions of quantity."""
+    if _index is None:
+        build_index()
+    if quantity._unit is None:
+        return []
+    return _index.get(quantity._unit.exps, [])
+
+
+def _best_prefix(value, exponent):
+    """Exponent of the prefix that gives 1 <= |value| < 1000**exponent.
+
+    The prefix is raised to the power exponent with the unit, so for
+    m**2 the steps are 10**6: 50000 m**2 stays as it is.
+
+    """
+    try:
+        value = abs(float(value))
+    except TypeError:
+        # Symbolic.
+        return 0
+    if value == 0 or not math.isfinite(value):
+        return 0
+    power = 3 * math.floor(math.log10(value) / (3 * exponent))
+    return min(max(power, min(PREFIXES)), max(PREFIXES))
+
+
+def to_best(quantity):
+    """Convert a unitbridge.Quantity to the best unit.
+
+    Quantities with dimensions we don't have a nice unit for are
+    returned in base units.
+
+    """
+    found = candidates(quantity)
+    if not found:
+        if quantity._unit is None or quantity._unit.is_dimensionless:
+            return quantity
+        q = quantity.quantity.to_base_units()
+        return unitbridge.Quantity(q)
+    best = found[0]
+    value = quantity.magnitude * (quantity._unit.scale / best.unit.scale)
+    power = _best_prefix(value, best.exponent)
+    unit = UnitVec.from_pint(best.unit_with_prefix(power))
+    return unitbridge.Quantity._new(
+        sympy.sympify(value * (best.unit.scale / unit.scale)), unit
+    )
@@ -0,0 +1,224 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Digits of huge integers and of fractions in other bases.
+
+str() of an integer with millions of digits is slow (and refused by
+Python above 4300 digits), and nobody wants to read the result
+anyway. For printing, abbreviate() only computes the leading digits
+(from a float approximation) and the trailing digits (modulo a small
+power of ten). All digits can still be written to a file with
+write_decimal(), which converts divide-and-conquer in chunks that str()
+can handle.
+
+mpmath is slow with huge integers as well, to_mpf() only hands it the
+leading bits of a fraction.
+
+Binary, octal and hexadecimal digits are cheap, Python converts
+integers to those in linear time. fraction_digits() gets all digits
+after the point of a fraction with a single big integer division.
+
+"""
+
+import mpmath
+
+
+# Integers with more digits are abbreviated.
+MAX_DIGITS = 1000
+
+# Digits shown at the start and end of an abbreviated integer.
+EDGE_DIGITS = 20
+
+# Smaller integers are converted by str() in one go.
+_CHUNK_DIGITS = 1000
+
+
+def _leading(n, k):
+    """Return the first k digits of n > 0 and the number of digits."""
+    prec = 4 * k + 64
+    with mpmath.workprec(prec + n.bit_length().bit_length()):
+        # Only the top bits, mpf(n) is slow for huge n.
+        shift = max(0, n.bit_length() - prec)
+        x = mpmath.ldexp(mpmath.mpf(n >> shift), shift)
+        exponent = int(mpmath.floor(mpmath.log10(x)))
+        while True:
+            lead = int(mpmath.floor(x / mpmath.mpf(10)**(exponent - k + 1)))
+            # log10() may be off by one next to a power of ten.
+            if lead >= 10**k:
+                exponent += 1
+            elif lead < 10**(k - 1):
+                exponent -= 1
+            else:
+                break
+    # Right next to a power of ten, the float may be on the wrong side.
+    if lead == 10**(k - 1) and n < 10**exponent:
+        return "9" * k, exponent
+    elif lead == 10**k - 1 and n >= 10**(exponent + 1):
+        return str(10**(k - 1)), exponent + 2
+    return str(lead), exponent + 1
+
+
+# Format specifiers of the bases which are powers of two.
+_FORMATS = {2: "b", 8: "o", 16: "x"}
+
+
+def _bits_per_digit(base):
+    try:
+        _FORMATS[base]
+    except KeyError:
+        raise ValueError("Unsupported base: {}".format(base))
+    return base.bit_length() - 1
+
+
+def digit_count(n):
+    """Number of decimal digits of the integer n (without sign)."""
+    n = abs(int(n))
+    if n.bit_length() <= 3 * _CHUNK_DIGITS:
+        return len(str(n))
+    return _leading(n, 1)[1]
+
+
+def abbreviate(n, max_digits=MAX_DIGITS, edge_digits=EDGE_DIGITS, base=10):
+    """String of n, abbreviated if it has more than max_digits.
+
+    Abbreviated integers look like "123…789 (12345 digits)". base may
+    be 2, 8, 10, or 16, there is no prefix like "0x".
+
+    """
+    n = int(n)
+    if base != 10:
+        return abbreviate_shifted(n, 0, max_digits, edge_digits, base)
+    sign = "-" if n < 0 else ""
+    n = abs(n)
+    # Upper bound of the digit count, no need to be exact here.
+    if n.bit_length() <= 3 * max_digits:
+        s = str(n)
+        if len(s) <= max_digits:
+            return sign + s
+    lead, count = _leading(n, edge_digits)
+    if count <= max_digits:
+        return sign + to_decimal(n)
+    trail = str(n % 10**edge_digits).zfill(edge_digits)
+    return "{}{}…{} ({} digits)".format(sign, lead, trail, count)
+
+
+def abbreviate_shifted(n, shift, max_digits=MAX_DIGITS,
+                       edge_digits=EDGE_DIGITS, base=16):
+    """Like abbreviate(n << shift), for base 2, 8, or 16 only.
+
+    n << shift is never built, so shift may be far too large for that,
+    e.g. the exponent of a huge float.
+
+    """
+    bits = _bits_per_digit(base)
+    n = int(n)
+    sign = "-" if n < 0 else ""
+    n = abs(n)
+    if n == 0:
+        return "0"
+    count = -(-(n.bit_length() + shift) // bits)
+    if count <= max_digits:
+        return sign + to_base(n << shift, base)
+    # The digits are taken from n, the shift only adds zeros.
+    lead_shift = bits * (count - edge_digits) - shift
+    lead = n >> lead_shift if lead_shift >= 0 else n << -lead_shift
+    trail_bits = bits * edge_digits
+    trail = ((n << shift) & ((1 << trail_bits) - 1)
+             if shift < trail_bits else 0)
+    return "{}{}…{} ({} digits)".format(
+        sign, to_base(lead, base),
+        to_base(trail, base).zfill(edge_digits), count
+    )
+
+
+def _pieces(n, powers, i, width):
+    # Yield the digits of n, zero-padded to width (None: no padding),
+    # using powers[j] = 10**(_CHUNK_DIGITS * 2**j) for j <= i.
+    if i < 0:
+        s = str(n)
+        yield s.zfill(width) if width is not None else s
+        return
+    hi, lo = divmod(n, powers[i])
+    lo_width = _CHUNK_DIGITS << i
+    if width is None and hi == 0:
+        yield from _pieces(lo, powers, i - 1, None)
+        return
+    hi_width = width - lo_width if width is not None else None
+    yield from _pieces(hi, powers, i - 1, hi_width)
+    yield from _pieces(lo, powers, i - 1, lo_width)
+
+
+def iter_decimal(n):
+    """Yield the decimal digits of the integer n in pieces."""
+    n = int(n)
+    if n < 0:
+        yield "-"
+        n = -n
+    powers = [10**_CHUNK_DIGITS]
+    while powers[-1] <= n:
+        powers.append(powers[-1] * powers[-1])
+    # The biggest power is > n and not needed.
+    yield from _pieces(n, powers, len(powers) - 2, None)
+
+
+def to_decimal(n):
+    """All decimal digits of the integer n as a string."""
+    return "".join(iter_decimal(n))
+
+
+def write_decimal(n, f):
+    """Write all decimal digits of the integer n to the file f."""
+    for piece in iter_decimal(n):
+        f.write(piece)
+
+
+def to_mpf(numerator, denominator, prec):
+    """numerator/denominator as an mpf with prec bits."""
+    sign = -1 if numerator < 0 else 1
+    numerator = abs(numerator)
+    # A few guard bits, the quotient is truncated.
+    shift = (prec + 8 + denominator.bit_length()
+             - numerator.bit_length())
+    if shift >= 0:
+        man = (numerator << shift) // denominator
+    else:
+        man = (numerator >> -shift) // denominator
+    with mpmath.workprec(prec):
+        return mpmath.ldexp(mpmath.mpf(sign * man), -shift)
+
+
+def to_base(n, base):
+    """All digits of the integer n in base 2, 8, 10, or 16."""
+    if base == 10:
+        return to_decimal(n)
+    _bits_per_digit(base)
+    return format(int(n), _FORMATS[base])
+
+
+def fraction_digits(numerator, denominator, base, digits):
+    """Digits of numerator/denominator >= 0 in base 2, 8, 10, or 16.
+
+    Returns the integer part (an int) and a string of at most digits
+    digits after the point, rounded (half up) and without trailing
+    zeros.
+
+    """
+    scale = base**digits
+    # All digits in one division, rounded.
+    scaled = (2 * numerator * scale + denominator) // (2 * denominator)
+    integer, fraction = divmod(scaled, scale)
+    if fraction == 0:
+        return integer, ""
+    return integer, to_base(fraction, base).zfill(digits).rstrip("0")
@@ -0,0 +1,115 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Bit operations on integers for programmer mode.
+
+Integers have no fixed width, like in Python: ~x is -x - 1, and a
+negative number has infinitely many leading one bits. A word width
+is applied explicitly: unsigned() keeps the lowest bits, signed()
+reads them as two's complement. Rotations always work on a word.
+
+All functions take Python ints or sympy Integers and return Python
+ints. Results with more than logscale.EXACT_DIGITS decimal digits are
+refused, see MAX_BITS.
+
+"""
+
+import sympy
+
+from . import logscale
+
+
+# Word width (bits) if none is given.
+DEFAULT_BITS = 64
+
+# Largest result (bits) of a shift and largest word width, about
+# logscale.EXACT_DIGITS decimal digits.
+MAX_BITS = 3 * logscale.EXACT_DIGITS
+
+
+def _int(x):
+    if isinstance(x, int):
+        return x
+    elif isinstance(x, sympy.Integer):
+        return int(x)
+    raise ValueError("Bit operations need integers, not {}".format(x))
+
+
+def _bits(bits):
+    bits = _int(bits)
+    if bits < 1:
+        raise ValueError("The word width must be at least one bit.")
+    if bits > MAX_BITS:
+        raise ValueError("Word width too large: {} bits".format(bits))
+    return bits
+
+
+def and_(a, b):
+    return _int(a) & _int(b)
+
+
+def or_(a, b):
+    return _int(a) | _int(b)
+
+
+def xor(a, b):
+    return _int(a) ^ _int(b)
+
+
+def not_(a):
+    return ~_int(a)
+
+
+def shift_left(a, n):
+    a, n = _int(a), _int(n)
+    if n < 0:
+        raise ValueError("Negative shift count: {}".format(n))
+    if a and a.bit_length() + n > MAX_BITS:
+        raise ValueError("Shift too large, the result would have more "
+                         "than {} bits.".format(MAX_BITS))
+    return a << n
+
+
+def shift_right(a, n):
+    """Arithmetic shift, i.e., the sign is kept."""
+    n = _int(n)
+    if n < 0:
+        raise ValueError("Negative shift count: {}".format(n))
+    return _int(a) >> n
+
+
+def unsigned(x, bits=DEFAULT_BITS):
+    """The lowest bits of x as an unsigned number."""
+    return _int(x) & ((1 << _bits(bits)) - 1)
+
+
+def signed(x, bits=DEFAULT_BITS):
+    """The lowest bits of x as a two's complement number."""
+    bits = _bits(bits)
+    x = unsigned(x, bits)
+    return x - (1 << bits) if x >> (bits - 1) else x
+
+
+def rotate_left(x, n, bits=DEFAULT_BITS):
+    """Rotate the unsigned word x by n bits to the left."""
+    bits = _bits(bits)
+    x = unsigned(x, bits)
+    n = _int(n) % bits
+    return unsigned((x << n) | (x >> (bits - n)), bits)
+
+
+def rotate_right(x, n, bits=DEFAULT_BITS):
+    """Rotate the unsigned word x by n bits to the right."""
+    return rotate_left(x, -_int(n), bits)
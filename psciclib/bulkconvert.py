@@ -0,0 +1,135 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Convert many numbers from one unit to another at once.
+
+Every unit conversion is linear, y = factor * x + offset (the offset
+is only non-zero for units like °C). We ask pint once for factor and
+offset and then apply them to whole arrays, instead of evaluating a
+"... to unit" expression for every single value.
+
+"""
+
+import io
+import csv
+import itertools
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .units import ureg, Q_
+from .exceptions import DimensionMismatchError
+from . import dimensions
+
+
+# Lines converted in one go when streaming.
+CHUNK_SIZE = 10000
+
+
+def _unit(unit):
+    if isinstance(unit, str):
+        return ureg.parse_units(unit)
+    return unit
+
+
+def conversion(from_unit, to_unit):
+    """Return (factor, offset) so that to = factor * from + offset."""
+    from_unit, to_unit = _unit(from_unit), _unit(to_unit)
+    if from_unit.dimensionality != to_unit.dimensionality:
+        raise DimensionMismatchError(
+            detail="cannot convert {:~} to {:~}".format(from_unit, to_unit)
+        )
+    try:
+        # Exact, if there are no offsets.
+        from_factor, _ = dimensions.base_form(from_unit)
+        to_factor, _ = dimensions.base_form(to_unit)
+        return float(from_factor / to_factor), 0.0
+    except dimensions.Unsupported:
+        pass
+    # The factor from the scales of the units, not as a difference of
+    # two converted values, which would cancel digits next to a large
+    # offset. The offset is pint's, including its rounding errors,
+    # e.g., 0°C = 31.999999999999936°F.
+    from_scale, _ = ureg.get_base_units(from_unit)
+    to_scale, _ = ureg.get_base_units(to_unit)
+    factor = float(from_scale) / float(to_scale)
+    offset = float(Q_(0.0, from_unit).to(to_unit).magnitude)
+    return factor, offset
+
+
+def convert_array(values, from_unit, to_unit):
+    """Convert a sequence or NumPy array of numbers.
+
+    Returns a NumPy array of floats if NumPy is available, otherwise
+    a list.
+
+    """
+    factor, offset = conversion(from_unit, to_unit)
+    if numpy is not None:
+        values = numpy.asarray(values, dtype=float)
+        if offset:
+            return values * factor + offset
+        return values * factor
+    return [float(v) * factor + offset for v in values]
+
+
+def convert_lines(lines, from_unit, to_unit, column=None, delimiter=","):
+    """Convert a stream of text lines, yield the converted lines.
+
+    If column is None, every line must contain one number. Otherwise
+    the lines are read as CSV and only the given column (counting from
+    0) is converted. Lines where the column is not a number (e.g., a
+    header) are passed through unchanged.
+
+    """
+    factor, offset = conversion(from_unit, to_unit)
+    lines = iter(lines)
+    while True:
+        chunk = list(itertools.islice(lines, CHUNK_SIZE))
+        if not chunk:
+            break
+        if column is None:
+            rows = [[line.strip()] for line in chunk]
+            col = 0
+        else:
+            rows = list(csv.reader(chunk, delimiter=delimiter))
+            col = column
+        # Collect the numbers of this chunk and convert them together.
+        positions, numbers = [], []
+        for i, row in enumerate(rows):
+            try:
+                numbers.append(float(row[col]))
+            except (IndexError, ValueError):
+                continue
+            positions.append(i)
+        if numpy is not None:
+            converted = numpy.asarray(numbers) * factor + offset
+        else:
+            converted = [x * factor + offset for x in numbers]
+        for i, value in zip(positions, converted):
+            rows[i][col] = repr(float(value))
+        if column is None:
+            for row in rows:
+                yield row[0]
+        else:
+            buf = io.StringIO()
+            writer = csv.writer(buf, delimiter=delimiter, lineterminator="")
+            for row in rows:
+                writer.writerow(row)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
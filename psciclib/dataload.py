@@ -0,0 +1,80 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Load numeric data from files into expressions.
+
+.npy files are memory-mapped, so even huge files are not copied
+unless an operation needs to. CSV and other text files are parsed by
+NumPy in one go. Vectors become column vectors.
+
+"""
+
+import os
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import unitvec
+from .unitarray import UnitArray
+
+
+def _load_npy(path):
+    array = numpy.load(path, mmap_mode="r")
+    if array.dtype.kind not in "fc":
+        if array.dtype.kind not in "iub":
+            raise ValueError("{} does not contain numbers".format(path))
+        array = array.astype(float)
+    elif array.dtype.itemsize > 16:
+        # Long double, we only do float64 and complex128.
+        array = array.astype(complex if array.dtype.kind == "c" else float)
+    return array
+
+
+def _load_text(path):
+    with open(path) as f:
+        first = f.readline()
+    delimiter = "," if "," in first else None
+    try:
+        return numpy.loadtxt(path, delimiter=delimiter, ndmin=2)
+    except ValueError:
+        # Maybe a header line.
+        return numpy.loadtxt(path, delimiter=delimiter, ndmin=2,
+                             skiprows=1)
+
+
+def load(path):
+    """Load a .npy, .csv or whitespace separated text file.
+
+    Returns a dimensionless unitarray.UnitArray.
+
+    """
+    if numpy is None:
+        raise ValueError("load() needs NumPy")
+    path = os.path.expanduser(path)
+    try:
+        if path.endswith(".npy"):
+            array = _load_npy(path)
+        else:
+            array = _load_text(path)
+    except OSError as e:
+        raise ValueError("Cannot load {}: {}".format(path, e.strerror or e))
+    if array.ndim == 1:
+        array = array.reshape(-1, 1)
+    elif array.ndim != 2:
+        raise ValueError("{} has {} dimensions, only vectors and matrices "
+                         "are supported".format(path, array.ndim))
+    return UnitArray(array, unitvec.DIMENSIONLESS)
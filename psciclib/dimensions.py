@@ -0,0 +1,265 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Dimensional analysis of equations with units.
+
+sympy is slow and often gives up when it has to carry our Quantity
+atoms through solve(). Instead, we check that the equations are
+dimensionally consistent, infer the units of the variables, and
+replace every quantity by its magnitude in base units. The resulting
+equations contain only pure numbers and can be solved quickly. The
+units are reattached to the solutions afterwards.
+
+"""
+
+import functools
+
+import sympy
+import pint
+
+from .exceptions import DimensionMismatchError
+from .units import Q_, ureg
+from . import unitbridge
+
+
+class Unsupported(Exception):
+    """The expression cannot be analyzed, use the slow path."""
+    pass
+
+
+def has_units(expr):
+    return isinstance(expr, sympy.Basic) and expr.has(unitbridge.Quantity)
+
+
+def _rational(f):
+    # pint gives us floats. 15 significant digits undo most rounding
+    # errors of the conversion, e.g., 1ft = 0.30479999999999996m.
+    if isinstance(f, float):
+        return sympy.Rational(format(f, ".15g"))
+    return sympy.sympify(f)
+
+
+@functools.lru_cache(maxsize=1024)
+def base_form(units):
+    """Return (factor, exponents) so that units = factor * base units.
+
+    exponents maps names of base units to rational exponents.
+
+    """
+    try:
+        offset = Q_(0, units).to_base_units().magnitude
+    except pint.errors.PintError:
+        # Offset units in compound units, like 1/°C.
+        raise Unsupported("offset unit in {}".format(units))
+    if offset != 0:
+        # Offset units like °C can't be treated as factors.
+        raise Unsupported("offset unit {}".format(units))
+    items = list(units._units.items())
+    if len(items) > 1 or (items and items[0][1] != 1):
+        # Combine the factors of the single units exactly, this
+        # avoids rounding errors like 1km/h = 0.2777777777777778m/s.
+        factor, exponents = sympy.Integer(1), {}
+        for name, exp in items:
+            exp = sympy.Rational(exp).limit_denominator(1000)
+            f, e = base_form(ureg.Unit(name))
+            factor *= f ** exp
+            exponents = add_dims(exponents, e, exp)
+        return factor, exponents
+    base = Q_(1, units).to_base_units()
+    exponents = {name: sympy.Rational(exp).limit_denominator(1000)
+                 for name, exp in base.unit_items()}
+    return _rational(base.magnitude), exponents
+
+
+def quantity_base_form(q):
+    """Like base_form() for the units of a unitbridge.Quantity."""
+    if q._unit is None:
+        return base_form(q.units)
+    return q._unit.scale, q._unit.base_exponents()
+
+
+@functools.lru_cache(maxsize=None)
+def _is_dimensionless(name):
+    return ureg.Unit(name).dimensionless
+
+
+def physical(exponents):
+    """exponents without the base units that pint treats as
+    dimensionless (radian, steradian, ...), i.e., 1 deg + 1 is fine.
+
+    """
+    return {name: exp for name, exp in exponents.items()
+            if not _is_dimensionless(name)}
+
+
+def to_unit(exponents):
+    """The pint unit for a dict of base unit exponents."""
+    unit = ureg.dimensionless
+    for name, exp in sorted(exponents.items()):
+        if exp != 0:
+            unit = unit * ureg.Unit(name) ** float(exp)
+    return unit
+
+
+def add_dims(a, b, scale=1):
+    """Dimensions of a * b**scale (dicts of base unit exponents)."""
+    retval = dict(a)
+    for name, exp in b.items():
+        retval[name] = retval.get(name, 0) + scale * exp
+    return {name: exp for name, exp in retval.items() if exp != 0}
+
+
+class _Analysis:
+    """Infer the dimensions of all symbols in a set of equations.
+
+    The exponents of the base units of every symbol are unknowns. All
+    terms of a sum, both sides of an equation, and all function
+    arguments have to agree, which gives linear equations for these
+    unknowns.
+
+    """
+
+    def __init__(self, names):
+        self.names = names # all base units that occur
+        self.unknowns = {} # symbol -> {base name: exponent symbol}
+        self.exponent_symbols = []
+        self.constraints = []
+
+    def _fresh(self, label):
+        dims = {}
+        for name in self.names:
+            sym = sympy.Dummy("{}_{}".format(label, name))
+            self.exponent_symbols.append(sym)
+            dims[name] = sym
+        return dims
+
+    def equal(self, a, b):
+        for name in set(a) | set(b):
+            diff = a.get(name, 0) - b.get(name, 0)
+            if diff != 0:
+                self.constraints.append(diff)
+
+    def dims(self, expr):
+        if isinstance(expr, unitbridge.Quantity):
+            if expr.magnitude == 0:
+                # Zero fits any unit.
+                return self._fresh("zero")
+            exponents = physical(quantity_base_form(expr)[1])
+            return add_dims(exponents,
+                             self.dims(sympy.sympify(expr.magnitude)))
+        elif isinstance(expr, sympy.Symbol):
+            if expr not in self.unknowns:
+                self.unknowns[expr] = self._fresh(expr)
+            return self.unknowns[expr]
+        elif isinstance(expr, sympy.MatrixBase):
+            raise Unsupported("matrix")
+        elif not has_units(expr) and not expr.free_symbols:
+            return {}
+        elif isinstance(expr, sympy.Add):
+            dims = [self.dims(arg) for arg in expr.args]
+            for d in dims[1:]:
+                self.equal(dims[0], d)
+            return dims[0]
+        elif isinstance(expr, sympy.Mul):
+            retval = {}
+            for arg in expr.args:
+                retval = add_dims(retval, self.dims(arg))
+            return retval
+        elif isinstance(expr, sympy.Pow):
+            base, exp = expr.args
+            if exp.is_Rational:
+                return add_dims({}, self.dims(base), exp)
+            elif exp.is_Float:
+                return add_dims({}, self.dims(base), sympy.Rational(exp))
+            # Non-numeric exponents only make sense without units.
+            self.equal(self.dims(base), {})
+            self.equal(self.dims(exp), {})
+            return {}
+        elif isinstance(expr, sympy.Function):
+            for arg in expr.args:
+                self.equal(self.dims(arg), {})
+            return {}
+        raise Unsupported(type(expr).__name__)
+
+    def solve(self):
+        """Return a dict symbol -> pint unit, or raise an exception."""
+        subs = {sym: 0 for sym in self.exponent_symbols}
+        if any(c.is_number for c in self.constraints):
+            # Something like m = s.
+            raise DimensionMismatchError()
+        elif self.constraints:
+            solution = sympy.linsolve(self.constraints,
+                                      self.exponent_symbols)
+            if not solution:
+                raise DimensionMismatchError()
+            solution, = solution
+            # Undetermined exponents are zero.
+            subs = {sym: sympy.sympify(val).subs(subs)
+                    for sym, val in zip(self.exponent_symbols, solution)}
+        return {symbol: to_unit({name: subs[sym]
+                                 for name, sym in dims.items()})
+                for symbol, dims in self.unknowns.items()}
+
+
+def strip_units(expr):
+    """Replace every quantity in expr by its magnitude in base units."""
+    if not has_units(expr):
+        return expr
+    mapping = {}
+    for q in expr.atoms(unitbridge.Quantity):
+        factor, _ = quantity_base_form(q)
+        mapping[q] = factor * strip_units(sympy.sympify(q.magnitude))
+    return expr.xreplace(mapping)
+
+
+def nondimensionalize(pairs):
+    """Turn equations with units into equations of pure numbers.
+
+    pairs is a list of (lhs, rhs) tuples. Returns a list of (lhs, rhs)
+    tuples without units, where every quantity has been converted to
+    base units, and a dict mapping every symbol to its pint unit.
+
+    Raises DimensionMismatchError if the equations are not
+    dimensionally consistent and Unsupported if they cannot be
+    analyzed.
+
+    """
+    try:
+        pairs = [(sympy.sympify(lhs), sympy.sympify(rhs))
+                 for lhs, rhs in pairs]
+        names = set()
+        for lhs, rhs in pairs:
+            for side in (lhs, rhs):
+                if isinstance(side, sympy.MatrixBase):
+                    raise Unsupported("matrix")
+                for q in side.atoms(unitbridge.Quantity):
+                    names |= set(quantity_base_form(q)[1])
+        analysis = _Analysis(names)
+        for lhs, rhs in pairs:
+            analysis.equal(analysis.dims(lhs), analysis.dims(rhs))
+        units = analysis.solve()
+        pure = [(strip_units(lhs), strip_units(rhs)) for lhs, rhs in pairs]
+    except (TypeError, ValueError, sympy.SympifyError) as e:
+        if isinstance(e, DimensionMismatchError):
+            raise
+        raise Unsupported(str(e))
+    return pure, units
+
+
+def reattach(value, unit):
+    """Give a solution in base units its unit back."""
+    if unit == ureg.dimensionless:
+        return value
+    return unitbridge.Quantity(Q_(value, unit))
@@ -84,3 +84,22 @@ class VariableLengthRowsError(Error):
     pass
 
 
+
+
+class DimensionMismatchError(Error, ValueError):
+    """Units of an expression do not fit together."""
+    def __init__(self, where=None, detail=None):
+        self.where = where # the offending subexpression
+        self.detail = detail
+
+    def __str__(self):
+        s = "Units do not fit together"
+        if self.detail:
+            s += ": " + self.detail
+        if self.where:
+            s += " in {!s}".format(self.where)
+        return s + "."
+
+    def __repr__(self):
+        return "DimensionMismatchError({!r}, {!r})".format(self.where,
+                                                            self.detail)
@@ -0,0 +1,295 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Persistent on-disk cache for expensive sympy operations.
+
+Results of solve() and simplify() are stored in an sqlite database,
+keyed by the srepr() of the input, the sympy version and our
+SCHEMA_VERSION. sqlite takes care of locking, so several processes can
+share the cache. If the database grows beyond MAX_BYTES, the least
+recently used entries are thrown out.
+
+Every user has a cache in paths.CACHE_DIR. A cache shared by several
+users is only used if it is set up explicitly (see
+paths.SHARED_CACHE_DIR).
+
+Trust model: entries are served as they are, a wrong result in the
+cache is a wrong result for the user. Only share a cache with people
+who you would also let edit your own files. Expressions are stored as
+srepr()-like strings (see _dump()), but to keep a damaged or foreign entry from doing
+more harm than giving a wrong result, they are not read back with
+eval() (which is what sympify() does). _load() rebuilds them from a
+small whitelist of sympy classes, without evaluating them (so
+Pow(Integer(9), Integer(999999999)) stays a harmless power), and
+refuses integers with more than MAX_INT_DIGITS digits. Results that
+cannot be rebuilt like this are not stored.
+
+"""
+
+import os
+import ast
+import time
+import hashlib
+import sqlite3
+import threading
+
+import sympy
+from sympy.core.function import AppliedUndef
+
+from . import paths
+from . import unitbridge
+from . import logscale
+
+
+ENABLED = True
+# Increase whenever we change what is stored, e.g., how simplify()
+# works. Old entries are then simply not found any more.
+SCHEMA_VERSION = 3
+MAX_BYTES = 50 * 1024**2
+FILENAME = "exprcache.sqlite"
+
+# One connection per thread, sqlite connections can't be shared.
+_local = threading.local()
+
+
+def _connect():
+    """Return the connection for this process and thread, or None."""
+    # Connections must not be shared with forked children.
+    if getattr(_local, "pid", None) == os.getpid():
+        return _local.conn
+    for directory in (paths.SHARED_CACHE_DIR, paths.CACHE_DIR):
+        if directory is None or not os.access(directory, os.W_OK):
+            continue
+        try:
+            conn = sqlite3.connect(os.path.join(directory, FILENAME),
+                                   timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache ("
+                         "  key TEXT PRIMARY KEY,"
+                         "  value TEXT NOT NULL,"
+                         "  size INTEGER NOT NULL,"
+                         "  last_used REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_last_used "
+                         "ON cache (last_used)")
+            conn.commit()
+        except sqlite3.Error:
+            # E.g., a database file of another user that we may not
+            # write to.
+            continue
+        _local.conn, _local.pid = conn, os.getpid()
+        return conn
+    return None
+
+
+def close():
+    """Close the connection of this thread, the next use reopens it."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = _local.pid = None
+
+
+def _key(kind, args):
+    s = "\n".join([kind, sympy.__version__, str(SCHEMA_VERSION)]
+                  + [sympy.srepr(arg) for arg in args])
+    return hashlib.sha256(s.encode("utf-8")).hexdigest()
+
+
+# Integers and float precisions (bits) in the cache are limited.
+MAX_INT_DIGITS = 1000
+MAX_FLOAT_PREC = 10000
+
+# Classes that _load() may rebuild. The atoms only get the keyword
+# arguments of their srepr(): assumptions (booleans), dummy_index and
+# precision. All others are created with evaluate=False.
+_ATOMS = {"Symbol", "Dummy", "Integer", "Rational", "Float", "Function",
+          "ImmutableDenseMatrix", "Tuple"}
+_FUNCTIONS = {
+    "Add", "Mul", "Pow", "Equality", "exp", "log", "sin", "cos", "tan",
+    "cot", "asin", "acos", "atan", "acot", "sinh", "cosh", "tanh",
+    "asinh", "acosh", "atanh", "Abs", "sign", "re", "im", "arg",
+    "conjugate", "LambertW", "gamma", "floor", "ceiling", "Max", "Min",
+}
+# Only those may get strings as arguments, all of them just store
+# them as names or digits.
+_STRING_ARGS = {"Symbol", "Dummy", "Float", "Function"}
+
+
+def _int(value):
+    if abs(value) >= 10**MAX_INT_DIGITS:
+        raise ValueError("Integer too big for the cache.")
+    return value
+
+
+def _atom_kwarg(name, key, value):
+    if name in ("Symbol", "Dummy") and isinstance(value, bool):
+        # Assumptions.
+        return True
+    elif name == "Dummy" and key == "dummy_index":
+        return True
+    elif name == "Float" and key == "precision":
+        return 0 < value <= MAX_FLOAT_PREC
+    return False
+
+
+def _build(node, strings=False):
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool):
+            return node.value
+        elif isinstance(node.value, int):
+            return _int(node.value)
+        elif strings and isinstance(node.value, str):
+            return node.value
+    elif (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub)
+          and isinstance(node.operand, (ast.Constant, ast.Name))):
+        # Negative numbers and -oo.
+        return -_build(node.operand)
+    elif isinstance(node, ast.Name):
+        obj = getattr(sympy, node.id, None)
+        if isinstance(obj, (sympy.Atom, sympy.logic.boolalg.BooleanAtom)):
+            # Like pi, oo, or true.
+            return obj
+    elif isinstance(node, ast.List):
+        return [_build(elt) for elt in node.elts]
+    elif isinstance(node, ast.Tuple):
+        return tuple(_build(elt) for elt in node.elts)
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Call):
+        # Undefined function, e.g., Function('f')(Symbol('x')).
+        func = _build(node.func)
+        if isinstance(func, sympy.FunctionClass) and not node.keywords:
+            return func(*(_build(arg) for arg in node.args))
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        name = node.func.id
+        args = [_build(arg, name in _STRING_ARGS) for arg in node.args]
+        kwargs = {kw.arg: _build(kw.value) for kw in node.keywords}
+        if name in _ATOMS and all(_atom_kwarg(name, key, value)
+                                  for key, value in kwargs.items()):
+            if name == "Float" and len(args[0]) > 2 * MAX_INT_DIGITS:
+                raise ValueError("Float too long for the cache.")
+            return getattr(sympy, name)(*args, **kwargs)
+        elif name in _FUNCTIONS and not kwargs:
+            return getattr(sympy, name)(*args, evaluate=False)
+    raise ValueError("Not allowed in the cache: {}".format(ast.dump(node)))
+
+
+def _dump(obj):
+    """Like srepr(), but with the arguments in their internal order.
+
+    srepr() sorts them for printing, so rebuilding its output with
+    evaluate=False would give a different expression.
+
+    """
+    if isinstance(obj, list):
+        return "[{}]".format(", ".join(map(_dump, obj)))
+    elif isinstance(obj, tuple):
+        return "({}{})".format(", ".join(map(_dump, obj)),
+                               "," if len(obj) == 1 else "")
+    elif isinstance(obj, sympy.ImmutableDenseMatrix):
+        return "ImmutableDenseMatrix({})".format(_dump(obj.tolist()))
+    elif isinstance(obj, AppliedUndef):
+        return "{}({})".format(sympy.srepr(obj.func),
+                               ", ".join(map(_dump, obj.args)))
+    elif (not isinstance(obj, sympy.Basic) or obj.is_Atom
+          or type(obj).__name__ not in _FUNCTIONS):
+        return sympy.srepr(obj)
+    return "{}({})".format(type(obj).__name__,
+                           ", ".join(map(_dump, obj.args)))
+
+
+def _load(s):
+    """Rebuild the expression from its srepr() s without eval()."""
+    return _build(ast.parse(s, mode="eval").body)
+
+
+def _cacheable(objs):
+    # Our pint wrapper and LogScale have no srepr() that can be read
+    # back.
+    for obj in objs:
+        if isinstance(obj, (list, tuple)):
+            if not _cacheable(obj):
+                return False
+        elif not isinstance(obj, (sympy.Basic, bool)):
+            return False
+        elif (isinstance(obj, sympy.Basic)
+              and obj.has(unitbridge.Quantity, logscale.LogScale)):
+            return False
+    return True
+
+
+def get(kind, *args):
+    """Look up the result of operation kind on args, None if unknown."""
+    if not ENABLED or not _cacheable(args):
+        return None
+    conn = _connect()
+    if conn is None:
+        return None
+    key = _key(kind, args)
+    try:
+        row = conn.execute("SELECT value FROM cache WHERE key = ?",
+                           (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE cache SET last_used = ? WHERE key = ?",
+                         (time.time(), key))
+    except sqlite3.Error:
+        return None
+    try:
+        return _load(row[0])
+    except Exception:
+        # Garbage in the cache, sympy classes may raise anything on
+        # invalid arguments.
+        return None
+
+
+def put(kind, value, *args):
+    """Store value as result of operation kind on args."""
+    if not ENABLED or not _cacheable(args + (value,)):
+        return
+    dumped = _dump(value)
+    try:
+        if _load(dumped) != value:
+            return
+    except Exception:
+        # Would not be read back.
+        return
+    value = dumped
+    conn = _connect()
+    if conn is None:
+        return
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                         (_key(kind, args), value, len(value), time.time()))
+            _evict(conn)
+    except sqlite3.Error:
+        pass
+
+
+def _evict(conn):
+    total, = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache") \
+                 .fetchone()
+    if total <= MAX_BYTES:
+        return
+    # Throw out the oldest entries until we are at 90% of the maximum.
+    excess = total - int(0.9 * MAX_BYTES)
+    rows = conn.execute("SELECT key, size FROM cache ORDER BY last_used")
+    doomed = []
+    for key, size in rows:
+        if excess <= 0:
+            break
+        doomed.append((key,))
+        excess -= size
+    conn.executemany("DELETE FROM cache WHERE key = ?", doomed)
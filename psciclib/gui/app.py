@@ -24,6 +24,7 @@ from PyQt5 import QtGui
 import pyparsing
 
 from .. import parseexpr
+from .. import solver
 from .. import operators
 from .. import version
 from .. import result
@@ -75,6 +76,9 @@ class MainWindow(QtWidgets.QMainWindow):
                 self.calc_precision, result.UnitMode.none
             )
         self.output_ctrls.changed.connect(output_ctrls_changed)
+        def interval_changed(lower, upper):
+            self.nsolve_interval = (lower, upper)
+        self.output_ctrls.interval_changed.connect(interval_changed)
 
         # Layout for the widgets.
         layout = QtWidgets.QGridLayout()
@@ -89,6 +93,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # The calculation result. ######################################
         self.last_result = None
+        self.nsolve_interval = self.output_ctrls.interval
 
         # Menu bar. ####################################################
         menu_bar = self.menuBar()
@@ -149,7 +154,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.input_widget.set_parsed_field(tree)
         # Evaluate.
         try:
-            val = tree.evaluate()
+            val = tree.evaluate(self.nsolve_interval)
         except ValueError as e:
             self.last_result = e
             self.output_widget.update_output(self.last_result,
@@ -159,10 +164,15 @@ class MainWindow(QtWidgets.QMainWindow):
             from .widgets.exceptionbox import exception_box
             exception_box(e, self)
             return
-        # Solve numerically if needed. TODO: x0 by user!  
+        # Solve numerically if needed.
         if val.is_unsolved:
             try:
-                val_ = val.nsolve(1.0) # todo: x0     
+                try:
+                    val_ = val.nsolve_interval(*self.nsolve_interval)
+                except ValueError:
+                    val_ = None
+                if val_ is None:
+                    val_ = val.nsolve(1.0) # last resort
             except Exception as e:
                 from .widgets.exceptionbox import exception_box
                 exception_box(e, self)
@@ -177,6 +187,28 @@ class MainWindow(QtWidgets.QMainWindow):
             self.last_result, self.calc_exact, self.calc_numeral_system,
             self.calc_precision, unit_mode
         )
+        # sympy may still replace a numerical solution.
+        if val.upgrade is not None:
+            self._watch_upgrade(val, unit_mode)
+
+    def _watch_upgrade(self, val, unit_mode):
+        timer = QtCore.QTimer(self)
+        def check():
+            if not val.upgrade.done():
+                return
+            timer.stop()
+            timer.deleteLater()
+            upgraded = val.upgrade.result()
+            # Only if nothing else was calculated in the meantime.
+            if upgraded is not None and self.last_result is val:
+                self.last_result = upgraded
+                self.output_widget.update_output(
+                    self.last_result, self.calc_exact,
+                    self.calc_numeral_system, self.calc_precision,
+                    unit_mode
+                )
+        timer.timeout.connect(check)
+        timer.start(100)
 
     def calculate(self, expr, unit_mode=result.UnitMode.none):
         # busy-cursor
@@ -227,6 +259,11 @@ class MainWindow(QtWidgets.QMainWindow):
 
 
 def main(argv, __start): # __start is to time startup, it is a debugging tool!
+    # Forking a process with a running Qt event loop (and its threads)
+    # is unsafe. The fork server is started before Qt and has the
+    # solver already imported.
+    solver.use_fork_server()
+
     app = QtWidgets.QApplication(argv)
 
     # TODO: use python packaging facilities to get the path      
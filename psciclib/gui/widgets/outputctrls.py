@@ -16,12 +16,14 @@
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5 import QtWidgets
 
-from ...result import NumeralSystem, Mode
+from ...result import NumeralSystem, Mode, DEFAULT_NSOLVE_INTERVAL
 
 class OutputCtrls(QtWidgets.QWidget):
 
     # exact, float_display
     changed = pyqtSignal(Mode, str, NumeralSystem, int)
+    # lower, upper
+    interval_changed = pyqtSignal(float, float)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -56,6 +58,25 @@ class OutputCtrls(QtWidgets.QWidget):
         self.precision_chooser.setValue(8)
         self.precision_chooser.valueChanged.connect(self.emit_changed)
 
+        # Interval for numerical solutions of equations.
+        self.interval_label = QtWidgets.QLabel("Solve in:")
+        self.interval_choosers = []
+        for value in DEFAULT_NSOLVE_INTERVAL:
+            chooser = QtWidgets.QDoubleSpinBox(parent=self)
+            chooser.setRange(-1e12, 1e12)
+            chooser.setDecimals(3)
+            chooser.setValue(value)
+            chooser.valueChanged.connect(self.emit_interval_changed)
+            self.interval_choosers.append(chooser)
+        self.interval_choosers[0].setToolTip(
+            "Lower end of the interval in which equations are solved "
+            "numerically"
+        )
+        self.interval_choosers[1].setToolTip(
+            "Upper end of the interval in which equations are solved "
+            "numerically"
+        )
+
         # Set layout.
         layout = QtWidgets.QHBoxLayout()
 
@@ -68,11 +89,24 @@ class OutputCtrls(QtWidgets.QWidget):
                                            QtWidgets.QSizePolicy.Fixed)
         layout.addWidget(self.precision_chooser)
 
+        self.interval_label.setSizePolicy(QtWidgets.QSizePolicy.Fixed,
+                                          QtWidgets.QSizePolicy.Fixed)
+        layout.addWidget(self.interval_label)
+        for chooser in self.interval_choosers:
+            layout.addWidget(chooser)
+
         self.setLayout(layout)
 
     def emit_changed(self):
         self.changed.emit(*self.data)
 
+    def emit_interval_changed(self):
+        self.interval_changed.emit(*self.interval)
+
+    @property
+    def interval(self):
+        return tuple(sorted(c.value() for c in self.interval_choosers))
+
     @property
     def data(self):
         return ((Mode.try_exact
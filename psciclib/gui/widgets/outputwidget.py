@@ -13,14 +13,88 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
+import os
+
 from PyQt5.QtCore import Qt, pyqtSignal
-from PyQt5 import QtWidgets
+from PyQt5 import QtCore, QtWidgets
 import pyparsing
 
 from ... import result
 from ... import exceptions
 from ... import units
 from ... import resulthints
+from ... import bignum
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class DigitsWriter(QtCore.QThread):
+    """Write all digits of a result in a background thread.
+
+    target is a file object or a path; a path is opened in the thread
+    and streamed to, and removed again if the writing is cancelled.
+
+    """
+
+    progress = pyqtSignal(int) # percent
+    error = pyqtSignal(str)
+
+    def __init__(self, result, target, parent=None):
+        super().__init__(parent)
+        self.result = result
+        self.target = target
+        self.cancelled = False
+        self._cancel = False
+        r = result.raw_result
+        self._total = bignum.digit_count(r.p)
+        if r.q != 1:
+            self._total += 1 + bignum.digit_count(r.q)
+        self._written = 0
+        self._percent = 0
+
+    def cancel(self):
+        self._cancel = True
+
+    def run(self):
+        try:
+            if isinstance(self.target, str):
+                try:
+                    with open(self.target, "w") as f:
+                        self.result.write_digits(_ProgressFile(f, self))
+                except _Cancelled:
+                    os.remove(self.target)
+                    raise
+            else:
+                self.result.write_digits(_ProgressFile(self.target, self))
+        except _Cancelled:
+            self.cancelled = True
+        except OSError as e:
+            self.error.emit(str(e))
+
+    def _wrote(self, n):
+        if self._cancel:
+            raise _Cancelled()
+        self._written += n
+        percent = min(100 * self._written // self._total, 100)
+        if percent != self._percent:
+            self._percent = percent
+            self.progress.emit(percent)
+
+
+class _ProgressFile:
+    # Only what write_digits() needs.
+    def __init__(self, f, writer):
+        self.f = f
+        self.writer = writer
+
+    def write(self, s):
+        self.writer._wrote(0)
+        self.f.write(s)
+        self.writer._wrote(len(s))
+
 
 class OutputWidget(QtWidgets.QWidget):
 
@@ -55,10 +129,27 @@ class OutputWidget(QtWidgets.QWidget):
         )
         self.hint_field.setAlignment(Qt.AlignLeft | Qt.AlignTop)
 
+        # Huge integers are abbreviated, the digits are available on
+        # request.
+        self.result = None
+        self.copy_digits_button = QtWidgets.QPushButton("Copy all digits")
+        self.copy_digits_button.clicked.connect(self.copy_digits)
+        self.save_digits_button = QtWidgets.QPushButton("Save all digits…")
+        self.save_digits_button.clicked.connect(self.save_digits)
+        digits_layout = QtWidgets.QHBoxLayout()
+        digits_layout.addStretch()
+        digits_layout.addWidget(self.copy_digits_button)
+        digits_layout.addWidget(self.save_digits_button)
+        self.digits_buttons = QtWidgets.QWidget(parent=self)
+        self.digits_buttons.setLayout(digits_layout)
+        self.digits_buttons.hide() # Only show when needed.
+        self._digits_writer = None
+
         # Layout.
         layout = QtWidgets.QVBoxLayout()
 
         layout.addWidget(self.output_scrollarea)
+        layout.addWidget(self.digits_buttons)
         layout.addWidget(self.hint_field)
         self.hint_field.setSizePolicy(QtWidgets.QSizePolicy.Expanding,
                                       QtWidgets.QSizePolicy.Fixed)
@@ -96,7 +187,9 @@ class OutputWidget(QtWidgets.QWidget):
                 text = val.as_html(mode, numeral_system, digits, units)
                 hints = resulthints.get_hints(val.raw_result,
                                               digits,
-                                              val.is_numerical)
+                                              val.is_numerical,
+                                              val.simplify_incomplete,
+                                              val.precision_unstable)
             except ValueError as e:
                 style = "color: red;"
                 text = "Printing error: " + str(e)
@@ -106,6 +199,9 @@ class OutputWidget(QtWidgets.QWidget):
                 from .exceptionbox import exception_box
                 exception_box(e, self)
                 return
+        self.result = val if isinstance(val, result.Result) else None
+        self.digits_buttons.setVisible(self.result is not None
+                                       and self.result.has_abbreviated_digits)
         self.output_field.setWordWrap(ww)
         self.output_field.setText('<span style="{}">'.format(style)
                                   + text
@@ -117,3 +213,44 @@ class OutputWidget(QtWidgets.QWidget):
         else:
             self.hint_field.hide()
             self.hint_field.setText("")
+
+    def copy_digits(self):
+        buf = io.StringIO()
+        def done():
+            QtWidgets.QApplication.clipboard().setText(buf.getvalue())
+        self._write_digits(buf, done)
+
+    def save_digits(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Save all digits", "", "Text files (*.txt);;All files (*)"
+        )
+        if path:
+            self._write_digits(path, lambda: None)
+
+    def _write_digits(self, target, done):
+        # The conversion of a huge number takes a while, do not block
+        # the GUI meanwhile.
+        writer = DigitsWriter(self.result, target, parent=self)
+        dialog = QtWidgets.QProgressDialog("Writing all digits…", "Cancel",
+                                           0, 100, self)
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(500)
+        dialog.canceled.connect(writer.cancel)
+        writer.progress.connect(dialog.setValue)
+        writer.error.connect(
+            lambda msg: QtWidgets.QMessageBox.warning(
+                self, "Save all digits", "Could not write the digits: " + msg
+            )
+        )
+        def finished():
+            dialog.reset()
+            dialog.deleteLater()
+            writer.deleteLater()
+            self.digits_buttons.setEnabled(True)
+            self._digits_writer = None
+            if not writer.cancelled:
+                done()
+        writer.finished.connect(finished)
+        self.digits_buttons.setEnabled(False)
+        self._digits_writer = writer
+        writer.start()
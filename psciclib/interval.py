@@ -0,0 +1,191 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Evaluate sympy numbers with mpmath interval arithmetic.
+
+The result is an interval which is guaranteed to contain the exact
+value. Only a subset of sympy is supported, for everything else we
+give up and return None.
+
+certify() uses this to print numbers with only correct digits: the
+precision is raised until both ends of the interval round to the same
+decimal number.
+
+"""
+
+import collections
+
+import mpmath
+from mpmath import iv
+from mpmath.libmp import to_str, dps_to_prec, mpf_add, mpf_shift
+import sympy
+
+
+class Unsupported(Exception):
+    """The expression cannot be evaluated with interval arithmetic."""
+    pass
+
+
+_functions = {
+    sympy.sin: iv.sin,
+    sympy.cos: iv.cos,
+    sympy.tan: iv.tan,
+    sympy.cot: iv.cot,
+    sympy.sec: iv.sec,
+    sympy.csc: iv.csc,
+    sympy.exp: iv.exp,
+    sympy.log: iv.log,
+    sympy.erf: iv.erf,
+    sympy.gamma: iv.gamma,
+    sympy.loggamma: iv.loggamma,
+    sympy.factorial: iv.factorial,
+}
+
+
+def _eval(expr):
+    if isinstance(expr, sympy.Integer):
+        return iv.mpf(int(expr))
+    elif isinstance(expr, sympy.Rational):
+        return iv.mpf(int(expr.p)) / int(expr.q)
+    elif isinstance(expr, sympy.Float):
+        # The binary value of the float is exact, we only need enough
+        # precision to not round it while converting.
+        with mpmath.workprec(max(expr._prec, iv.prec)):
+            return iv.mpf(mpmath.mpf(expr._mpf_))
+    elif expr is sympy.pi:
+        return iv.pi
+    elif expr is sympy.E:
+        return iv.e
+    elif expr is sympy.I:
+        return iv.mpc(0, 1)
+    elif isinstance(expr, sympy.Add):
+        retval = _eval(expr.args[0])
+        for arg in expr.args[1:]:
+            retval += _eval(arg)
+        return retval
+    elif isinstance(expr, sympy.Mul):
+        retval = _eval(expr.args[0])
+        for arg in expr.args[1:]:
+            retval *= _eval(arg)
+        return retval
+    elif isinstance(expr, sympy.Pow):
+        base, exp = expr.args
+        if isinstance(exp, sympy.Integer):
+            return _eval(base) ** int(exp)
+        elif exp == sympy.S.Half:
+            return iv.sqrt(_eval(base))
+        return _eval(base) ** _eval(exp)
+    elif isinstance(expr, sympy.Function) and expr.func in _functions:
+        return _functions[expr.func](*(_eval(arg) for arg in expr.args))
+    else:
+        raise Unsupported(type(expr).__name__)
+
+
+def evaluate(expr, prec=53):
+    """Return an mpmath interval enclosing expr, or None.
+
+    prec is the working precision in bits. None is returned if expr
+    is not a number or contains unsupported functions.
+
+    """
+    if not isinstance(expr, sympy.Basic) or not expr.is_number:
+        return None
+    # The interval context has no workprec().
+    old_prec = iv.prec
+    iv.prec = prec
+    try:
+        # Unary plus turns constants like iv.pi, which are evaluated
+        # lazily, into intervals at the current precision.
+        return +_eval(expr)
+    except (Unsupported, ValueError, ZeroDivisionError):
+        return None
+    finally:
+        iv.prec = old_prec
+
+
+def _contains_zero(interval):
+    if isinstance(interval, iv.mpc):
+        return 0 in interval.real and 0 in interval.imag
+    else:
+        return 0 in interval
+
+
+def excludes_zero(expr, max_prec=2048):
+    """True if expr is certainly not zero.
+
+    The precision is raised until either zero is excluded or max_prec
+    (in bits) is reached. False means "don't know", not "is zero".
+
+    """
+    prec = 64
+    while prec <= max_prec:
+        interval = evaluate(expr, prec)
+        if interval is None:
+            return False
+        elif not _contains_zero(interval):
+            return True
+        prec *= 4
+    return False
+
+
+Enclosure = collections.namedtuple("Enclosure", ["value", "certified"])
+
+
+def _certified_digits(interval, digits):
+    """The interval rounded to digits as a string, None if ambiguous."""
+    lower, upper = interval._mpi_
+    s = to_str(lower, digits)
+    return s if s == to_str(upper, digits) else None
+
+
+def _float(interval, prec):
+    # Midpoint, computed here as iv.prec is not the precision of the
+    # interval anymore.
+    lower, upper = interval._mpi_
+    mid = mpf_shift(mpf_add(lower, upper, prec + 1), -1)
+    return sympy.Float._new(mid, prec)
+
+
+def certify(expr, digits, max_prec=None):
+    """Evaluate expr such that the first digits digits are correct.
+
+    Returns an Enclosure: value is a sympy number, certified is True
+    if the digits are guaranteed. Starting at a precision just above
+    digits, the precision is doubled until this is the case or
+    max_prec (in bits, default: ten times digits) is exceeded, then
+    certified is False. Returns None if expr cannot be evaluated with
+    interval arithmetic.
+
+    """
+    if max_prec is None:
+        max_prec = dps_to_prec(10 * digits)
+    prec = dps_to_prec(digits) + 10
+    while True:
+        interval = evaluate(expr, prec)
+        if interval is None:
+            return None
+        if isinstance(interval, iv.mpc):
+            parts = (interval.real, interval.imag)
+        else:
+            parts = (interval,)
+        certified = all(_certified_digits(part, digits) is not None
+                        for part in parts)
+        if certified or 2 * prec > max_prec:
+            break
+        prec *= 2
+    value = _float(parts[0], prec)
+    if len(parts) == 2:
+        value += sympy.I * _float(parts[1], prec)
+    return Enclosure(value, certified)
@@ -0,0 +1,352 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Linear algebra with a backend chosen by matrix size and type.
+
+sympy is exact but its determinant etc. are hopeless for bigger float
+matrices. We use
+
+  * sympy for symbolic matrices and small rational matrices,
+  * mpmath for small float matrices, in the precision of the input,
+  * NumPy (LAPACK) for everything bigger (mpmath if NumPy is missing).
+
+The unit of a matrix (all cells must have units of the same
+dimensions) is taken out before the calculation and put back
+afterwards.
+
+"""
+
+import sympy
+import mpmath
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import unitbridge
+from . import unitvec
+from .unitarray import UnitArray
+
+
+# Matrices with at most this many rows use sympy or mpmath.
+SMALL_SIZE = 10
+
+# Precision (decimal digits) of mpmath if the input has no floats.
+DEFAULT_DIGITS = 15
+
+
+class Magnitudes:
+    """Magnitudes of a matrix, its unit, and what kind of numbers it has.
+
+    kind is "symbolic", "exact", "float", or "numpy" (values is a NumPy
+    array then). unit is None if the cells have incompatible units,
+    values is the original sympy matrix in this case.
+
+    """
+
+    def __init__(self, M):
+        if isinstance(M, UnitArray):
+            self.values, self.unit, self.kind = M.array, M.unit, "numpy"
+            self.rows, self.cols = M.shape
+            return
+        M = _ensure_matrix(M)
+        self.rows, self.cols = M.shape
+        self.values, self.unit = _split_units(M)
+        self.kind = _kind(self.values) if self.unit is not None \
+                    else "symbolic"
+
+    def digits(self):
+        precs = [c._prec for c in self.values.atoms(sympy.Float)] \
+                if self.kind != "numpy" else []
+        if not precs:
+            return DEFAULT_DIGITS
+        return mpmath.libmp.prec_to_dps(min(precs))
+
+
+def _ensure_matrix(M):
+    if isinstance(M, unitbridge.Quantity):
+        m = M.magnitude
+        if isinstance(m, sympy.MatrixBase):
+            u = M.replace_magnitude(1)
+            return sympy.ImmutableMatrix(m.rows, m.cols,
+                                         [x * u for x in m])
+        return sympy.ImmutableMatrix([M])
+    elif not isinstance(M, sympy.MatrixBase):
+        return sympy.ImmutableMatrix([M])
+    return M
+
+
+def _split_units(M):
+    """Return (matrix of magnitudes, UnitVec), (M, None) if impossible."""
+    quantities = [x for x in M if isinstance(x, unitbridge.Quantity)]
+    if not quantities:
+        return M, unitvec.DIMENSIONLESS
+    # sympy turns 0 m into 0 when building a matrix, zero fits any
+    # unit.
+    elif any(not isinstance(x, unitbridge.Quantity) and x != 0 for x in M) \
+         or any(q._unit is None for q in quantities):
+        return M, None
+    unit = quantities[0]._unit
+    if any(not q._unit.same_dimensions(unit) for q in quantities):
+        return M, None
+    return (sympy.ImmutableMatrix(M.rows, M.cols,
+                                  [x._converted_magnitude(unit)
+                                   if isinstance(x, unitbridge.Quantity)
+                                   else x
+                                   for x in M]),
+            unit)
+
+
+def _kind(M):
+    if any(not x.is_number for x in M):
+        return "symbolic"
+    elif M.has(sympy.Float):
+        return "float"
+    return "exact"
+
+
+def _backend(*matrices):
+    """Choose the backend for the given Magnitudes objects."""
+    kinds = {m.kind for m in matrices}
+    if "symbolic" in kinds:
+        return _Sympy
+    size = max(max(m.rows, m.cols) for m in matrices)
+    if "numpy" in kinds or size > SMALL_SIZE:
+        return _Numpy if numpy is not None else _Mpmath
+    elif "float" in kinds:
+        return _Mpmath
+    return _Sympy
+
+
+class _Backend:
+    def __init__(self, digits):
+        self.digits = digits
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Sympy(_Backend):
+    """Exact or symbolic."""
+
+    @staticmethod
+    def load(m):
+        if m.kind == "numpy":
+            return sympy.ImmutableMatrix(m.values.tolist())
+        return m.values
+
+    @staticmethod
+    def scalar(x, unit):
+        return _with_unit(x, unit)
+
+    @staticmethod
+    def matrix(X, unit):
+        X = sympy.ImmutableMatrix(X)
+        if unit is None or unit.is_dimensionless:
+            return X * (unit.scale if unit is not None else 1)
+        return sympy.ImmutableMatrix(X.rows, X.cols,
+                                     [_with_unit(x, unit) for x in X])
+
+    det = staticmethod(lambda A: A.det())
+    trace = staticmethod(lambda A: A.trace())
+    transpose = staticmethod(lambda A: A.transpose())
+    inv = staticmethod(lambda A: A.inv())
+    solve = staticmethod(lambda A, b: A.LUsolve(b))
+    eig = staticmethod(lambda A: sympy.ImmutableMatrix(
+        A.eigenvals(multiple=True)))
+    svd = staticmethod(lambda A: sympy.ImmutableMatrix(
+        A.singular_values()))
+    rank = staticmethod(lambda A: sympy.Integer(A.rank()))
+
+
+class _Mpmath(_Backend):
+    """Arbitrary precision floats."""
+
+    def __enter__(self):
+        self._workdps = mpmath.workdps(self.digits)
+        self._workdps.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._workdps.__exit__(*exc)
+
+    def load(self, m):
+        if m.kind == "numpy":
+            return mpmath.matrix(m.values.tolist())
+        prec = mpmath.libmp.dps_to_prec(self.digits)
+        return mpmath.matrix([[m.values[i, j]._to_mpmath(prec)
+                               for j in range(m.cols)]
+                              for i in range(m.rows)])
+
+    def _number(self, x):
+        if isinstance(x, mpmath.mpc):
+            return (sympy.Float(x.real, self.digits)
+                    + sympy.I * sympy.Float(x.imag, self.digits))
+        return sympy.Float(x, self.digits)
+
+    def scalar(self, x, unit):
+        if not isinstance(x, (mpmath.mpf, mpmath.mpc)):
+            return _with_unit(sympy.sympify(x), unit)
+        return _with_unit(self._number(x), unit)
+
+    def matrix(self, X, unit):
+        return _Sympy.matrix([[self._number(X[i, j]) for j in range(X.cols)]
+                              for i in range(X.rows)], unit)
+
+    det = staticmethod(mpmath.det)
+    trace = staticmethod(lambda A: mpmath.fsum(A[i, i]
+                                               for i in range(A.rows)))
+    transpose = staticmethod(lambda A: A.T)
+    inv = staticmethod(lambda A: A ** -1)
+    solve = staticmethod(mpmath.lu_solve)
+
+    @staticmethod
+    def eig(A):
+        E, _ = mpmath.eig(A)
+        return mpmath.matrix(E)
+
+    @staticmethod
+    def svd(A):
+        return mpmath.svd(A, compute_uv=False)
+
+    @staticmethod
+    def rank(A):
+        S = mpmath.svd(A, compute_uv=False)
+        if len(S) == 0:
+            return 0
+        tol = max(A.rows, A.cols) * max(S) * mpmath.eps
+        return sum(1 for s in S if s > tol)
+
+
+class _Numpy(_Backend):
+    """float64 and complex128, using LAPACK."""
+
+    @staticmethod
+    def load(m):
+        if m.kind == "numpy":
+            return m.values
+        values = [complex(x) for x in m.values]
+        array = numpy.array(values).reshape(m.rows, m.cols)
+        if not numpy.iscomplex(array).any():
+            array = array.real.copy()
+        return array
+
+    @staticmethod
+    def scalar(x, unit):
+        x = complex(x)
+        if x.imag == 0:
+            x = sympy.Float(x.real)
+        else:
+            x = sympy.Float(x.real) + sympy.I * sympy.Float(x.imag)
+        return _with_unit(x, unit)
+
+    @staticmethod
+    def matrix(X, unit):
+        if X.ndim == 1:
+            X = X.reshape(-1, 1)
+        return UnitArray(X, unit)
+
+    det = staticmethod(lambda A: numpy.linalg.det(A))
+    trace = staticmethod(lambda A: numpy.trace(A))
+    transpose = staticmethod(lambda A: A.T)
+    inv = staticmethod(lambda A: numpy.linalg.inv(A))
+    solve = staticmethod(lambda A, b: numpy.linalg.solve(A, b))
+    eig = staticmethod(lambda A: numpy.linalg.eigvals(A))
+    svd = staticmethod(lambda A: numpy.linalg.svd(A, compute_uv=False))
+    rank = staticmethod(lambda A: int(numpy.linalg.matrix_rank(A)))
+
+
+def _with_unit(x, unit):
+    if unit is None or unit.is_dimensionless:
+        return x * (unit.scale if unit is not None else 1)
+    return unitbridge.Quantity._new(x, unit)
+
+
+def _run(fn, *args):
+    # Unify the errors of the backends.
+    try:
+        return fn(*args)
+    except ZeroDivisionError as e:
+        raise ValueError("Matrix is singular") from e
+    except Exception as e:
+        if numpy is not None and isinstance(e, numpy.linalg.LinAlgError):
+            raise ValueError(str(e)) from e
+        raise
+
+
+def _square(m, name):
+    if m.rows != m.cols:
+        raise ValueError("{} only works with square matrices".format(name))
+
+
+def _unary(M, name, square, unit_fn, result):
+    m = Magnitudes(M)
+    if square:
+        _square(m, name)
+    unit = unit_fn(m) if m.unit is not None else None
+    with _backend(m)(m.digits()) as backend:
+        value = _run(getattr(backend, name), backend.load(m))
+        return getattr(backend, result)(value, unit)
+
+
+def det(M):
+    """Determinant."""
+    return _unary(M, "det", True, lambda m: m.unit ** m.rows, "scalar")
+
+
+def trace(M):
+    """Sum of the diagonal."""
+    return _unary(M, "trace", True, lambda m: m.unit, "scalar")
+
+
+def transpose(M):
+    return _unary(M, "transpose", False, lambda m: m.unit, "matrix")
+
+
+def inv(M):
+    """Inverse matrix."""
+    return _unary(M, "inv", True, lambda m: m.unit ** -1, "matrix")
+
+
+def eig(M):
+    """Eigenvalues as a column vector."""
+    return _unary(M, "eig", True, lambda m: m.unit, "matrix")
+
+
+def svd(M):
+    """Singular values as a column vector."""
+    return _unary(M, "svd", False, lambda m: m.unit, "matrix")
+
+
+def rank(M):
+    m = Magnitudes(M)
+    with _backend(m)(m.digits()) as backend:
+        return sympy.Integer(int(_run(backend.rank, backend.load(m))))
+
+
+def solve(A, b):
+    """Solution x of A x = b."""
+    a, b = Magnitudes(A), Magnitudes(b)
+    _square(a, "solve")
+    if b.rows != a.rows:
+        raise ValueError("solve: A and b have different numbers of rows")
+    unit = b.unit / a.unit \
+           if a.unit is not None and b.unit is not None else None
+    with _backend(a, b)(min(a.digits(), b.digits())) as backend:
+        x = _run(backend.solve, backend.load(a), backend.load(b))
+        return backend.matrix(x, unit)
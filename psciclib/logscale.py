@@ -0,0 +1,354 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Order of magnitude of results too large to compute.
+
+Something like 9^9^9 has about 370 million decimal digits, computing
+it exactly takes ages and eats all memory. Before an exact power or
+factorial is computed, power() and factorial() estimate its number of
+digits with logarithms (loggamma for the factorial). If there are more
+than EXACT_DIGITS, the result is a LogScale object instead, which only
+knows the decimal logarithm: ≈ 10^(3.7e8).
+
+LogScale objects can be used in further powers and factorials
+(9^9^9^9 is still fine). Products, quotients, sums and differences
+with real numbers are computed with the logarithms as well, as are
+log(). A difference is refused if it is lost in the rounding error of
+the logarithms, e.g., 9^9^9 - 9^9^9 is not known to be zero. With
+symbols sympy keeps them symbolic.
+
+Factorials of floats do not need the exact value at all,
+float_factorial() uses mpmath at the precision of the input.
+
+"""
+
+import sympy
+import mpmath
+
+
+# Results with more decimal digits are not computed exactly. Up to
+# here, powers and factorials take well below a second, the digits of
+# the result are abbreviated for printing (see bignum).
+EXACT_DIGITS = 10**6
+
+# Numbers with a bigger decimal logarithm cannot be represented as a
+# float any more (the exponent alone would be huge), such a LogScale
+# cannot be used as an exponent or in a factorial.
+MAX_LOG10 = 10**100
+
+# Working precision (bits) on top of the integer digits of the result.
+_PREC = 64
+
+
+class LogScale(sympy.Expr):
+    """sign · 10^log10, of which only the decimal logarithm is known."""
+
+    # Our arithmetic below wins over the one of sympy numbers.
+    _op_priority = 20.0
+
+    def __new__(cls, sign, log10):
+        return super().__new__(cls, sympy.Integer(sign), log10)
+
+    @property
+    def sign(self):
+        return self.args[0]
+
+    @property
+    def log10(self):
+        return self.args[1]
+
+    def _eval_evalf(self, prec):
+        # Already as numeric as possible, evalf() returns self.
+        return None
+
+    def __neg__(self):
+        return self.func(-self.sign, self.log10)
+
+    def _eval_power(self, exp):
+        # Also catches 1/x, which sympy writes as x^-1.
+        return power(self, exp)
+
+    def __mul__(self, other):
+        other = _sympify(other)
+        if _is_real_number(other):
+            return multiply(self, other)
+        return super().__mul__(other)
+
+    def __rmul__(self, other):
+        other = _sympify(other)
+        if _is_real_number(other):
+            return multiply(other, self)
+        return super().__rmul__(other)
+
+    def __truediv__(self, other):
+        other = _sympify(other)
+        if _is_real_number(other):
+            return divide(self, other)
+        return super().__truediv__(other)
+
+    def __rtruediv__(self, other):
+        other = _sympify(other)
+        if _is_real_number(other):
+            return divide(other, self)
+        return super().__rtruediv__(other)
+
+    def __add__(self, other):
+        other = _sympify(other)
+        if _is_real_number(other):
+            return add(self, other)
+        return super().__add__(other)
+
+    def __radd__(self, other):
+        other = _sympify(other)
+        if _is_real_number(other):
+            return add(other, self)
+        return super().__radd__(other)
+
+    def __sub__(self, other):
+        other = _sympify(other)
+        if _is_real_number(other):
+            return add(self, -other)
+        return super().__sub__(other)
+
+    def __rsub__(self, other):
+        other = _sympify(other)
+        if _is_real_number(other):
+            return add(other, -self)
+        return super().__rsub__(other)
+
+    def _eval_is_extended_real(self):
+        return True
+
+    def _eval_is_finite(self):
+        return True
+
+    def _eval_is_zero(self):
+        return False
+
+    def _eval_is_extended_positive(self):
+        return self.sign > 0
+
+    def _eval_is_extended_negative(self):
+        return self.sign < 0
+
+    def _sympystr(self, printer):
+        # The last digits of the logarithm are noise for a reader.
+        return "{}10^({})".format("-" if self.sign < 0 else "",
+                                  printer._print(sympy.Float(self.log10,
+                                                             15)))
+
+
+def _sympify(x):
+    # sympy numbers get here as they are, Python numbers do not.
+    if isinstance(x, (int, float)):
+        return sympy.sympify(x)
+    return x
+
+
+def _log10_int(n):
+    """Decimal logarithm of the integer n > 0 at the working precision."""
+    # Only the top bits, mpf(n) is slow for huge n.
+    shift = max(0, n.bit_length() - mpmath.mp.prec - 10)
+    return mpmath.log10(n >> shift) + shift * mpmath.log10(2)
+
+
+def _log10(x):
+    """Decimal logarithm of |x|, x is a LogScale or a nonzero number."""
+    if isinstance(x, LogScale):
+        return x.log10._to_mpmath(mpmath.mp.prec)
+    elif isinstance(x, sympy.Rational):
+        return _log10_int(abs(int(x.p))) - _log10_int(int(x.q))
+    return mpmath.log10(abs(x._to_mpmath(mpmath.mp.prec)))
+
+
+def _value(x):
+    """x as an mpf."""
+    if isinstance(x, LogScale):
+        if abs(x.log10) > MAX_LOG10:
+            raise ValueError("Result too large, not even its logarithm "
+                             "can be calculated.")
+        return int(x.sign) * mpmath.power(10, x.log10._to_mpmath(
+            mpmath.mp.prec
+        ))
+    return x._to_mpmath(mpmath.mp.prec)
+
+
+def _float(x):
+    return sympy.Float._new(x._mpf_, mpmath.mp.prec)
+
+
+def _result(sign, log10):
+    # Can be small again, e.g., (9^9^9)^(1/9^9^9).
+    if abs(log10) <= EXACT_DIGITS:
+        return _float(sign * mpmath.power(10, log10))
+    return LogScale(sign, _float(log10))
+
+
+def _is_real_number(x):
+    return isinstance(x, (LogScale, sympy.Rational, sympy.Float))
+
+
+def power(base, exp):
+    """Return base^exp as LogScale if it has too many digits, else None.
+
+    None means that base^exp can be calculated as usual.
+
+    """
+    if not (_is_real_number(base) and _is_real_number(exp)):
+        return None
+    elif not isinstance(base, LogScale) and not isinstance(exp, LogScale):
+        # Floats are cheap, only exact powers can explode.
+        if (not isinstance(base, sympy.Rational)
+            or not isinstance(exp, sympy.Rational)
+            or base == 0 or abs(base) == 1):
+            return None
+        # Cheap upper bound first, digits < 0.302 bits.
+        bits = max(abs(int(base.p)).bit_length(), int(base.q).bit_length())
+        if abs(exp) * bits <= 3 * EXACT_DIGITS:
+            return None
+    if exp == 0 or base == 0:
+        return None
+    if base.is_negative:
+        # Only integer exponents keep the result real.
+        if not isinstance(exp, sympy.Integer):
+            return None
+        sign = -1 if exp % 2 else 1
+    else:
+        sign = 1
+    exp_bits = abs(int(exp)).bit_length() \
+               if isinstance(exp, sympy.Rational) else 0
+    with mpmath.workprec(_PREC + exp_bits):
+        log10 = _value(exp) * _log10(base)
+        if (isinstance(base, sympy.Rational)
+            and isinstance(exp, sympy.Rational)
+            and abs(log10) <= EXACT_DIGITS):
+            return None
+        return _result(sign, log10)
+
+
+def factorial(n):
+    """Return n! as LogScale if it has too many digits, else None."""
+    if isinstance(n, LogScale):
+        if n.sign < 0:
+            return None
+        with mpmath.workprec(_PREC):
+            x = _value(n)
+            # Stirling, the log of x is known already.
+            log10 = (x * (n.log10._to_mpmath(mpmath.mp.prec)
+                          - mpmath.log10(mpmath.e))
+                     + mpmath.log10(2 * mpmath.pi * x) / 2)
+            return _result(1, log10)
+    elif not isinstance(n, sympy.Integer) or n < 0:
+        return None
+    n = int(n)
+    # Cheap upper bound first, n! < n^n.
+    if n * n.bit_length() <= 3 * EXACT_DIGITS:
+        return None
+    with mpmath.workprec(_PREC + n.bit_length()):
+        log10 = mpmath.loggamma(n + 1) / mpmath.log(10)
+        if log10 <= EXACT_DIGITS:
+            return None
+        return _result(1, log10)
+
+
+def float_factorial(x):
+    """x! for a Float x, at the precision of x.
+
+    A LogScale is returned if not even the exponent of the result
+    would fit into memory.
+
+    """
+    with mpmath.workprec(x._prec):
+        v = x._to_mpmath(mpmath.mp.prec)
+        if v < 0 and v == mpmath.floor(v):
+            # Pole of the gamma function, like sympy.factorial(-1).
+            return sympy.zoo
+        elif v > 0:
+            log10 = mpmath.loggamma(v + 1) / mpmath.log(10)
+            if log10 > MAX_LOG10:
+                return LogScale(1, _float(log10))
+        return _float(mpmath.factorial(v))
+
+
+def _prec(*xs):
+    """Working precision for the logarithms of xs."""
+    return _PREC + max(int(abs(_log10(x))).bit_length() for x in xs)
+
+
+def multiply(a, b):
+    """a · b for real numbers, at least one of them a LogScale."""
+    if a == 0 or b == 0:
+        return sympy.Integer(0)
+    sign = (-1 if a.is_negative else 1) * (-1 if b.is_negative else 1)
+    with mpmath.workprec(_prec(a, b)):
+        return _result(sign, _log10(a) + _log10(b))
+
+
+def divide(a, b):
+    """a / b for real numbers, at least one of them a LogScale."""
+    if b == 0:
+        return sympy.zoo
+    elif a == 0:
+        return sympy.Integer(0)
+    sign = (-1 if a.is_negative else 1) * (-1 if b.is_negative else 1)
+    with mpmath.workprec(_prec(a, b)):
+        return _result(sign, _log10(a) - _log10(b))
+
+
+def add(a, b):
+    """a + b for real numbers, at least one of them a LogScale.
+
+    Raises ValueError if the result is lost in the rounding errors.
+
+    """
+    if a == 0:
+        return b
+    elif b == 0:
+        return a
+    with mpmath.workprec(_prec(a, b)):
+        log_a, log_b = _log10(a), _log10(b)
+        if log_a < log_b:
+            a, b, log_a, log_b = b, a, log_b, log_a
+        sign = -1 if a.is_negative else 1
+        ratio = mpmath.power(10, log_b - log_a)
+        if a.is_negative != b.is_negative:
+            ratio = -ratio
+        # Relative error of the bigger summand, from its logarithm.
+        # Less than three correct digits are not worth showing.
+        prec = min(x.log10._prec for x in (a, b) if isinstance(x, LogScale))
+        error = (abs(log_a) + 1) * mpmath.ldexp(1, -prec)
+        if 1 + ratio <= 1000 * error:
+            raise ValueError("The difference is too small compared to "
+                             "the rounding errors of the numbers, only "
+                             "their orders of magnitude are known.")
+        return _result(sign, log_a + mpmath.log10(1 + ratio))
+
+
+def log(x, base=None):
+    """log(x) (natural or to the given base) of a LogScale x > 0.
+
+    Returns None if this is not the case.
+
+    """
+    if (not isinstance(x, LogScale) or x.sign < 0
+        or (base is not None
+            and not (isinstance(base, (sympy.Rational, sympy.Float))
+                     and base > 0 and base != 1))):
+        return None
+    with mpmath.workprec(x.log10._prec):
+        log10 = x.log10._to_mpmath(mpmath.mp.prec)
+        if base is None:
+            return _float(log10 * mpmath.log(10))
+        return _float(log10 / _log10(base))
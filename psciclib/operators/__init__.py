@@ -15,6 +15,7 @@
 
 import abc
 import collections
+import math
 
 from pyparsing import ParseResults
 import sympy
@@ -24,10 +25,21 @@ from ..exceptions import (UnknownFunctionError,
                           UnknownConstantError,
                           UnknownUnitError,
                           WrongNumberOfArgumentsError,
-                          VariableLengthRowsError)
+                          VariableLengthRowsError,
+                          DimensionMismatchError)
 from .. import units
 from .. import unitbridge
-from ..result import RomanInt, Result, Solutions
+from .. import simplifier
+from .. import truthtest
+from .. import solver
+from .. import dimensions
+from .. import unitarray
+from .. import unitvec
+from .. import uncertainty
+from .. import logscale
+from .. import bitops
+from .. import linalg
+from ..result import RomanInt, Result, Solutions, Equations
 from .functions import FunctionList
 from .constants import ConstantList, _X
 
@@ -45,14 +57,38 @@ class Wrapper:
     def __str__(self):
         return str(self.cmd)
 
-    def evaluate(self):
+    def evaluate(self, nsolve_interval=None):
         """Evaluate.
 
         Return a Result object, which can be used for pretty-printing.
+        If nsolve_interval is given, equations are also solved
+        numerically in that interval while sympy is still busy. If the
+        numerical solutions are returned, Result.upgrade may deliver
+        the symbolic ones later.
 
         """
-        result = self.cmd.evaluate()
-        return Result(self.input_str, self.cmd, result)
+        if hasattr(self.cmd, "nsolve_interval"):
+            self.cmd.nsolve_interval = nsolve_interval
+        # Cheap dimensional analysis first, this finds unit errors
+        # before any expensive work is done.
+        self.cmd.analyze_dimensions()
+        result = unitarray.to_sympy(self.cmd.evaluate())
+        # Uncertainties which were not propagated by montecarlo().
+        result = uncertainty.linear(result)
+        upgrade = getattr(self.cmd, "upgrade", None)
+        if upgrade is not None:
+            upgrade = solver.chain(
+                upgrade,
+                lambda solutions: (None if solutions is None
+                                   else Result(self.input_str, self.cmd,
+                                               solutions))
+            )
+        return Result(self.input_str, self.cmd, result,
+                      is_numerical=getattr(self.cmd, "is_numerical", False),
+                      simplify_incomplete=getattr(self.cmd,
+                                                  "simplify_incomplete",
+                                                  False),
+                      upgrade=upgrade)
 
 
 # Helper classes for primitive literals.
@@ -148,6 +184,25 @@ def process_float(s, loc, toks):
     return PscicFloat(toks[0], 100)
 
 
+def _literal_value(op):
+    """Return the value of a literal number (with sign), else None."""
+    if isinstance(op, sympy.Basic):
+        return op if op.is_Number else None
+    elif isinstance(op, Expression):
+        return _literal_value(op.expr)
+    elif isinstance(op, PlusSign):
+        return _literal_value(op.rhs)
+    elif isinstance(op, MinusSign):
+        value = _literal_value(op.rhs)
+        return None if value is None else -value
+    return None
+
+
+class _NotInteger(Exception):
+    """The integer fast path does not apply, see Operator.int_value()."""
+    pass
+
+
 class Operator(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
@@ -165,6 +220,83 @@ class Operator(metaclass=abc.ABCMeta):
     def __str__(self):
         pass
 
+    # Static dimensional analysis ######################################
+    #
+    # dimensions() infers the dimensions of the result without
+    # evaluating anything: a dict mapping base units to exponents, or
+    # None if they are unknown (variables, offset units, ...).
+    # Inconsistent units raise DimensionMismatchError right away.
+    # Subtrees that are dimensionless for sure do not need units at
+    # all, the quantities in there are evaluated as plain numbers in
+    # base units.
+
+    def _operands(self):
+        """All operands that are analyzed together with this node."""
+        return ()
+
+    def _combine_dimensions(self, dims):
+        """Dimensions of this node, given those of the operands."""
+        return None
+
+    def dimensions(self):
+        """Infer the dimensions of the result, see above."""
+        dims = []
+        complete = True
+        for arg in self._operands():
+            if isinstance(arg, Operator):
+                dims.append(arg.dimensions())
+                complete = complete and arg._complete
+            elif isinstance(arg, sympy.Basic) and arg.is_number:
+                dims.append({})
+            else:
+                dims.append(None)
+            complete = complete and dims[-1] is not None
+        self._dims = self._combine_dimensions(dims)
+        self._complete = complete and self._dims is not None
+        self._integer = self.int_capable and all(
+            getattr(arg, "_integer", False) if isinstance(arg, Operator)
+            else isinstance(arg, sympy.Integer)
+            for arg in self._operands()
+        )
+        return self._dims
+
+    def _mark_dimensionless(self, dimensionless=False):
+        dimensionless = dimensionless or (self._complete and not self._dims)
+        for arg in self._operands():
+            if isinstance(arg, Operator):
+                arg._mark_dimensionless(dimensionless)
+
+    def analyze_dimensions(self):
+        """Check units of the whole tree, must be called on the root."""
+        self.dimensions()
+        self._mark_dimensionless()
+
+    def _mismatch(self, detail, *dims):
+        raise DimensionMismatchError(
+            self, detail.format(*("{:~}".format(dimensions.to_unit(d))
+                                  or "dimensionless"
+                                  for d in dims))
+        )
+
+    # Integer fast path ################################################
+    #
+    # Pure integer arithmetic (integer literals with + - · // ^ ! and
+    # the bit operations) does not need sympy. dimensions() marks
+    # such subtrees, _eval() evaluates them with Python ints using
+    # int_value(). That raises _NotInteger if the result is not an
+    # integer after all (e.g., 2^-1), then evaluate() takes over.
+
+    int_capable = False
+
+    def int_value(self):
+        raise _NotInteger()
+
+    @staticmethod
+    def _int(arg):
+        if isinstance(arg, Operator):
+            return arg.int_value()
+        return int(arg)
+
     @staticmethod
     def _eval(*args):
         """For every arg, return the evaluated form.
@@ -175,6 +307,11 @@ class Operator(metaclass=abc.ABCMeta):
         """
         def my_eval(arg):
             if isinstance(arg, Operator):
+                if getattr(arg, "_integer", False):
+                    try:
+                        return sympy.Integer(arg.int_value())
+                    except _NotInteger:
+                        pass
                 return arg.evaluate()
             elif isinstance(arg, sympy.Float) and arg.is_zero:
                 # If the float is zero, replace by sympy Integer
@@ -193,9 +330,16 @@ class Operator(metaclass=abc.ABCMeta):
         return tuple(my_eval(arg)
                      for arg in args)
 
+    @classmethod
+    def _eval_sympy(cls, *args):
+        """Like _eval(), but numeric matrices are converted to sympy."""
+        return tuple(unitarray.to_sympy(arg) for arg in cls._eval(*args))
+
 
 class Expression(Operator):
     """A whole expression (i.e., no equal sign etc., just a term)."""
+    int_capable = True
+
     def __init__(self, expr):
         self.expr = expr
 
@@ -208,6 +352,15 @@ class Expression(Operator):
     def __str__(self):
         return str(self.expr)
 
+    def _operands(self):
+        return (self.expr,)
+
+    def _combine_dimensions(self, dims):
+        return dims[0]
+
+    def int_value(self):
+        return self._int(self.expr)
+
     def evaluate(self):
         """Evaluate the expression."""
         retval, = self._eval(self.expr)
@@ -230,6 +383,17 @@ class Conversion(Operator):
     def __str__(self):
         return "{!s} to {!s}".format(self.expr, self.to_unit)
 
+    def _operands(self):
+        # The target unit must stay a unit.
+        return (self.expr,)
+
+    def _combine_dimensions(self, dims):
+        to_dims = self.to_unit.dimensions()
+        if (dims[0] is not None and to_dims is not None
+            and dims[0] != to_dims):
+            self._mismatch("cannot convert {} to {}", dims[0], to_dims)
+        return to_dims
+
     def evaluate(self):
         """Evaluate the expression and convert to requested unit."""
         expr, to_unit = self._eval(self.expr, self.to_unit)
@@ -237,7 +401,8 @@ class Conversion(Operator):
         if isinstance(expr, units.Q_):
             expr = unitbridge.Quantity(expr)
         # Convert anything which has no unit to dimensionless.
-        if not isinstance(expr, unitbridge.Quantity):
+        if not isinstance(expr, (unitbridge.Quantity,
+                                 unitarray.UnitArray)):
             expr = unitbridge.Quantity(units.Q_(expr)) # dimensionless
         # Convert units.
         return expr.convert_to(to_unit)
@@ -249,6 +414,11 @@ class Equality(Operator):
     def __init__(self, lhs, rhs):
         self.lhs = lhs
         self.rhs = rhs
+        self.simplify_incomplete = False
+        self.is_numerical = False
+        self.units_mismatch = False
+        self.nsolve_interval = None
+        self.upgrade = None
 
     @classmethod
     def process(cls, s, loc, toks):
@@ -260,33 +430,177 @@ class Equality(Operator):
     def __str__(self):
         return "{!s} = {!s}".format(self.lhs, self.rhs)
 
+    def _operands(self):
+        return (self.lhs, self.rhs)
+
+    def _combine_dimensions(self, dims):
+        lhs, rhs = dims
+        # Not an error, the equality is simply false.
+        self.units_mismatch = (lhs is not None and rhs is not None
+                               and lhs != rhs)
+        return None
+
     def evaluate(self):
         """Try to solve."""
-        lhs, rhs = self._eval(self.lhs, self.rhs)
+        if self.units_mismatch:
+            return False
+        lhs, rhs = self._eval_sympy(self.lhs, self.rhs)
+        if uncertainty.has_uncertainty(lhs) or uncertainty.has_uncertainty(rhs):
+            raise ValueError("Equations with uncertain values are not "
+                             "supported")
         true, false = sympy.S.true, sympy.S.false
+        # Solve an equation of pure numbers and put the units back
+        # afterwards.
+        self.units = {}
+        unit_eq = None
+        if dimensions.has_units(lhs) or dimensions.has_units(rhs):
+            try:
+                ((lhs, rhs),), self.units = \
+                    dimensions.nondimensionalize([(lhs, rhs)])
+                unit_eq = sympy.Eq(*self._eval_sympy(self.lhs, self.rhs),
+                                   evaluate=False)
+            except DimensionMismatchError:
+                return False
+            except dimensions.Unsupported:
+                pass
         try:
             eq = sympy.Eq(lhs, rhs)
             # Check if we can already say the expression is true or false.
             if eq is true or eq is false:
                 return bool(eq)
-            # Try harder.
-            eq = eq.simplify()
-            if eq is true or eq is false:
-                return bool(eq)
+            # Cheap tests before the expensive simplify().
+            truth = truthtest.decide(lhs, rhs)
+            if truth == truthtest.Truth.true:
+                return True
+            elif truth == truthtest.Truth.false:
+                return False
+            elif truth == truthtest.Truth.unknown:
+                # Try harder.
+                eq, complete = simplifier.simplify(eq)
+                self.simplify_incomplete = not complete
+                if eq is true or eq is false:
+                    return bool(eq)
         except ValueError:
             # Units don't fit, not equal.
             return False
-        # Try to solve for x.
-        try:
-            solutions = sympy.solve(eq, _X)
-        except NotImplementedError:
-            solutions = []
+        # Solve for x if it is there, otherwise for the first variable.
+        if _X in eq.free_symbols or not eq.free_symbols:
+            var = _X
+        else:
+            var = min(eq.free_symbols, key=str)
+        # Polynomials with float coefficients are solved numerically,
+        # sympy would only give us floats (or RootOf objects) anyway.
+        poly = solver.as_polynomial(eq, var)
+        if poly is not None and solver.wants_numeric(poly):
+            solutions = solver.polyroots(poly)
+            if solutions is not None:
+                self.is_numerical = True
+                return self._solutions(var, solutions)
+        # Try to solve for var. Race against a numerical solver, as
+        # sympy may take forever.
+        interval = self.nsolve_interval
+        if eq.has(unitbridge.Quantity):
+            # Can't send those to another process.
+            interval = None
+        solutions, self.is_numerical, upgrade = solver.race_solve(
+            eq, var, interval
+        )
+        if upgrade is not None:
+            self.upgrade = solver.chain(
+                upgrade,
+                lambda solutions: (self._solutions(var, solutions)
+                                   if solutions else None)
+            )
         if not solutions:
             # Attempting a numerical solution must be initiated later
             # by the UI, as it needs parameters to fiddle with it.
-            return eq
+            return eq if unit_eq is None else unit_eq
         else:
-            return Solutions(_X, solutions)
+            return self._solutions(var, solutions)
+
+    def _solutions(self, var, solutions):
+        if var in self.units:
+            solutions = [dimensions.reattach(sol, self.units[var])
+                         for sol in solutions]
+        return Solutions(var, solutions)
+
+
+class EquationSystem(Operator):
+    """<equality>; <equality>; ..., solved for all variables."""
+
+    def __init__(self, equalities):
+        self.equalities = equalities
+        self.simplify_incomplete = False
+        self.is_numerical = False
+
+    @classmethod
+    def process(cls, s, loc, toks):
+        if len(toks) < 2:
+            raise ValueError("BUG: Something went wrong with the parsing.")
+        # [<equality>, <equality>, ...]
+        return cls(list(toks))
+
+    def __str__(self):
+        return "; ".join(str(equality) for equality in self.equalities)
+
+    def _operands(self):
+        return tuple(self.equalities)
+
+    def evaluate(self):
+        """Try to solve."""
+        if any(equality.units_mismatch for equality in self.equalities):
+            return False
+        true, false = sympy.S.true, sympy.S.false
+        pairs = [self._eval_sympy(equality.lhs, equality.rhs)
+                 for equality in self.equalities]
+        if any(uncertainty.has_uncertainty(side)
+               for pair in pairs for side in pair):
+            raise ValueError("Equations with uncertain values are not "
+                             "supported")
+        # Solve equations of pure numbers, see Equality.evaluate().
+        units = {}
+        unit_eqs = None
+        if any(dimensions.has_units(side) for pair in pairs for side in pair):
+            try:
+                pure, units = dimensions.nondimensionalize(pairs)
+                unit_eqs = [sympy.Eq(lhs, rhs, evaluate=False)
+                            for lhs, rhs in pairs]
+                pairs = pure
+            except DimensionMismatchError:
+                return False
+            except dimensions.Unsupported:
+                pass
+        eqs = []
+        for lhs, rhs in pairs:
+            try:
+                eq = sympy.Eq(lhs, rhs)
+            except ValueError:
+                # Units don't fit, not equal.
+                return False
+            if eq is true:
+                continue
+            elif eq is false:
+                return False
+            # Identities do not constrain anything.
+            truth = truthtest.decide(lhs, rhs)
+            if truth == truthtest.Truth.true:
+                continue
+            elif truth == truthtest.Truth.false:
+                return False
+            eqs.append(eq)
+        if not eqs:
+            return True
+        syms = sorted(set().union(*(eq.free_symbols for eq in eqs)),
+                      key=str)
+        variables, solutions, self.is_numerical = \
+            solver.solve_system(eqs, syms)
+        if not variables:
+            return Equations(eqs if unit_eqs is None else unit_eqs)
+        if units:
+            solutions = [tuple(dimensions.reattach(val, units[var])
+                               for var, val in zip(variables, sol))
+                         for sol in solutions]
+        return Solutions(variables, solutions)
 
 
 class SymbolOperator(Operator):
@@ -301,6 +615,9 @@ class InfixSymbol(SymbolOperator):
     def __str__(self):
         return "({!s} {} {!s})".format(self.lhs, self.symbol, self.rhs)
 
+    def _operands(self):
+        return (self.lhs, self.rhs)
+
 
 class InfixLeftSymbol(InfixSymbol):
     @classmethod
@@ -317,6 +634,13 @@ class InfixLeftSymbol(InfixSymbol):
             "/": Divide,
             "÷": Divide,
             "//": IntDivide,
+            "<<": ShiftLeft,
+            ">>": ShiftRight,
+            "&": BitAnd,
+            "and": BitAnd,
+            "xor": BitXor,
+            "|": BitOr,
+            "or": BitOr,
         }
         symb_set = set(symbols.keys())
         # reverse, as append is faster than insert(0)
@@ -345,6 +669,16 @@ class InfixLeftSymbol(InfixSymbol):
 
 class Plus(InfixLeftSymbol):
     symbol = "+"
+    int_capable = True
+
+    def _combine_dimensions(self, dims):
+        lhs, rhs = dims
+        if lhs is not None and rhs is not None and lhs != rhs:
+            self._mismatch("cannot add {} and {}", lhs, rhs)
+        return lhs if lhs is not None else rhs
+
+    def int_value(self):
+        return self._int(self.lhs) + self._int(self.rhs)
 
     def evaluate(self):
         lhs, rhs = self._eval(self.lhs, self.rhs)
@@ -353,6 +687,16 @@ class Plus(InfixLeftSymbol):
 
 class Minus(InfixLeftSymbol):
     symbol = "-" # Leave at ASCII to save space!
+    int_capable = True
+
+    def _combine_dimensions(self, dims):
+        lhs, rhs = dims
+        if lhs is not None and rhs is not None and lhs != rhs:
+            self._mismatch("cannot add {} and {}", lhs, rhs)
+        return lhs if lhs is not None else rhs
+
+    def int_value(self):
+        return self._int(self.lhs) - self._int(self.rhs)
 
     def evaluate(self):
         lhs, rhs = self._eval(self.lhs, self.rhs)
@@ -361,6 +705,16 @@ class Minus(InfixLeftSymbol):
 
 class Times(InfixLeftSymbol):
     symbol = "·"
+    int_capable = True
+
+    def _combine_dimensions(self, dims):
+        lhs, rhs = dims
+        if lhs is None or rhs is None:
+            return None
+        return dimensions.add_dims(lhs, rhs)
+
+    def int_value(self):
+        return self._int(self.lhs) * self._int(self.rhs)
 
     def evaluate(self):
         lhs, rhs = self._eval(self.lhs, self.rhs)
@@ -370,6 +724,12 @@ class Times(InfixLeftSymbol):
 class Divide(InfixLeftSymbol):
     symbol = "÷"
 
+    def _combine_dimensions(self, dims):
+        lhs, rhs = dims
+        if lhs is None or rhs is None:
+            return None
+        return dimensions.add_dims(lhs, rhs, -1)
+
     def evaluate(self):
         lhs, rhs = self._eval(self.lhs, self.rhs)
         return lhs / rhs
@@ -377,14 +737,73 @@ class Divide(InfixLeftSymbol):
 
 class IntDivide(InfixLeftSymbol):
     symbol = "//"
+    int_capable = True
+
+    def _combine_dimensions(self, dims):
+        lhs, rhs = dims
+        if lhs is None or rhs is None:
+            return None
+        return dimensions.add_dims(lhs, rhs, -1)
+
+    def int_value(self):
+        rhs = self._int(self.rhs)
+        if rhs == 0:
+            # sympy knows what to do (z∞).
+            raise _NotInteger()
+        return self._int(self.lhs) // rhs
 
     def evaluate(self):
-        lhs, rhs = self._eval(self.lhs, self.rhs)
+        lhs, rhs = self._eval_sympy(self.lhs, self.rhs)
         return sympy.floor(lhs / rhs)
 
 
+class _BitOperation(InfixLeftSymbol):
+    """Base class of the binary bit operations, see bitops."""
+    int_capable = True
+
+    def _combine_dimensions(self, dims):
+        for d in dims:
+            if d:
+                self._mismatch("bit operations need dimensionless "
+                               "integers, not {}", d)
+        return {}
+
+    def int_value(self):
+        return self.fn(self._int(self.lhs), self._int(self.rhs))
+
+    def evaluate(self):
+        lhs, rhs = self._eval_sympy(self.lhs, self.rhs)
+        return sympy.Integer(self.fn(lhs, rhs))
+
+
+class ShiftLeft(_BitOperation):
+    symbol = "<<"
+    fn = staticmethod(bitops.shift_left)
+
+
+class ShiftRight(_BitOperation):
+    symbol = ">>"
+    fn = staticmethod(bitops.shift_right)
+
+
+class BitAnd(_BitOperation):
+    symbol = "&"
+    fn = staticmethod(bitops.and_)
+
+
+class BitXor(_BitOperation):
+    symbol = "xor"
+    fn = staticmethod(bitops.xor)
+
+
+class BitOr(_BitOperation):
+    symbol = "|"
+    fn = staticmethod(bitops.or_)
+
+
 class Exponent(InfixSymbol):
     symbol = "^"
+    int_capable = True
 
     @classmethod
     def process(cls, s, loc, toks):
@@ -405,8 +824,32 @@ class Exponent(InfixSymbol):
             rhs = toks[0][2]
         return cls(lhs, rhs)
 
+    def _combine_dimensions(self, dims):
+        base, exp = dims
+        if exp:
+            self._mismatch("exponent must be dimensionless, not {}", exp)
+        if base is None or not base:
+            return base
+        # Units in the base need a number as exponent.
+        value = _literal_value(self.rhs)
+        if value is None:
+            return None
+        return dimensions.add_dims({}, base, value)
+
+    def int_value(self):
+        lhs, rhs = self._int(self.lhs), self._int(self.rhs)
+        if (rhs < 0
+            or logscale.power(sympy.Integer(lhs),
+                              sympy.Integer(rhs)) is not None):
+            raise _NotInteger()
+        return lhs ** rhs
+
     def evaluate(self):
         lhs, rhs = self._eval(self.lhs, self.rhs)
+        # Do not even try to compute astronomically large numbers.
+        estimate = logscale.power(lhs, rhs)
+        if estimate is not None:
+            return estimate
         return lhs ** rhs
 
 
@@ -417,6 +860,9 @@ class PostfixSymbol(SymbolOperator):
     def __str__(self):
         return "({!s}{})".format(self.lhs, self.symbol)
 
+    def _operands(self):
+        return (self.lhs,)
+
     @classmethod
     def process(cls, s, loc, toks):
         l = list(reversed(toks[0]))# reverse, as append is faster than insert(0)
@@ -432,9 +878,27 @@ class PostfixSymbol(SymbolOperator):
 
 class Factorial(PostfixSymbol):
     symbol = "!"
+    int_capable = True
+
+    def _combine_dimensions(self, dims):
+        if dims[0]:
+            self._mismatch("factorial of {}", dims[0])
+        return {}
+
+    def int_value(self):
+        lhs = self._int(self.lhs)
+        if lhs < 0 or logscale.factorial(sympy.Integer(lhs)) is not None:
+            raise _NotInteger()
+        return math.factorial(lhs)
 
     def evaluate(self):
-        lhs, = self._eval(self.lhs)
+        lhs, = self._eval_sympy(self.lhs)
+        if isinstance(lhs, sympy.Float):
+            # Inexact anyway, no need for sympy's exact machinery.
+            return logscale.float_factorial(lhs)
+        estimate = logscale.factorial(lhs)
+        if estimate is not None:
+            return estimate
         return sympy.factorial(lhs)
 
 
@@ -445,6 +909,12 @@ class PrefixSymbol(SymbolOperator):
     def __str__(self):
         return "({}{!s})".format(self.symbol, self.rhs)
 
+    def _operands(self):
+        return (self.rhs,)
+
+    def _combine_dimensions(self, dims):
+        return dims[0]
+
     @classmethod
     def process(cls, s, loc, toks):
         op, rhs = toks[0]
@@ -452,6 +922,8 @@ class PrefixSymbol(SymbolOperator):
             obj = PlusSign(rhs)
         elif op in {"-", "\u2212"}:
             obj = MinusSign(rhs)
+        elif op in {"~", "not"}:
+            obj = BitNot(rhs)
         else:
             raise ValueError("Unknown prefix operator: {}".format(sign))
         return ParseResults([obj])
@@ -459,6 +931,10 @@ class PrefixSymbol(SymbolOperator):
 
 class MinusSign(PrefixSymbol):
     symbol = "-" # Leave at ASCII to save space!
+    int_capable = True
+
+    def int_value(self):
+        return -self._int(self.rhs)
 
     def evaluate(self):
         rhs, = self._eval(self.rhs)
@@ -467,11 +943,34 @@ class MinusSign(PrefixSymbol):
 
 class PlusSign(PrefixSymbol):
     symbol = "+"
+    int_capable = True
+
+    def int_value(self):
+        return self._int(self.rhs)
 
     def evaluate(self):
         rhs, = self._eval(self.rhs)
         return rhs
 
+
+class BitNot(PrefixSymbol):
+    symbol = "~"
+    int_capable = True
+
+    def _combine_dimensions(self, dims):
+        if dims[0]:
+            self._mismatch("bit operations need dimensionless integers, "
+                           "not {}", dims[0])
+        return {}
+
+    def int_value(self):
+        return bitops.not_(self._int(self.rhs))
+
+    def evaluate(self):
+        rhs, = self._eval_sympy(self.rhs)
+        return sympy.Integer(bitops.not_(rhs))
+
+
 class Function(Operator):
 
     @classmethod
@@ -496,12 +995,48 @@ class Function(Operator):
 
     def __str__(self):
         return "{}({})".format(self.fn_s,
-                               ", ".join(str(arg) for arg in self.args))
+                               ", ".join('"{}"'.format(arg)
+                                         if isinstance(arg, str)
+                                         else str(arg)
+                                         for arg in self.args))
+
+    def _operands(self):
+        return tuple(self.args)
+
+    def _combine_dimensions(self, dims):
+        unit_dims = []
+        for arg_dims, argspec in zip(dims, self.argspec):
+            if argspec.unit:
+                unit_dims.append(arg_dims)
+            elif arg_dims:
+                self._mismatch("{}() needs a dimensionless argument, "
+                               "not {{}}".format(self.fn_s), arg_dims)
+        if not unit_dims:
+            return {}
+        power = FunctionList.unit_power.get(self.fn_s)
+        if power is None or len(unit_dims) != 1 or unit_dims[0] is None:
+            return None
+        return dimensions.add_dims({}, unit_dims[0], power)
 
     def evaluate(self):
-        args = self._eval(*self.args)
+        if self.fn_s in FunctionList.array_aware:
+            args = self._eval(*self.args)
+        else:
+            args = self._eval_sympy(*self.args)
         args2 = []
         for arg, argspec in zip(args, self.argspec):
+            if isinstance(arg, str):
+                if not argspec.string:
+                    raise ValueError(
+                        "Function {} does not accept strings."
+                        "".format(self.fn_s)
+                    )
+                args2.append(arg)
+                continue
+            elif argspec.string and not (argspec.scalar or argspec.matrix):
+                raise ValueError(
+                    "Function {} needs a quoted string.".format(self.fn_s)
+                )
             if isinstance(arg, unitbridge.Quantity):
                 if not argspec.unit:
                     arg = arg.convert_to("dimensionless").magnitude
@@ -511,7 +1046,8 @@ class Function(Operator):
             else:
                 argtest = arg
             # Check matrix/scalar.
-            if isinstance(argtest, sympy.ImmutableMatrix):
+            if isinstance(argtest, (sympy.ImmutableMatrix,
+                                    unitarray.UnitArray)):
                 if not argspec.matrix:
                     raise ValueError(
                         "Function {} does not accept matrices "
@@ -544,14 +1080,52 @@ class Constant(Operator):
                 raise UnknownConstantError(toks[0])
         return cls(name, value)
 
+    @classmethod
+    def process_uncertain(cls, s, loc, toks):
+        # A constant with its uncertainty, e.g., G±.
+        try:
+            name = ConstantList.canonical_name[toks[0]]
+            value = ConstantList.uncertain[toks[0]]
+        except KeyError:
+            raise UnknownConstantError(toks[0] + "±")
+        return cls(name + "±", value)
+
     def __init__(self, name, value):
         self.name = name
         self.value = value
+        self.strip_unit = False
 
     def __str__(self):
         return str(self.name)
 
+    def dimensions(self):
+        if isinstance(self.value, unitbridge.Quantity):
+            try:
+                exponents = dimensions.quantity_base_form(self.value)[1]
+            except dimensions.Unsupported:
+                self._dims = None
+            else:
+                self._dims = dimensions.physical(exponents)
+                # Angles are dimensionless, but 30 deg + 1 rad should
+                # stay in degrees: not complete, the unit is kept.
+                self._complete = len(self._dims) == len(exponents)
+                return self._dims
+        elif isinstance(self.value, sympy.Basic) and self.value.is_number:
+            self._dims = {}
+        else:
+            # Variables.
+            self._dims = None
+        self._complete = self._dims is not None
+        return self._dims
+
+    def _mark_dimensionless(self, dimensionless=False):
+        self.strip_unit = (dimensionless and self._complete
+                           and isinstance(self.value, unitbridge.Quantity))
+
     def evaluate(self):
+        if self.strip_unit:
+            # Magnitude in base units, the units cancel anyway.
+            return dimensions.strip_units(self.value)
         return self.value
 
 
@@ -615,9 +1189,24 @@ class Matrix(Operator):
         self.cols = cols
         self.data = data
 
+    def _operands(self):
+        if not self.data:
+            return ()
+        return tuple(cell for row in self.data for cell in row)
+
+    def _combine_dimensions(self, dims):
+        # Cells may have different units, that is fine.
+        if dims and all(d == dims[0] for d in dims):
+            return dims[0]
+        return None
+
     def evaluate(self):
-        evaluated = [self._eval(*row)
+        evaluated = [self._eval_sympy(*row)
                      for row in self.data]
+        # Numbers with units: use NumPy.
+        array = unitarray.UnitArray.from_cells(evaluated)
+        if array is not None:
+            return array
         return sympy.ImmutableMatrix(evaluated)
 
     def __str__(self):
@@ -629,3 +1218,83 @@ class Matrix(Operator):
                 )
                 + "]")
 
+
+class PackedMatrix(Operator):
+    """A big matrix literal of plain numbers, e.g., pasted data.
+
+    It is parsed directly into a NumPy array, without an operator for
+    every cell, and evaluates to a dimensionless unitarray.UnitArray.
+
+    """
+
+    # Smaller matrix literals are parsed cell by cell and stay exact.
+    # Bigger than any matrix linalg still treats exactly.
+    MIN_CELLS = linalg.SMALL_SIZE**2 + 1
+
+    _number = r"[-\u2212]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-\u2212+]?[0-9]+)?"
+    regex = (r"\[\s*{0}(?:\s*[,;]\s*{0})*\s*\]".format(_number))
+
+    @classmethod
+    def condition(cls, s, loc, toks):
+        """Only use this for big matrices (pyparsing condition)."""
+        text = toks[0]
+        return (unitarray.numpy is not None
+                and text.count(",") + text.count(";") + 1 >= cls.MIN_CELLS
+                and all(cls._fits_float(cell)
+                        for cell in text[1:-1].replace(";", ",").split(",")))
+
+    @staticmethod
+    def _fits_float(cell):
+        # Big integers like IDs must not be rounded, sympy keeps them.
+        cell = cell.strip().replace("\u2212", "-")
+        if not cell.lstrip("-").isdigit() or len(cell) < 16:
+            return True
+        return int(float(cell)) == int(cell)
+
+    @classmethod
+    def process(cls, s, loc, toks):
+        text = toks[0][1:-1].replace("\u2212", "-")
+        rows = text.split(";")
+        cols = rows[0].count(",") + 1
+        if any(row.count(",") + 1 != cols for row in rows):
+            raise VariableLengthRowsError(
+                "Rows of matrix have different lengths"
+            )
+        numpy = unitarray.numpy
+        array = numpy.array(text.replace(";", ",").split(","), dtype=float)
+        return cls(array.reshape(len(rows), cols))
+
+    def __init__(self, array):
+        self.array = array
+
+    def _combine_dimensions(self, dims):
+        return {}
+
+    def evaluate(self):
+        return unitarray.UnitArray(self.array, unitvec.DIMENSIONLESS)
+
+    def __str__(self):
+        return "[{}×{} matrix]".format(*self.array.shape)
+
+
+
+class Uncertain(Operator):
+    """A number with uncertainty, e.g., 9.81 ± 0.02."""
+
+    @classmethod
+    def process(cls, s, loc, toks):
+        value, _, sigma = toks
+        return cls(value, sigma)
+
+    def __init__(self, value, sigma):
+        # Created once, so that re-evaluation gives the same symbol.
+        self.value = uncertainty.UncertainValue(value, sigma)
+
+    def _combine_dimensions(self, dims):
+        return {}
+
+    def evaluate(self):
+        return self.value
+
+    def __str__(self):
+        return "({!s} ± {!s})".format(self.value.value, self.value.sigma)
@@ -19,15 +19,21 @@ import sympy
 
 from .. import units
 from .. import unitbridge
+from .. import uncertainty
 
 _X = sympy.Symbol("x")
+_Y = sympy.Symbol("y")
+_Z = sympy.Symbol("z")
 
 
 class ConstantList:
 
+    # uncertainty is the standard uncertainty, for constants which
+    # are measured.
     _c = collections.namedtuple(
         "_c",
-        ["canonical_name", "aliases", "value", "unit"]
+        ["canonical_name", "aliases", "value", "unit", "uncertainty"],
+        defaults=(None,)
     )
     _c.names = lambda self: (self.canonical_name,) + self.aliases
 
@@ -54,9 +60,19 @@ class ConstantList:
 
         # Variables.
         _c("x", (), _X, None),
+        _c("y", (), _Y, None),
+        _c("z", (), _Z, None),
 
         # Physical constants. CODATA 2014.
         #
+        # The uncertainties are used when writing the constant with a
+        # ± sign, e.g. G±. They are independent, correlations between
+        # constants are ignored. Derived constants have their own
+        # CODATA uncertainty instead of one propagated from the
+        # constants in their formula: those are strongly correlated in
+        # the CODATA adjustment, and α, e.g., is known much better
+        # than ec and h.
+        #
         # TODO: sympy floats                                   
         # TODO: double-check                                   
         _c("c", ("c0", "lightspeed", "speed_of_light"),
@@ -66,35 +82,35 @@ class ConstantList:
         _c("ε₀", ("ε0", "epsilon0", "electric_constant"),
            __eps0, "F/m"),                      # exact
         _c("G", ("gravitational_constant", "newtonian_constant_of_gravitation"),
-           __G, "m^3 kg^-1 s^-2"),
+           __G, "m^3 kg^-1 s^-2", 0.00031e-11),
         _c("h", ("planck", "planck_constant"),
-           __h, "J s"),
+           __h, "J s", 0.000000081e-34),
         _c("ħ", ("hbar", "planck2pi"),
-           __hbar, "J s"),
+           __hbar, "J s", 0.000000081e-34 / (2 * sympy.pi)),
         _c("ec", ("q", "elementary_charge"),
-           __ec, "C"),
+           __ec, "C", 0.0000000098e-19),
         _c("kB", ("boltzmann",),
-           __kB, "J/K"),
+           __kB, "J/K", 0.00000079e-23),
         _c("Φ₀", ("Φ0", "magnetic_flux_quantum"),
-           __h / (2 * __ec), "Wb"),
+           __h / (2 * __ec), "Wb", 0.000000013e-15),
         _c("G₀", ("G0", "conductance_quantum"),
-           2 * __ec**2 / __h, "S"),
+           2 * __ec**2 / __h, "S", 0.0000000018e-5),
         _c("me", ("m_e", "electron_mass"),
-           __me, "kg"),
+           __me, "kg", 0.00000011e-31),
         _c("mp", ("m_p", "proton_mass"),
-           __mp, "kg"),
+           __mp, "kg", 0.000000021e-27),
         _c("α", ("alpha", "fine_structure_constant"),
-           __alpha, None),
+           __alpha, None, 0.0000000017e-3),
         _c("R∞", ("Rinf", "rydberg_constant"),
-           __alpha**2 * __me * __c / (2 * __h), "m^-1"),
+           __alpha**2 * __me * __c / (2 * __h), "m^-1", 0.000065),
         _c("NA", ("avogadro", "avogadro_constant"),
-           __NA, "mol^-1"), # in fact 1/mol, let's see if it blows up!
+           __NA, "mol^-1", 0.000000074e23), # in fact 1/mol, let's see if it blows up!
         _c("faraday", ("faraday_constant",),
-           __NA * __ec, "C/mol"),
+           __NA * __ec, "C/mol", 0.00059),
         _c("R", ("gas_constant", "molar_gas_constant"),
-           __kB * __NA, "J / (mol K)"),
+           __kB * __NA, "J / (mol K)", 0.0000048),
         _c("σ", ("sigma", "stefan_boltzmann_constant"),
-           __sigma, "W / (m^2 K^4)"),
+           __sigma, "W / (m^2 K^4)", 0.000013e-8),
 
         # Atomic weights (weight because IUPAC says that atomic mass
         # refers to the mass of a single atom, while weight is
@@ -504,12 +520,19 @@ class ConstantList:
     def init(cls):
         cls.constants = {}
         cls.canonical_name = {}
+        cls.uncertain = {}
         for const in cls._constants:
             v = (const.value
                  if const.unit is None
                  else unitbridge.Quantity(const.value * units.ureg(const.unit)))
+            if const.uncertainty is not None:
+                u = uncertainty.UncertainValue(const.value, const.uncertainty)
+                if const.unit is not None:
+                    u = unitbridge.Quantity(units.ureg(const.unit)) * u
             for name in const.names():
                 cls.constants[name] = v
                 cls.canonical_name[name] = const.canonical_name
+                if const.uncertainty is not None:
+                    cls.uncertain[name] = u
 
 ConstantList.init()
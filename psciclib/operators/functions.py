@@ -18,6 +18,12 @@ import collections
 import sympy
 
 from .. import unitbridge
+from .. import linalg
+from .. import dataload
+from .. import stats
+from .. import uncertainty
+from .. import bitops
+from .. import logscale
 
 
 class ArgCap:
@@ -29,13 +35,15 @@ class ArgCap:
             on receiving one
     unit: a scalar or matrix with a unit of measurement attached,
           will try to convert to dimensionless if false
+    string: a quoted string, e.g., a file name
 
     """
-    def __init__(self, scalar, matrix, unit, optional=False):
+    def __init__(self, scalar, matrix, unit, optional=False, string=False):
         self.scalar = scalar
         self.matrix = matrix
         self.unit = unit
         self.optional = optional
+        self.string = string
 
 
 def abs_(x):
@@ -44,26 +52,14 @@ def abs_(x):
     return x.replace_magnitude(xx) if isinstance(x, unitbridge.Quantity) else xx
 
 
-def ensure_matrix(M):
-    if isinstance(M, unitbridge.Quantity):
-        m = M.magnitude
-        if isinstance(m, sympy.ImmutableMatrix):
-            u = M.replace_magnitude(1)
-            return sympy.ImmutableMatrix([[i * u for i in m.row(row)]
-                                          for row in range(m.rows)])
-        else:
-            return sympy.ImmutableMatrix([M])
-    elif not isinstance(M, sympy.ImmutableMatrix):
-        return sympy.ImmutableMatrix([M])
-    else:
-        return M
-
-
-def ensure_sq_matrix(M):
-    M = ensure_matrix(M)
-    if not M.is_square:
-        raise ValueError("det only works with square matrices")
-    return M
+def log(x, base=None):
+    # Huge numbers are only known by their logarithm anyway.
+    estimate = logscale.log(x, base)
+    if estimate is not None:
+        return estimate
+    elif base is None:
+        return sympy.log(x)
+    return sympy.log(x, base)
 
 
 def raise_(x):
@@ -117,12 +113,12 @@ class FunctionList:
            lambda x: sympy.asinh(1/x), (ArgCap(True, False, False),)),
         # e-function related.
         _f("exp", (), sympy.exp, (ArgCap(True, False, False),)),
-        _f("ln", (), sympy.log, (ArgCap(True, False, False),)),
-        _f("log", (), sympy.log,
+        _f("ln", (), log, (ArgCap(True, False, False),)),
+        _f("log", (), log,
            (ArgCap(True, False, False), ArgCap(True, False, False, True))),
-        _f("log10", (), lambda x: sympy.log(x, 10),
+        _f("log10", (), lambda x: log(x, sympy.Integer(10)),
            (ArgCap(True, False, False),)),
-        _f("log2", (), lambda x: sympy.log(x, 2),
+        _f("log2", (), lambda x: log(x, sympy.Integer(2)),
            (ArgCap(True, False, False),)),
         _f("lambertW", ("LambertW", "lambertw", "Lambertw"),
            sympy.LambertW,
@@ -152,12 +148,49 @@ class FunctionList:
            lambda r: 4 * sympy.pi * r**2,
            (ArgCap(True, False, True),)),
         # Linear algebra.
-        _f("det", (), lambda x: ensure_sq_matrix(x).det(),
-           (ArgCap(True, True, True),)),
-        _f("trace", (), lambda x: ensure_sq_matrix(x).trace(),
+        _f("det", (), linalg.det, (ArgCap(True, True, True),)),
+        _f("trace", (), linalg.trace, (ArgCap(True, True, True),)),
+        _f("transpose", (), linalg.transpose, (ArgCap(True, True, True),)),
+        _f("inv", (), linalg.inv, (ArgCap(True, True, True),)),
+        _f("solve", (), linalg.solve,
+           (ArgCap(True, True, True), ArgCap(True, True, True))),
+        _f("eig", ("eigenvalues",), linalg.eig, (ArgCap(True, True, True),)),
+        _f("svd", ("singular_values",), linalg.svd,
            (ArgCap(True, True, True),)),
-        _f("transpose", (), lambda x: ensure_matrix(x).transpose(),
+        _f("rank", (), linalg.rank, (ArgCap(True, True, True),)),
+        # Statistics.
+        _f("sum", (), stats.sum_, (ArgCap(True, True, True),)),
+        _f("mean", (), stats.mean, (ArgCap(True, True, True),)),
+        _f("median", (), stats.median, (ArgCap(True, True, True),)),
+        _f("var", (), stats.var, (ArgCap(True, True, True),)),
+        _f("std", (), stats.std, (ArgCap(True, True, True),)),
+        _f("min", (), stats.min_, (ArgCap(True, True, True),)),
+        _f("max", (), stats.max_, (ArgCap(True, True, True),)),
+        _f("percentile", (), stats.percentile,
+           (ArgCap(True, True, True), ArgCap(True, False, False))),
+        _f("linreg", (), stats.linreg,
+           (ArgCap(True, True, True), ArgCap(True, True, True))),
+        # Data.
+        _f("load", (), dataload.load,
+           (ArgCap(False, False, False, string=True),)),
+        # Uncertainty propagation by sampling (linear is the default).
+        _f("montecarlo", ("mc",), uncertainty.monte_carlo,
            (ArgCap(True, True, True),)),
+        # Fixed word widths for bit operations (programmer mode).
+        _f("unsigned", ("uint",),
+           lambda *args: sympy.Integer(bitops.unsigned(*args)),
+           (ArgCap(True, False, False), ArgCap(True, False, False, True))),
+        _f("signed", ("sint",),
+           lambda *args: sympy.Integer(bitops.signed(*args)),
+           (ArgCap(True, False, False), ArgCap(True, False, False, True))),
+        _f("rol", ("rotl",),
+           lambda *args: sympy.Integer(bitops.rotate_left(*args)),
+           (ArgCap(True, False, False), ArgCap(True, False, False),
+            ArgCap(True, False, False, True))),
+        _f("ror", ("rotr",),
+           lambda *args: sympy.Integer(bitops.rotate_right(*args)),
+           (ArgCap(True, False, False), ArgCap(True, False, False),
+            ArgCap(True, False, False, True))),
         # Analysis.
         _f("diff", (), sympy.diff,
            (ArgCap(True, False, True),
@@ -169,6 +202,37 @@ class FunctionList:
            (ArgCap(True, True, True),)),
     ]
 
+    # Functions which accept units: the unit of the result is the unit
+    # of the argument to this power.
+    unit_power = {
+        "√": sympy.Rational(1, 2),
+        "abs": 1,
+        "circle_area": 2,
+        "circle_circumference": 1,
+        "sphere_volume": 3,
+        "sphere_surface": 2,
+        "trace": 1,
+        "transpose": 1,
+        "inv": -1,
+        "eig": 1,
+        "svd": 1,
+        "rank": 0,
+        "sum": 1,
+        "mean": 1,
+        "median": 1,
+        "var": 2,
+        "std": 1,
+        "min": 1,
+        "max": 1,
+        "montecarlo": 1,
+    }
+
+    # Functions which get numeric matrices as unitarray.UnitArray
+    # instead of sympy matrices.
+    array_aware = {"det", "trace", "transpose", "inv", "solve", "eig",
+                   "svd", "rank", "sum", "mean", "median", "var", "std",
+                   "min", "max", "percentile", "linreg"}
+
     @classmethod
     def init(cls):
         cls.functions = {}
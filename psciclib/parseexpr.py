@@ -18,7 +18,7 @@ import re
 import pyparsing
 from pyparsing import (ParserElement, Word, oneOf, Literal, CaselessLiteral,
                        Regex, Optional, Suppress, Forward, FollowedBy, NotAny,
-                       Group, OneOrMore, ZeroOrMore,
+                       Group, OneOrMore, ZeroOrMore, QuotedString,
                        nums, alphas, ParseResults)
 ParserElement.enablePackrat() # Significant speedup.
 
@@ -27,8 +27,15 @@ from .units import Q_
 
 # Definitions. #########################################################
 
+# Bit operations for programmer mode, as whole words.
+andop = Literal("&") | Regex(r"and(?!\w)")
+xorop = Regex(r"xor(?!\w)")
+orop = Literal("|") | Regex(r"or(?!\w)")
+bitnotop = Literal("~") | Regex(r"not(?!\w)")
+shiftop = oneOf("<< >>")
+
 # These are reserved words that cannot be variables, constants, or units.
-keyword = oneOf("to")
+keyword = oneOf("to") | andop | xorop | orop | bitnotop
 
 # Special symbols for currencies.
 currency_symbols = oneOf("€ £ $ ₪ ¥ ￥ ₩ ￦ ฿ ₹")
@@ -98,6 +105,13 @@ number = (
 
 operand = number | variable
 
+# Numbers with uncertainty, e.g., 9.81 ± 0.02 or G± (CODATA).
+pmop = oneOf("± +/-")
+uncertain_number = number + pmop + number
+uncertain_number.setParseAction(operators.Uncertain.process)
+uncertain_constant = identifier + Suppress(pmop) + NotAny(number)
+uncertain_constant.setParseAction(operators.Constant.process_uncertain)
+
 # Operators
 signop = oneOf("+ - \u2212") # last entry is unicode minus
 addop = oneOf("+ - \u2212")
@@ -119,17 +133,25 @@ matrix = Group(
     + Suppress(']')
 )
 matrix.setParseAction(operators.Matrix.process)
+# Fast path for big matrices of plain numbers.
+packed_matrix = Regex(operators.PackedMatrix.regex)
+packed_matrix.addCondition(operators.PackedMatrix.condition)
+packed_matrix.addParseAction(operators.PackedMatrix.process)
 
 # Term.
 lpar = Suppress('(')
 rpar = Suppress(')')
-term = operand | ( lpar + expr + rpar ) | matrix
+term = ( uncertain_number | uncertain_constant | operand
+         | ( lpar + expr + rpar ) | packed_matrix | matrix )
 
 # Function.
 argsep = Suppress( oneOf(", ;") )
 func_term = Forward()
+# Strings are only allowed as function arguments, e.g., file names.
+string = QuotedString('"', escChar="\\") | QuotedString("'", escChar="\\")
+func_arg = string | expr
 func_expr = Group(
-    identifier + lpar + expr + ZeroOrMore( argsep + expr ) + rpar
+    identifier + lpar + func_arg + ZeroOrMore( argsep + func_arg ) + rpar
 )
 func_expr.setParseAction(operators.Function.process)
 func_term <<= ( func_expr | term )
@@ -151,14 +173,18 @@ sign_term = Forward()
 _signop = Optional(signop) # "try to avoid LR" was the original comment, dunno!?
 sign_expr = FollowedBy(_signop.expr + sign_term) + Group( _signop + sign_term )
 sign_expr.setParseAction(operators.PrefixSymbol.process)
-sign_term <<= ( sign_expr | exp_term )
+bitnot_expr = Group( bitnotop + sign_term )
+bitnot_expr.setParseAction(operators.PrefixSymbol.process)
+sign_term <<= ( bitnot_expr | sign_expr | exp_term )
 
 # Multiplication without sign has precendence so that 2km / 3h means
 # 2/3 km/h.  Multiplication without sign is possible if RHS is a
 # variable/constant/unit.
 sm_exp_expr = Group( variable + expop + ZeroOrMore(signop) + exp_term )
 sm_exp_expr.setParseAction(operators.Exponent.process)
-signless_mult_expr = Group( sign_term + OneOrMore( sm_exp_expr | variable ) )
+signless_mult_expr = Group(
+    sign_term + OneOrMore( sm_exp_expr | uncertain_constant | variable )
+)
 signless_mult_expr.setParseAction(operators.InfixLeftSymbol.process)
 signless_mult_term = ( signless_mult_expr | sign_term )
 
@@ -172,8 +198,25 @@ add_expr = Group( mult_term + OneOrMore( addop + mult_term ) )
 add_expr.setParseAction(operators.InfixLeftSymbol.process)
 add_term = ( add_expr | mult_term )
 
+# Bit operations, with lower precedence than arithmetic like in Python.
+shift_expr = Group( add_term + OneOrMore( shiftop + add_term ) )
+shift_expr.setParseAction(operators.InfixLeftSymbol.process)
+shift_term = ( shift_expr | add_term )
+
+and_expr = Group( shift_term + OneOrMore( andop + shift_term ) )
+and_expr.setParseAction(operators.InfixLeftSymbol.process)
+and_term = ( and_expr | shift_term )
+
+xor_expr = Group( and_term + OneOrMore( xorop + and_term ) )
+xor_expr.setParseAction(operators.InfixLeftSymbol.process)
+xor_term = ( xor_expr | and_term )
+
+or_expr = Group( xor_term + OneOrMore( orop + xor_term ) )
+or_expr.setParseAction(operators.InfixLeftSymbol.process)
+or_term = ( or_expr | xor_term )
+
 # Complete expression.
-expr <<= add_term
+expr <<= or_term
 expr.setParseAction(operators.Expression.process)
 
 
@@ -222,7 +265,10 @@ equals_token = Literal("=")
 equality = expr + equals_token + expr
 equality.setParseAction(operators.Equality.process)
 
-cmdln = conversion_cmd | equality | expr
+equation_system = equality + OneOrMore( Suppress(";") + equality )
+equation_system.setParseAction(operators.EquationSystem.process)
+
+cmdln = conversion_cmd | equation_system | equality | expr
 
 
 # Support for unicode exponents by pre-processing.
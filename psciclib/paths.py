@@ -22,6 +22,11 @@ CACHE_DIR = appdirs.user_cache_dir(appname="pscic",
                                    appauthor="TobiasBrink",
                                    opinion=True)
 
+# Cache shared by several users, e.g., on a network drive. Everything
+# in there is trusted (see exprcache), so it is only used if the user
+# asks for it with this environment variable.
+SHARED_CACHE_DIR = os.environ.get("PSCIC_SHARED_CACHE_DIR")
+
 
 def make_paths():
     """Make sure all paths exist."""
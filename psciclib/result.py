@@ -16,13 +16,20 @@
 """Object to store the result of a calculation."""
 
 import enum
-import math
 import collections
 
 import sympy
+import mpmath
 
 from .units import Q_
 from . import unitbridge
+from . import bestunits
+from . import simplifier
+from . import solver
+from . import uncertainty
+from . import interval
+from . import bignum
+from . import logscale
 
 
 @enum.unique
@@ -49,6 +56,17 @@ class UnitMode(enum.Enum):
 _DEFAULT_DIGITS = 8
 
 
+def _evalf(obj, digits):
+    # evalf() of fractions with a million digits takes ages in mpmath.
+    if isinstance(obj, sympy.Rational):
+        prec = mpmath.libmp.dps_to_prec(digits)
+        return sympy.Float._new(
+            bignum.to_mpf(int(obj.p), int(obj.q), prec)._mpf_, prec
+        )
+    return obj.evalf(n=digits)
+DEFAULT_NSOLVE_INTERVAL = solver.DEFAULT_INTERVAL
+
+
 class RomanInt:
 
     numerals = ["I", "V", "X", "L", "C", "D", "M"]
@@ -116,13 +134,22 @@ class Result:
     _Context = collections.namedtuple("_context",
                                       ["is_exponent", "surrounding_op"])
 
-    def __init__(self, input_str, parsed, raw_result, is_numerical=False):
+    def __init__(self, input_str, parsed, raw_result, is_numerical=False,
+                 simplify_incomplete=False, upgrade=None):
         self.input_str = input_str
         self.parsed = parsed
         self.raw_result = raw_result
         self.is_numerical = is_numerical # obtained by numerical solution,
                                          # should only be true if set by the
-                                         # nsolve() method!
+                                         # nsolve() methods or the solver!
+        self.simplify_incomplete = simplify_incomplete # simplifier ran out
+                                                       # of budget
+        self.precision_unstable = False # printed digits could not be
+                                        # certified
+        self.upgrade = upgrade # None or a concurrent.futures.Future for
+                               # a symbolic Result replacing this
+                               # numerical one (or None if there is
+                               # none)
         self.__simplified = {} # cache simplify(), dict for multiple solutions!
 
     @property
@@ -130,6 +157,24 @@ class Result:
         """Is this an equation that was not solved symbolically?"""
         return isinstance(self.raw_result, sympy.Equality)
 
+    @property
+    def has_abbreviated_digits(self):
+        """Is this an integer or fraction too long to print in full?"""
+        r = self.raw_result
+        return (isinstance(r, sympy.Rational)
+                and max(bignum.digit_count(r.p),
+                        bignum.digit_count(r.q)) > bignum.MAX_DIGITS)
+
+    def write_digits(self, f):
+        """Write all digits of an integer or fraction result to file f."""
+        if not isinstance(self.raw_result, sympy.Rational):
+            raise ValueError("Only integers and fractions can be written "
+                             "with all digits.")
+        bignum.write_decimal(self.raw_result.p, f)
+        if self.raw_result.q != 1:
+            f.write("/")
+            bignum.write_decimal(self.raw_result.q, f)
+
     def nsolve(self, x0):
         """Attempt a numeric solution and return a Result object.
 
@@ -154,6 +199,27 @@ class Result:
                               solution,
                               True)
 
+    def nsolve_interval(self, lower, upper, processes=None):
+        """Numerically find all real solutions in [lower, upper].
+
+        Returns a Result object with a Solutions object, or None if no
+        solution was found. Will raise a value error if self does not
+        contain an equation in one variable.
+
+        """
+        if not isinstance(self.raw_result, sympy.Equality):
+            raise ValueError("Trying to solve something that is not an "
+                             "equation.")
+        roots = solver.nsolve_interval(self.raw_result, lower, upper,
+                                       processes=processes)
+        if not roots:
+            return None
+        x, = self.raw_result.free_symbols
+        return self.__class__(self.input_str,
+                              self.parsed,
+                              Solutions(x, roots),
+                              True)
+
     ####################################################################     
     # TODO: replace or remove the stuff below ##########################     
     #vvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvv#     
@@ -167,7 +233,7 @@ class Result:
         elif isinstance(self.raw_result, sympy.Basic):
             # Those should be floatified.
             return self.raw_result.n()
-        elif isinstance(self.raw_result, Solutions):
+        elif isinstance(self.raw_result, (Solutions, Equations)):
             # Rules as above for the individual solutions.
             return self.raw_result.apply(
                 lambda sol: (sol
@@ -183,58 +249,89 @@ class Result:
         if isinstance(obj, sympy.Integer):
             return obj
         else:
-            return obj.evalf(n=digits)
+            return _evalf(obj, digits)
 
-    @staticmethod
-    def _simplify(obj):
-        if isinstance(obj, bool):
-            return obj
-        else:
-            return obj.simplify()
+    def _simplify(self, obj):
+        obj, complete = simplifier.simplify(obj)
+        if not complete:
+            self.simplify_incomplete = True
+        return obj
 
-    _hex_lookup = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9",
-                   "a", "b", "c", "d", "e", "f"]
-    _base_conv = {NumeralSystem.binary: bin,
-                  NumeralSystem.octal: oct,
-                  NumeralSystem.hexadecimal: hex}
+    @staticmethod
+    def _evalf_rootofs(solutions, digits):
+        # Roots of polynomials without closed form are CRootOf objects,
+        # evalf() of those takes ages at high precision.
+        def magnitude(val):
+            if isinstance(val, unitbridge.Quantity):
+                return val.magnitude
+            return val
+        def replace(val, values):
+            if isinstance(val, unitbridge.Quantity):
+                return val.replace_magnitude(replace(val.magnitude, values))
+            return val.xreplace(values)
+        values = solver.rootof_values(
+            [magnitude(val) for val in solutions.values()
+             if isinstance(magnitude(val), sympy.Basic)],
+            digits + 10
+        )
+        if not values:
+            return solutions
+        return solutions.apply(replace, values)
+
+    def _to_float_certified(self, obj, digits):
+        # Interval arithmetic if possible, so that all printed digits
+        # are correct. Otherwise evaluate with a lot of extra
+        # precision and hope for the best.
+        if isinstance(obj, unitbridge.Quantity):
+            return obj.replace_magnitude(
+                self._to_float_certified(obj.magnitude, digits)
+            )
+        enclosure = interval.certify(obj, digits)
+        if enclosure is not None and enclosure.certified:
+            return enclosure.value
+        elif enclosure is not None:
+            self.precision_unstable = True
+        return _evalf(obj, digits*10) # precision will be lowered later.
+
+    _base_prefix = {NumeralSystem.binary: "0b",
+                     NumeralSystem.octal: "0o",
+                     NumeralSystem.hexadecimal: "0x"}
     @classmethod
     def _to_other_base(cls, obj, base, digits):
-        conv = cls._base_conv[base]
-        if isinstance(obj, sympy.Integer):
-            return conv(obj)
+        # TODO: use uniform definition of the precision given by
+        # `digits', here it is just number of digits after the point,
+        # which is not consistent!
+        prefix = cls._base_prefix[base]
+        if isinstance(obj, int):
+            # Numerator or denominator of a fraction.
+            numerator, denominator = obj, 1
+        elif isinstance(obj, sympy.Rational):
+            numerator, denominator = int(obj.p), int(obj.q)
         else:
-            sign = "-" if obj < 0 else ""
-            # Weird, but that way we do not lose precision.
-            r = sympy.Rational(str(sympy.Abs(obj).evalf(10*digits)))
-            numerator, denominator = int(r.p), int(r.q)
-            # TODO: use uniform definition of the precision given by
-            # `digits', here it is just number of digits after the
-            # decimal point, which is not consistent!
-            i = 0
-            b = base.value
-            l = []
-            while i <= digits + 1:
-                # The first digit is still the integer part, which we
-                # can ignore!
-                l.append(numerator // denominator)
-                numerator = (numerator % denominator) * b
-                if numerator == 0:
-                    # Exact!
-                    break
-                i += 1
-            # Check if we need to round.
-            if len(l) > digits + 1:
-                # Rounding seems not well-defined for odd-numbered
-                # bases, but for now we don't have any of those.
-                l[-2] += l[-1] // (int(math.ceil(b/2)))
-                l.pop()
-            lookup = cls._hex_lookup
-            if len(l) == 1:
-                return sign + conv(l[0])
-            else:
-                return (
-                    sign + conv(l[0]) + "." + "".join(lookup[d] for d in l[1:])
-                )
+            # The exact binary value of the float, no detour via str.
+            f = obj if isinstance(obj, sympy.Float) \
+                else sympy.Float(obj.evalf(10*digits))
+            sign, man, exp, _ = f._mpf_
+            if exp >= 0:
+                # An integer, maybe one too large to build.
+                return (("-" if sign else "") + prefix
+                        + bignum.abbreviate_shifted(man, exp,
+                                                    base=base.value))
+            bits = base.value.bit_length() - 1
+            if -exp > man.bit_length() + bits * digits + 1:
+                # Rounds to zero, no need to build 1 << -exp.
+                man, exp = 0, 0
+            numerator = -man if sign else man
+            denominator = 1 << -exp
+        sign = "-" if numerator < 0 else ""
+        integer, fraction = bignum.fraction_digits(abs(numerator),
+                                                   denominator,
+                                                   base.value, digits)
+        # Huge integers would freeze the GUI.
+        res = sign + prefix + bignum.abbreviate(integer, base=base.value)
+        if fraction:
+            res += "." + fraction
+        return res
 
     # Pretty-printing ##################################################
     def as_string(self, mode=Mode.to_float,
@@ -259,11 +356,14 @@ class Result:
         # No, it's a more complicated expression.
         if mode == Mode.to_float:
             if isinstance(self.raw_result, Solutions):
+                res = self._evalf_rootofs(self.raw_result, digits)
+                res = res.apply(self._to_float, digits)
+            elif isinstance(self.raw_result, Equations):
                 res = self.raw_result.apply(self._to_float, digits)
             else:
                 res = self._to_float(self.raw_result, digits)
         elif mode == Mode.try_exact:
-            if isinstance(self.raw_result, Solutions):
+            if isinstance(self.raw_result, (Solutions, Equations)):
                 res = self.raw_result.apply(self._simplify)
             else:
                 res = self._simplify(self.raw_result)
@@ -273,19 +373,33 @@ class Result:
         # TODO: apply to Quantity object, too!
         # TODO: support complex numbers
         # TODO: keep exact mode also here!!!
-        if isinstance(res, sympy.Basic) and res.is_real:
+        if isinstance(res, logscale.LogScale):
+            res = "≈ " + str(res)
+        elif isinstance(res, sympy.Basic) and res.is_real:
             if numeral_system in (NumeralSystem.binary,
                                   NumeralSystem.octal,
                                   NumeralSystem.hexadecimal):
                 res = "= " + self._to_other_base(res, numeral_system, digits)
             elif numeral_system == NumeralSystem.roman:
                 res = "= " + RomanInt.int_to_roman(res)
+            elif isinstance(res, sympy.Rational):
+                # Huge integers are abbreviated.
+                res = "= " + bignum.abbreviate(res.p) + (
+                    "/" + bignum.abbreviate(res.q) if res.q != 1 else ""
+                )
             else:
                 res = "= " + str(res)
+        elif isinstance(res, Solutions) and res.is_system:
+            res = "\n".join(", ".join("{} = {}".format(x, val)
+                                      for x, val in zip(res.x, sol))
+                            for sol in res.solutions)
         elif isinstance(res, Solutions):
             # TODO: recursive application of the previous actions :-(
             res = "\n".join("{} = {}".format(res.x, sol)
                             for sol in res.solutions)
+        elif isinstance(res, Equations):
+            res = "\n".join("{} = {}".format(eq.lhs, eq.rhs)
+                            for eq in res.equations)
         else:
             res = "= " + str(res)
         # TODO: unit thing.
@@ -327,7 +441,7 @@ class Result:
         # "Normal" floats.
         if numeral_system == NumeralSystem.decimal:
             # Set precision.
-            f = str(number.evalf(n=digits))
+            f = str(_evalf(number, digits))
             # Fix ugliness.
             pre, exp = (f.split("e") + [""])[:2] # ensure length 2 :-(
             # Non-exponential part.
@@ -363,7 +477,8 @@ class Result:
     @classmethod
     def _integer_as_html(cls, number, numeral_system, digits):
         if numeral_system == NumeralSystem.decimal:
-            return str(number)
+            # Huge integers would freeze the GUI.
+            return bignum.abbreviate(number)
         elif numeral_system == NumeralSystem.roman:
             return RomanInt.int_to_roman(number)
         else:
@@ -404,10 +519,32 @@ class Result:
             return str(atom)
 
     def _as_html(self, raw_result, mode, numeral_system, digits, units):
+        if isinstance(raw_result, Solutions) and mode == Mode.to_float:
+            raw_result = self._evalf_rootofs(raw_result, digits)
         # Simplify result.
         if isinstance(raw_result, bool):
             # No need to simplify or do anything else, really.
             return "true" if raw_result else "false"
+        elif isinstance(raw_result, Solutions) and raw_result.is_system:
+            # One row per solution, one column per variable.
+            return (
+                '<table border="0" style="float:right;">'
+                + "".join('<tr>'
+                          + "".join('<td><i>{!s}</i> = </td><td>{}</td>'
+                                    ''.format(x,
+                                              self._as_html(val, mode,
+                                                            numeral_system,
+                                                            digits, units))
+                                    for x, val in zip(raw_result.x, sol))
+                          + '</tr>'
+                          for sol in raw_result.solutions)
+                + '</table>'
+            )
+        elif isinstance(raw_result, Equations):
+            # Unsolved system, one equation per line.
+            return "<br>".join(self._as_html(eq, mode, numeral_system,
+                                             digits, units)
+                               for eq in raw_result.equations)
         elif isinstance(raw_result, Solutions):
             # Make a table out of solutions.
             return (
@@ -428,20 +565,21 @@ class Result:
                 + self._as_html(raw_result.rhs,
                                 mode, numeral_system, digits, units)
             )
-        elif isinstance(raw_result, (sympy.Rational, sympy.Float)):
+        elif isinstance(raw_result, (sympy.Rational, sympy.Float,
+                                     logscale.LogScale)):
             # Those need neither simplify() nor evalf() right now.
             result = raw_result
         else:
             if mode == Mode.to_float:
-                result = raw_result.evalf(digits*10) # precision will be
-                                                     # lowered later.
+                result = self._to_float_certified(raw_result, digits)
             elif mode == Mode.try_exact:
                 # Try cache first.
                 try:
                     result = self.__simplified[raw_result]
                 except KeyError:
                     # Have to simplify, was not done before.
-                    self.__simplified[raw_result] = raw_result.simplify()
+                    self.__simplified[raw_result] = \
+                        self._simplify(raw_result)
                     result = self.__simplified[raw_result]
             else:
                 raise RuntimeError(
@@ -464,7 +602,9 @@ class Result:
                     m = m * u.magnitude
                     u = Q_(1, u.units)
                 elif units == UnitMode.to_best:
-                    raise ValueError("'to best units' not implemented :-(")
+                    best = bestunits.to_best(expr)
+                    u = best.unity_quantity
+                    m = best.magnitude
                 else:
                     raise RuntimeError("Unknown unit mode: {}. "
                                        "This is a bug (d6QtSj)."
@@ -630,6 +770,29 @@ class Result:
                     return "(" + retval + ")"
                 else:
                     return retval
+            elif isinstance(expr, uncertainty.PlusMinus):
+                ctxt = self._Context(context.is_exponent,
+                                     self._Surr.addition)
+                retval = (printer(expr.mean, ctxt) + " ± "
+                          + printer(expr.std, ctxt))
+                if context.surrounding_op in {self._Surr.none,
+                                              self._Surr.function_call}:
+                    return retval
+                return "(" + retval + ")"
+            elif isinstance(expr, logscale.LogScale):
+                ctxt_exp = self._Context(context.is_exponent+1,
+                                         self._Surr.exp_exp)
+                exponent = printer(expr.log10, ctxt_exp)
+                if context.is_exponent:
+                    retval = "10^(" + exponent + ")"
+                else:
+                    retval = "10<sup>" + exponent + "</sup>"
+                if expr.sign < 0:
+                    retval = "-" + retval
+                if context.surrounding_op == self._Surr.none:
+                    # Only the order of magnitude is known.
+                    return "≈ " + retval
+                return "(" + retval + ")"
             elif isinstance(expr, sympy.Function):
                 # TODO: sympy.Function -> look up name in a table, the
                 # same table we use to map from string to
@@ -689,8 +852,10 @@ class Result:
                 retval += "</table>"
                 return retval
             elif isinstance(expr, sympy.RootOf):
-                # No symbolic solution available.
-                return printer(expr.evalf(2*digits), # reduce digits later.
+                # No symbolic solution available. Reduce digits later.
+                values = solver.rootof_values([expr], 2*digits)
+                return printer(values[expr] if values
+                               else expr.evalf(2*digits),
                                context)
             else:
                 raise RuntimeError(
@@ -702,6 +867,8 @@ class Result:
     def as_html(self, mode=Mode.to_float,
                 numeral_system=NumeralSystem.decimal,
                 digits=_DEFAULT_DIGITS, units=UnitMode.none):
+        # Set again by _to_float_certified(), only for this output.
+        self.precision_unstable = False
         retval = self._as_html(self.raw_result, mode, numeral_system,
                                digits, units)
         # Use unicode minus signs. TODO: this is hacky.
@@ -711,17 +878,58 @@ class Result:
 
 
 class Solutions:
-    """A list of solutions."""
+    """A list of solutions.
+
+    For systems of equations, x is a tuple of variables and every
+    solution is a tuple of values, one per variable.
+
+    """
 
     def __init__(self, x, solutions):
         self.x = x
         self.solutions = tuple(solutions)
 
+    @property
+    def is_system(self):
+        return isinstance(self.x, tuple)
+
+    def values(self):
+        """Iterate over all values of all solutions."""
+        for sol in self.solutions:
+            if self.is_system:
+                yield from sol
+            else:
+                yield sol
+
     def apply(self, fn, *args, **kwargs):
         """Apply function fn(<>, *args, **kwargs) to every solution.
 
         Returns a new Solutions object.
 
         """
+        if self.is_system:
+            return self.__class__(self.x,
+                                  tuple(tuple(fn(val, *args, **kwargs)
+                                              for val in sol)
+                                        for sol in self.solutions))
         return self.__class__(self.x, tuple(fn(sol, *args, **kwargs)
                                             for sol in self.solutions))
+
+
+class Equations:
+    """A system of equations that could not be solved."""
+
+    def __init__(self, equations):
+        self.equations = tuple(equations)
+
+    def apply(self, fn, *args, **kwargs):
+        """Apply function fn(<>, *args, **kwargs) to both sides of every
+        equation.
+
+        Returns a new Equations object.
+
+        """
+        return self.__class__(sympy.Eq(fn(eq.lhs, *args, **kwargs),
+                                       fn(eq.rhs, *args, **kwargs),
+                                       evaluate=False)
+                              for eq in self.equations)
@@ -26,32 +26,58 @@ _eq_hint = (
     "returned in simplified form."
 )
 _numerical_solution_hint = (
-    "The solution could not be obtained analytically. The given solution "
-    "is obtained numerically and may not be the only solution. "
-    "Play with the starting value to find other solutions. "
-    "TODO: UI to input starting value."
+    "The solution could not be obtained analytically (at least not "
+    "quickly). The given solutions are obtained numerically and may not "
+    "be the only solutions. Only real solutions in a limited interval "
+    "are searched for, it is set with \"Solve in\" (--interval on the "
+    "command line)."
+)
+_simplify_hint = (
+    "Simplification was stopped because the expression is too large "
+    "or it took too long. The result is shown in the simplest form "
+    "found so far."
 )
 _unit_hint = (
     "The precision of calculations with units may in some cases be less "
     "than requested. This is a bug that will be fixed in the future."
 )
+_precision_hint = (
+    "Not all printed digits could be verified with interval arithmetic. "
+    "The calculation may be numerically unstable, e.g., because the "
+    "result is zero or almost zero."
+)
+_logscale_hint = (
+    "The result is too large to be calculated exactly, only its order "
+    "of magnitude is shown."
+)
 
-def get_hints(result, digits, is_numerical):
+def get_hints(result, digits, is_numerical, simplify_incomplete=False,
+              precision_unstable=False):
     hints = set()
     if is_numerical:
         hints.add(_numerical_solution_hint)
-    from .result import Solutions
+    if simplify_incomplete:
+        hints.add(_simplify_hint)
+    if precision_unstable:
+        hints.add(_precision_hint)
+    from .result import Solutions, Equations
     if isinstance(result, bool):
         # No hints here.
         pass
     elif isinstance(result, Solutions):
         # A bunch of solutions.
-        for sol in result.solutions:
+        for sol in result.values():
             hints |= get_hints(sol, digits, is_numerical)
+    elif isinstance(result, Equations):
+        for eq in result.equations:
+            hints |= get_hints(eq, digits, is_numerical)
     else:
         # A single result.
         import sympy
         from .unitbridge import Quantity
+        from .logscale import LogScale
+        if isinstance(result, sympy.Basic) and result.has(LogScale):
+            hints.add(_logscale_hint)
         atoms = result.atoms()
         for atom in atoms:
             is_q = isinstance(atom, Quantity)
@@ -0,0 +1,191 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tiered simplification with a time and operation budget.
+
+sympy's simplify() tries a whole zoo of strategies and can take
+minutes on innocent-looking input. Here we first try a few cheap
+canonical forms and only escalate to the full simplify() if the budget
+allows it. The full simplify() runs in a worker process, which is
+killed when the time is up.
+
+"""
+
+import time
+import multiprocessing.connection
+
+import sympy
+from sympy.functions.elementary.trigonometric import (
+    TrigonometricFunction, InverseTrigonometricFunction
+)
+
+from . import exprcache
+from . import unitbridge
+from . import solver
+
+
+# Default budget. The time is only checked between the cheap tiers, so
+# one of them can overshoot it, the full simplify() is stopped on time.
+# The operation count (see sympy.count_ops) is used to guess
+# beforehand if the full simplify() is worth starting at all.
+DEFAULT_TIMEOUT = 2.0 # seconds
+DEFAULT_MAX_OPS = 300
+
+
+def _is_trig_only(expr):
+    """True if all functions in expr are trigonometric."""
+    funcs = expr.atoms(sympy.Function)
+    return bool(funcs) and all(
+        isinstance(f, (TrigonometricFunction, InverseTrigonometricFunction))
+        for f in funcs
+    )
+
+
+def _cheap_candidates(expr):
+    """Yield cheap canonical forms of expr.
+
+    All of them must be exactly equal to expr. nsimplify() is not used,
+    it only guesses a closed form from a float approximation.
+
+    """
+    if expr.is_rational_function():
+        yield sympy.cancel(expr)
+    if expr.has(sympy.Pow):
+        yield sympy.powsimp(expr)
+    if _is_trig_only(expr):
+        yield sympy.trigsimp(expr)
+
+
+def _cheap(expr, deadline):
+    """Return the best cheap form of expr and whether we finished."""
+    best = expr
+    best_ops = sympy.count_ops(expr)
+    for candidate in _cheap_candidates(expr):
+        ops = sympy.count_ops(candidate)
+        if ops < best_ops:
+            best, best_ops = candidate, ops
+        if time.monotonic() > deadline:
+            return best, False
+    return best, True
+
+
+def _simplify_worker(expr, conn):
+    try:
+        conn.send(("ok", expr.simplify()))
+    except Exception as e:
+        conn.send(("error", e))
+    finally:
+        conn.close()
+
+
+def _full(expr, deadline):
+    """expr.simplify() in a worker process, None if out of time."""
+    # Our quantities can't be sent to another process.
+    quantities = {q: sympy.Dummy(positive=True)
+                  for q in expr.atoms(unitbridge.Quantity)}
+    ctx = solver.mp_context()
+    recv, send = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_simplify_worker,
+                       args=(expr.xreplace(quantities), send),
+                       daemon=True)
+    proc.start()
+    send.close()
+    try:
+        if not recv.poll(max(deadline - time.monotonic(), 0.0)):
+            return None
+        try:
+            status, value = recv.recv()
+        except EOFError:
+            # Worker died.
+            return None
+        if status == "error":
+            raise value
+        return value.xreplace({d: q for q, d in quantities.items()})
+    finally:
+        if proc.is_alive():
+            proc.terminate()
+        proc.join()
+        recv.close()
+
+
+def _simplify_relational(eq, deadline, max_ops):
+    # Try to decide the relation by looking at the difference of both
+    # sides first, this is what simplify() would do anyway.
+    try:
+        diff, complete = _cheap(eq.lhs - eq.rhs, deadline)
+    except (TypeError, ValueError):
+        # Units which do not fit, let sympy deal with it.
+        diff, complete = None, True
+    if diff is not None and diff.is_number and isinstance(eq, sympy.Eq):
+        if diff.is_zero:
+            return sympy.S.true, True
+        elif diff.is_zero is False:
+            return sympy.S.false, True
+    if not complete or sympy.count_ops(eq) > max_ops:
+        return eq, False
+    full = _full(eq, deadline)
+    if full is None:
+        return eq, False
+    return full, True
+
+
+def _simplify_matrix(M, deadline, max_ops):
+    complete = True
+    def cell(expr):
+        nonlocal complete
+        remaining = max(deadline - time.monotonic(), 0.0)
+        expr, cell_complete = simplify(expr, remaining, max_ops)
+        complete = complete and cell_complete
+        return expr
+    return M.applyfunc(cell), complete
+
+
+def simplify(expr, timeout=DEFAULT_TIMEOUT, max_ops=DEFAULT_MAX_OPS):
+    """Simplify expr, escalating to sympy.simplify() only if affordable.
+
+    Returns a tuple (simplified, complete). If complete is False, the
+    budget was exceeded and simplified is the best form found so far.
+
+    """
+    if isinstance(expr, bool) or not isinstance(expr, sympy.Basic):
+        return expr, True
+    elif expr.is_Atom:
+        return expr, True
+    cached = exprcache.get("simplify", expr)
+    if cached is not None:
+        return cached, True
+    simplified, complete = _simplify(expr, time.monotonic() + timeout,
+                                     max_ops)
+    if complete:
+        # Incomplete results depend on the budget, don't store those.
+        exprcache.put("simplify", simplified, expr)
+    return simplified, complete
+
+
+def _simplify(expr, deadline, max_ops):
+    if isinstance(expr, sympy.MatrixBase):
+        return _simplify_matrix(expr, deadline, max_ops)
+    elif isinstance(expr, sympy.Rel):
+        return _simplify_relational(expr, deadline, max_ops)
+    best, complete = _cheap(expr, deadline)
+    if not complete or sympy.count_ops(best) > max_ops:
+        return best, False
+    # Escalate.
+    full = _full(best, deadline)
+    if full is None:
+        return best, False
+    if sympy.count_ops(full) <= sympy.count_ops(best):
+        best = full
+    return best, True
@@ -0,0 +1,662 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Solvers that are faster than plain sympy.solve() for special cases."""
+
+import os
+import time
+import random
+import itertools
+import collections
+import concurrent.futures
+import multiprocessing
+import multiprocessing.connection
+import threading
+
+import mpmath
+import sympy
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import unitbridge
+from . import exprcache
+
+
+# Precision (decimal digits) of numerical solutions. Must be at least
+# the highest precision the user can request for output.
+DIGITS = 100
+
+# Interval that is scanned for numerical solutions if the user does
+# not give one.
+DEFAULT_INTERVAL = (-10.0, 10.0)
+
+# Time (seconds) we give sympy.solve() to find a symbolic solution once
+# a numerical one is known.
+SOLVE_BUDGET = 5.0
+
+# Time (seconds) sympy.solve() has on its own before the numerical
+# solver is started, most equations are solved faster than that.
+QUICK_SOLVE = 0.1
+
+# Number of points used to scan an interval for roots.
+SCAN_POINTS = 2001
+
+# Below this number of root candidates, starting worker processes is
+# more expensive than refining them one after the other.
+PARALLEL_MIN_CANDIDATES = 4
+
+# Start method of the worker processes (see multiprocessing), None to
+# fork where possible. See use_fork_server().
+START_METHOD = None
+
+# Number of starting points for the numerical solution of systems of
+# equations.
+SYSTEM_STARTS = 20
+
+# Exact factors of polynomials of lower degree are solved exactly by
+# polyroots(), sympy finds closed forms for those.
+NUMERIC_DEGREE = 5
+
+
+def as_polynomial(eq, x):
+    """Return eq (an Equality) as a sympy.Poly in x, or None.
+
+    Only univariate polynomials with numeric coefficients qualify.
+
+    """
+    try:
+        diff = eq.lhs - eq.rhs
+    except (TypeError, ValueError):
+        return None
+    if (not isinstance(diff, sympy.Expr)
+        or diff.has(unitbridge.Quantity)
+        or diff.free_symbols != {x}
+        or not diff.is_polynomial(x)):
+        return None
+    poly = sympy.Poly(diff, x)
+    if poly.degree() < 1:
+        return None
+    return poly
+
+
+def wants_numeric(poly):
+    """Should poly be solved numerically instead of with sympy.solve()?
+
+    Only if it has float coefficients, exact polynomials may have
+    closed-form roots even of high degree, like x^7 = 1.
+
+    """
+    return any(c.has(sympy.Float) for c in poly.coeffs())
+
+
+def _digits(poly):
+    """Precision (decimal digits) of the float coefficients of poly."""
+    precs = [f._prec for c in poly.coeffs() for f in c.atoms(sympy.Float)]
+    if not precs:
+        return DIGITS
+    return mpmath.libmp.prec_to_dps(min(precs))
+
+
+def _to_sympy(root, digits):
+    re = sympy.Float(root.real, digits)
+    im = sympy.Float(root.imag, digits)
+    if im == 0:
+        return re
+    return re + im * sympy.I
+
+
+def _numeric_roots(poly, digits):
+    """All distinct roots of poly using mpmath.polyroots()."""
+    prec = int(digits * 3.33) + 10 # bits
+    coeffs = [c._to_mpmath(prec) for c in poly.all_coeffs()]
+    with mpmath.workdps(digits):
+        roots = mpmath.polyroots(coeffs,
+                                 maxsteps=50 + 10*poly.degree(),
+                                 cleanup=True,
+                                 extraprec=2*prec)
+    return [_to_sympy(r, digits) for r in roots]
+
+
+def polyroots(poly, digits=None):
+    """Find all roots of poly.
+
+    Exact coefficients are factorized first. Factors of low degree
+    are solved exactly, the remaining ones numerically, by default in
+    the precision of the float coefficients. Returns a list of
+    distinct roots, real roots first, or None if the numerical root
+    finder did not converge.
+
+    """
+    x = poly.gen
+    if digits is None:
+        digits = _digits(poly)
+    if poly.domain.is_ZZ or poly.domain.is_QQ:
+        factors = [f for f, _ in poly.factor_list()[1]]
+    elif poly.domain.is_Exact:
+        factors = [f for f, _ in poly.sqf_list()[1]]
+    else:
+        factors = [poly]
+    roots = []
+    for factor in factors:
+        if factor.degree() < NUMERIC_DEGREE and factor.domain.is_Exact:
+            exact = sympy.roots(factor, x)
+            if sum(exact.values()) == factor.degree():
+                roots.extend(exact.keys())
+                continue
+        try:
+            roots.extend(_numeric_roots(factor, digits))
+        except mpmath.NoConvergence:
+            return None
+    # Remove duplicates, but keep the order.
+    seen = set()
+    unique = []
+    for root in roots:
+        if root not in seen:
+            seen.add(root)
+            unique.append(root)
+    return sorted(unique, key=lambda r: not r.is_real)
+
+
+def rootof_values(exprs, digits):
+    """Numerical values of all CRootOf objects in exprs.
+
+    sympy refines the isolating interval of every CRootOf on its own,
+    which takes minutes at high precision. Here all roots of each
+    polynomial are found at once with mpmath.polyroots() and assigned
+    to the CRootOf objects by their isolating intervals. Returns a
+    dict for xreplace(), or None if polyroots() did not converge.
+
+    """
+    by_poly = collections.defaultdict(set)
+    for expr in exprs:
+        for rootof in expr.atoms(sympy.CRootOf):
+            by_poly[rootof.poly].add(rootof)
+    values = {}
+    for poly, rootofs in by_poly.items():
+        try:
+            roots = _numeric_roots(sympy.Poly(poly), digits)
+        except mpmath.NoConvergence:
+            return None
+        for rootof in rootofs:
+            values[rootof] = _match_interval(rootof, roots)
+    return values
+
+
+def _match_interval(rootof, roots):
+    """The root in the isolating interval of rootof."""
+    def q(x):
+        return sympy.Rational(int(x.numerator), int(x.denominator))
+    interval = rootof._get_interval()
+    if rootof.is_real:
+        lower, upper = q(interval.a), q(interval.b)
+        center = (lower + upper) / 2
+        inside = [r for r in roots if r.is_real and lower <= r <= upper]
+    else:
+        ax, bx = q(interval.ax), q(interval.bx)
+        ay, by = q(interval.ay), q(interval.by)
+        center = (ax + bx) / 2 + (ay + by) / 2 * sympy.I
+        inside = [r for r in roots
+                  if ax <= sympy.re(r) <= bx and ay <= sympy.im(r) <= by]
+    return min(inside or roots, key=lambda r: abs(r - center))
+
+
+def _scan(f, x, lower, upper, points):
+    """Find brackets and starting points for roots of f in the interval.
+
+    Returns a list of (a, b) tuples where f changes sign, and a list
+    of points where |f| has a local minimum.
+
+    """
+    if numpy is not None:
+        xs = numpy.linspace(lower, upper, points)
+        fn = sympy.lambdify(x, f, modules="numpy")
+        with numpy.errstate(all="ignore"):
+            ys = numpy.broadcast_to(numpy.asarray(fn(xs), dtype=complex),
+                                    xs.shape)
+        # Only real function values are useful to find real roots.
+        ys = numpy.where(numpy.abs(ys.imag) <= 1e-12 * numpy.abs(ys.real),
+                         ys.real, numpy.nan)
+        xs, ys = xs.tolist(), ys.tolist()
+    else:
+        step = (upper - lower) / (points - 1)
+        xs = [lower + i*step for i in range(points)]
+        fn = sympy.lambdify(x, f, modules="mpmath")
+        ys = []
+        for xx in xs:
+            try:
+                y = complex(fn(xx))
+            except (ValueError, TypeError, ZeroDivisionError):
+                y = complex("nan")
+            ys.append(y.real if abs(y.imag) <= 1e-12 * abs(y.real)
+                      else float("nan"))
+    brackets = []
+    starts = []
+    for i, y in enumerate(ys):
+        if y != y: # NaN
+            continue
+        if y == 0:
+            starts.append(xs[i])
+            continue
+        if i + 1 < len(ys) and ys[i+1] == ys[i+1] and y * ys[i+1] < 0:
+            brackets.append((xs[i], xs[i+1]))
+        elif (0 < i < len(ys) - 1
+              and abs(y) < abs(ys[i-1]) and abs(y) <= abs(ys[i+1])):
+            # A local minimum of |f| may be a root where f touches zero.
+            starts.append(xs[i])
+    return brackets, starts
+
+
+def _refine(f, x, start, digits):
+    """Refine a root of f from a bracket or a starting point.
+
+    Returns None if no root is found. This runs in the worker
+    processes.
+
+    """
+    try:
+        if isinstance(start, tuple):
+            root = sympy.nsolve(f, x, start, solver="anderson",
+                                prec=digits, verify=False)
+        else:
+            # Modified Newton converges also for multiple roots.
+            root = sympy.nsolve(f, x, start, solver="mnewton",
+                                prec=digits, verify=False)
+    except (ValueError, TypeError, ZeroDivisionError):
+        return None
+    # Reject poles and non-converged results.
+    residual = f.subs(x, root).evalf(digits)
+    if not residual.is_number or abs(residual) > sympy.Float(10)**(-digits//2):
+        return None
+    return root
+
+
+def nsolve_interval(eq, lower, upper, points=SCAN_POINTS, processes=None,
+                    digits=DIGITS):
+    """Numerically find all real roots of eq in [lower, upper].
+
+    The interval is scanned first to find sign changes and minima of
+    |lhs - rhs|. All candidates are refined in parallel in a process
+    pool of the given size (default: number of CPUs). Returns a sorted
+    list of distinct roots, which may be empty.
+
+    """
+    if len(eq.free_symbols) != 1:
+        raise ValueError("Can only solve equations in one variable "
+                         "numerically.")
+    x, = eq.free_symbols
+    f = eq.lhs - eq.rhs
+    brackets, starts = _scan(f, x, float(lower), float(upper), points)
+    candidates = brackets + starts
+    if (len(candidates) < PARALLEL_MIN_CANDIDATES
+        or f.has(unitbridge.Quantity) # pint quantities don't pickle well
+        or processes == 1):
+        roots = [_refine(f, x, c, digits) for c in candidates]
+    else:
+        if processes is None:
+            processes = os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(
+                processes, mp_context=mp_context()) as pool:
+            roots = list(pool.map(_refine,
+                                  *zip(*((f, x, c, digits)
+                                         for c in candidates))))
+    # Remove duplicates and roots outside of the interval.
+    tol = sympy.Float(10)**(-digits//2)
+    unique = []
+    for root in sorted(r for r in roots if r is not None and r.is_real):
+        if not lower - tol <= root <= upper + tol:
+            continue
+        if unique and abs(root - unique[-1]) <= tol * (1 + abs(root)):
+            continue
+        unique.append(root)
+    return unique
+
+
+def mp_context():
+    """The multiprocessing context for worker processes."""
+    if START_METHOD is not None:
+        return multiprocessing.get_context(START_METHOD)
+    # Forking is much cheaper than starting a fresh interpreter which
+    # has to import sympy again.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def use_fork_server():
+    """Start worker processes from a fork server (or spawn them).
+
+    For processes which must not fork themselves, e.g. the GUI. Call
+    this before starting any threads.
+
+    """
+    global START_METHOD
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        START_METHOD = "forkserver"
+        ctx = multiprocessing.get_context(START_METHOD)
+        ctx.set_forkserver_preload([__name__, "psciclib.simplifier"])
+    else:
+        START_METHOD = "spawn"
+
+
+def _symbolic(eq, x):
+    # eq and x are lists for systems of equations.
+    if isinstance(eq, list):
+        return [tuple(sol.get(s, s) for s in x)
+                for sol in sympy.solve(eq, x, dict=True)]
+    return sympy.solve(eq, x)
+
+
+def _solve_worker(kind, eq, x, interval, conn):
+    try:
+        if kind == "symbolic":
+            result = _symbolic(eq, x)
+        elif isinstance(eq, list):
+            result = nsolve_system(eq, x)
+        else:
+            result = nsolve_interval(eq, *interval, processes=1)
+    except NotImplementedError:
+        result = []
+    except Exception as e:
+        conn.send(("error", e))
+    else:
+        conn.send(("ok", result))
+    finally:
+        conn.close()
+
+
+def _receive(conn):
+    try:
+        return conn.recv()
+    except EOFError:
+        # Worker died.
+        return "ok", []
+
+
+class _Race:
+    """sympy.solve() and a numerical solver, each in its own process.
+
+    sympy.solve() is started right away. The numerical solver only
+    follows if sympy has not finished after QUICK_SOLVE seconds.
+    result() collects the winner.
+
+    """
+
+    def __init__(self, eq, x, interval=DEFAULT_INTERVAL):
+        self.eq = eq
+        self.x = x
+        self.interval = interval
+        self.start = time.monotonic()
+        self.procs = []
+        self.cached = exprcache.get("solve", eq, x)
+        if not self.cached:
+            self.symbolic = self._spawn("symbolic")
+
+    def _spawn(self, kind):
+        ctx = mp_context()
+        recv, send = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_solve_worker,
+                           args=(kind, self.eq, self.x, self.interval, send),
+                           daemon=True)
+        proc.start()
+        send.close()
+        self.procs.append((proc, recv))
+        return recv
+
+    def _stop(self):
+        for proc, recv in self.procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+            recv.close()
+
+    def _symbolic_result(self, conn):
+        status, value = _receive(conn)
+        if status == "error":
+            raise value
+        elif value:
+            exprcache.put("solve", value, self.eq, self.x)
+        return value
+
+    def result(self, budget=SOLVE_BUDGET):
+        """Return (solutions, is_numerical, upgrade).
+
+        upgrade is None, or a concurrent.futures.Future for the
+        solutions of sympy if the numerical ones came first. Its
+        result is an empty list if sympy did not find any within
+        budget seconds (counted from the start).
+
+        """
+        if self.cached:
+            return self.cached, False, None
+        handed_over = False
+        try:
+            # All races of a system were started at the same time, so
+            # only the first one really waits here.
+            quick = self.start + QUICK_SOLVE - time.monotonic()
+            if self.symbolic.poll(max(quick, 0.0)):
+                numeric = None
+            else:
+                numeric = self._spawn("numeric")
+                multiprocessing.connection.wait([self.symbolic, numeric])
+            if self.symbolic.poll():
+                solutions = self._symbolic_result(self.symbolic)
+                if solutions:
+                    return solutions, False, None
+                # sympy gave up, only the numerical solver is left.
+                if numeric is None:
+                    numeric = self._spawn("numeric")
+                solutions = self._numeric_result(numeric)
+                return solutions, bool(solutions), None
+            solutions = self._numeric_result(numeric)
+            if not solutions:
+                return self._symbolic_result(self.symbolic), False, None
+            upgrade = concurrent.futures.Future()
+            threading.Thread(target=self._upgrade, args=(budget, upgrade),
+                             daemon=True).start()
+            handed_over = True
+            return solutions, True, upgrade
+        finally:
+            if not handed_over:
+                self._stop()
+
+    @staticmethod
+    def _numeric_result(conn):
+        status, value = _receive(conn)
+        return value if status == "ok" else []
+
+    def _upgrade(self, budget, future):
+        # Runs in its own thread after the numerical solutions were
+        # returned.
+        try:
+            timeout = max(self.start + budget - time.monotonic(), 0.0)
+            solutions = []
+            if self.symbolic.poll(timeout):
+                try:
+                    solutions = self._symbolic_result(self.symbolic)
+                except Exception:
+                    # The numerical solutions stay.
+                    pass
+            future.set_result(solutions)
+        finally:
+            self._stop()
+
+
+def chain(future, fn):
+    """A Future for fn(<result of future>)."""
+    chained = concurrent.futures.Future()
+    def done(f):
+        try:
+            chained.set_result(fn(f.result()))
+        except Exception as e:
+            chained.set_exception(e)
+    future.add_done_callback(done)
+    return chained
+
+
+def _solve_inprocess(eq, x):
+    try:
+        return sympy.solve(eq, x)
+    except NotImplementedError:
+        return []
+
+
+def race_solve(eq, x, interval=None, budget=SOLVE_BUDGET):
+    """Solve eq for x symbolically and numerically at the same time.
+
+    The numerical solver searches for real roots in interval (see
+    nsolve_interval()). Both solvers run in their own process. The
+    numerical solutions are returned as soon as they are there, sympy
+    then gets budget seconds (counted from the start) to improve on
+    them in the background, otherwise it is killed.
+
+    Without an interval, and for polynomials, which sympy solves
+    quickly anyway, there is no race and sympy.solve() is called
+    directly.
+
+    Returns a tuple (solutions, is_numerical, upgrade), upgrade is
+    None or a concurrent.futures.Future for the symbolic solutions,
+    see _Race.result(). Exceptions of sympy.solve() (except
+    NotImplementedError) are re-raised.
+
+    """
+    if interval is None or as_polynomial(eq, x) is not None:
+        return _solve_inprocess(eq, x), False, None
+    return _Race(eq, x, interval).result(budget)
+
+
+def split_system(eqs, syms):
+    """Split a system of equations into independent subsystems.
+
+    Two equations belong to the same subsystem if they share an
+    unknown. Returns a list of (equations, unknowns) tuples, the
+    unknowns in the order of syms.
+
+    """
+    # Union-find over the equations.
+    parent = list(range(len(eqs)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    owner = {}
+    for i, eq in enumerate(eqs):
+        for sym in eq.free_symbols & set(syms):
+            if sym in owner:
+                parent[find(i)] = find(owner[sym])
+            else:
+                owner[sym] = i
+    groups = collections.OrderedDict()
+    for i, eq in enumerate(eqs):
+        groups.setdefault(find(i), []).append(eq)
+    parts = []
+    for group in groups.values():
+        unknowns = set().union(*(eq.free_symbols for eq in group))
+        parts.append((group, [s for s in syms if s in unknowns]))
+    return parts
+
+
+def nsolve_system(eqs, syms, starts=SYSTEM_STARTS, digits=DIGITS):
+    """Numerically solve a system of as many equations as unknowns.
+
+    Newton's method is started from several pseudo-random points in
+    DEFAULT_INTERVAL. Returns a list of distinct real solutions (tuples
+    with one value per unknown), which may be incomplete or empty.
+
+    """
+    if len(eqs) != len(syms):
+        return []
+    fs = [eq.lhs - eq.rhs for eq in eqs]
+    tol = sympy.Float(10)**(-digits//2)
+    rng = random.Random(0) # reproducible
+    solutions = []
+    for _ in range(starts):
+        x0 = [rng.uniform(*DEFAULT_INTERVAL) for _ in syms]
+        try:
+            sol = sympy.nsolve(fs, syms, x0, prec=digits, verify=False)
+        except (ValueError, TypeError, ZeroDivisionError):
+            continue
+        sol = tuple(sol)
+        if not all(v.is_real for v in sol):
+            continue
+        subs = dict(zip(syms, sol))
+        residuals = [f.subs(subs).evalf(digits) for f in fs]
+        if not all(r.is_number and abs(r) <= tol for r in residuals):
+            continue
+        if any(all(abs(a - b) <= tol * (1 + abs(a))
+                   for a, b in zip(sol, other))
+               for other in solutions):
+            continue
+        solutions.append(sol)
+    return sorted(solutions)
+
+
+def _solve_subsystem_inprocess(eqs, syms):
+    try:
+        solutions = sympy.solve(eqs, syms, dict=True)
+    except NotImplementedError:
+        return []
+    return [tuple(sol.get(s, s) for s in syms) for sol in solutions]
+
+
+def solve_system(eqs, syms, budget=SOLVE_BUDGET):
+    """Solve a list of equations for the unknowns syms.
+
+    The system is split into independent subsystems (see
+    split_system()), which are solved concurrently, each one racing
+    sympy.solve() against nsolve_system() like race_solve() does.
+    Unlike race_solve(), this waits for the symbolic upgrades, all
+    parts are needed for the combined solutions.
+
+    Returns a tuple (unknowns, solutions, is_numerical), where
+    solutions is a list of tuples with one value per unknown. Unknowns
+    that are left undetermined by all solutions are dropped.
+
+    """
+    parts = split_system(eqs, syms)
+    if any(eq.has(unitbridge.Quantity) for eq in eqs):
+        # Can't send those to another process.
+        results = [(_solve_subsystem_inprocess(p_eqs, p_syms), False)
+                   for p_eqs, p_syms in parts]
+    else:
+        # Start all races before waiting for the first one.
+        races = []
+        for p_eqs, p_syms in parts:
+            if len(p_eqs) == 1 and len(p_syms) == 1:
+                races.append(_Race(p_eqs[0], p_syms[0]))
+            else:
+                races.append(_Race(p_eqs, p_syms))
+        outcomes = [race.result(budget) for race in races]
+        results = []
+        for race, (solutions, is_numerical, upgrade) in zip(races,
+                                                            outcomes):
+            if upgrade is not None and upgrade.result():
+                solutions, is_numerical = upgrade.result(), False
+            if not isinstance(race.eq, list):
+                solutions = [(sol,) for sol in solutions]
+            results.append((solutions, is_numerical))
+    unknowns = [s for _, p_syms in parts for s in p_syms]
+    solutions = [sum(map(tuple, combination), ())
+                 for combination
+                 in itertools.product(*(r[0] for r in results))]
+    # Back into the requested order, without undetermined unknowns.
+    order = [unknowns.index(s) for s in syms
+             if s in unknowns and any(sol[unknowns.index(s)] != s
+                                      for sol in solutions)]
+    return (tuple(unknowns[i] for i in order),
+            [tuple(sol[i] for i in order) for sol in solutions],
+            any(r[1] for r in results))
@@ -0,0 +1,185 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Statistics over all cells of a vector or matrix.
+
+Numeric data (NumPy arrays from load() or big literals, and anything
+with more than SMALL_SIZE cells) is handled by NumPy, the rest by sympy
+so that exact and symbolic input gives exact results. Like in
+linalg, a common unit of the cells is taken out first.
+
+"""
+
+import sympy
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import unitbridge
+from .linalg import Magnitudes
+
+
+# Up to this many cells, sympy data is not converted to NumPy.
+SMALL_SIZE = 1000
+
+
+class _Data:
+    """The cells of a matrix, either as a 1d NumPy array or a list."""
+
+    def __init__(self, M, name):
+        m = Magnitudes(M)
+        if m.unit is None:
+            raise ValueError("{}() needs all cells to have compatible units"
+                             "".format(name))
+        self.unit = m.unit
+        self.array = None
+        self.cells = None
+        if m.kind == "numpy":
+            self.array = m.values.ravel()
+        elif (m.kind != "symbolic" and numpy is not None
+              and m.rows * m.cols > SMALL_SIZE):
+            try:
+                self.array = numpy.array([float(x) for x in m.values])
+            except TypeError:
+                raise ValueError("{}() needs real numbers".format(name))
+        else:
+            self.cells = list(m.values)
+        self.n = len(self.array) if self.array is not None \
+                 else len(self.cells)
+
+    def sorted_cells(self, name):
+        if any(not (x.is_number and x.is_real) for x in self.cells):
+            raise ValueError("{}() needs real numbers".format(name))
+        return sorted(self.cells)
+
+    def result(self, x, power=1):
+        """Attach the unit (to the given power) to x."""
+        return _with_unit(x, self.unit ** power if power != 1 else self.unit)
+
+
+def _with_unit(x, unit):
+    if numpy is not None and isinstance(x, numpy.generic):
+        x = sympy.Float(float(x))
+    if unit.is_dimensionless:
+        return x * unit.scale
+    return unitbridge.Quantity._new(x, unit)
+
+
+def sum_(M):
+    d = _Data(M, "sum")
+    if d.array is not None:
+        return d.result(numpy.sum(d.array))
+    return d.result(sympy.Add(*d.cells))
+
+
+def mean(M):
+    d = _Data(M, "mean")
+    if d.array is not None:
+        return d.result(numpy.mean(d.array))
+    return d.result(sympy.Add(*d.cells) / d.n)
+
+
+def median(M):
+    d = _Data(M, "median")
+    if d.array is not None:
+        return d.result(numpy.median(d.array))
+    cells = d.sorted_cells("median")
+    mid = d.n // 2
+    if d.n % 2:
+        return d.result(cells[mid])
+    return d.result((cells[mid - 1] + cells[mid]) / 2)
+
+
+def var(M):
+    """Sample variance (divided by n - 1)."""
+    d = _Data(M, "var")
+    if d.n < 2:
+        raise ValueError("var() needs at least two values")
+    if d.array is not None:
+        return d.result(numpy.var(d.array, ddof=1), 2)
+    m = sympy.Add(*d.cells) / d.n
+    return d.result(sympy.Add(*[(x - m)**2 for x in d.cells]) / (d.n - 1),
+                    2)
+
+
+def std(M):
+    """Sample standard deviation (divided by n - 1)."""
+    d = _Data(M, "std")
+    if d.n < 2:
+        raise ValueError("std() needs at least two values")
+    if d.array is not None:
+        return d.result(numpy.std(d.array, ddof=1))
+    m = sympy.Add(*d.cells) / d.n
+    return d.result(sympy.sqrt(sympy.Add(*[(x - m)**2 for x in d.cells])
+                               / (d.n - 1)))
+
+
+def min_(M):
+    d = _Data(M, "min")
+    if d.array is not None:
+        return d.result(numpy.min(d.array))
+    return d.result(sympy.Min(*d.cells))
+
+
+def max_(M):
+    d = _Data(M, "max")
+    if d.array is not None:
+        return d.result(numpy.max(d.array))
+    return d.result(sympy.Max(*d.cells))
+
+
+def percentile(M, p):
+    """p-th percentile, interpolated linearly like NumPy does."""
+    d = _Data(M, "percentile")
+    p = sympy.sympify(p)
+    if not (p.is_number and p.is_real and 0 <= p <= 100):
+        raise ValueError("percentile() needs a number between 0 and 100")
+    if d.array is not None:
+        return d.result(numpy.percentile(d.array, float(p)))
+    cells = d.sorted_cells("percentile")
+    h = (d.n - 1) * p / 100
+    lower = int(sympy.floor(h))
+    if lower + 1 >= d.n:
+        return d.result(cells[-1])
+    return d.result(cells[lower] + (h - lower) * (cells[lower + 1]
+                                                  - cells[lower]))
+
+
+def linreg(x, y):
+    """Least squares fit y = a x + b, returns the vector [a; b]."""
+    dx, dy = _Data(x, "linreg"), _Data(y, "linreg")
+    if dx.n != dy.n:
+        raise ValueError("linreg() needs x and y of the same length")
+    elif dx.n < 2:
+        raise ValueError("linreg() needs at least two points")
+    if dx.array is not None or dy.array is not None:
+        xs = dx.array if dx.array is not None \
+             else numpy.array([float(v) for v in dx.cells])
+        ys = dy.array if dy.array is not None \
+             else numpy.array([float(v) for v in dy.cells])
+        a, b = numpy.polyfit(xs, ys, 1)
+    else:
+        n = dx.n
+        sx, sy = sympy.Add(*dx.cells), sympy.Add(*dy.cells)
+        sxx = sympy.Add(*[v**2 for v in dx.cells])
+        sxy = sympy.Add(*[u * v for u, v in zip(dx.cells, dy.cells)])
+        denominator = n * sxx - sx**2
+        if denominator == 0:
+            raise ValueError("linreg() needs at least two different x")
+        a = (n * sxy - sx * sy) / denominator
+        b = (sy - a * sx) / n
+    return sympy.ImmutableMatrix([_with_unit(a, dy.unit / dx.unit),
+                                  dy.result(b)])
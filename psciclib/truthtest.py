@@ -0,0 +1,68 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cheap tests if an equality is true or false.
+
+Only if those fail do we need the expensive simplify()/solve() path.
+
+"""
+
+import enum
+
+import sympy
+
+from . import interval
+from . import unitbridge
+
+
+@enum.unique
+class Truth(enum.Enum):
+    true = 1
+    false = 2
+    equation = 3 # certainly not an identity, needs to be solved
+    unknown = 4
+
+
+def _is_plain(expr):
+    return (isinstance(expr, sympy.Basic)
+            and not expr.has(unitbridge.Quantity)
+            and not isinstance(expr, sympy.MatrixBase))
+
+
+def decide(lhs, rhs):
+    """Try to decide lhs = rhs cheaply, returns a Truth."""
+    lhs, rhs = sympy.sympify(lhs), sympy.sympify(rhs)
+    # Structural equality.
+    if isinstance(lhs, sympy.Basic) and isinstance(rhs, sympy.Basic):
+        if lhs is rhs or sympy.Basic.__eq__(lhs, rhs):
+            return Truth.true
+    if not (_is_plain(lhs) and _is_plain(rhs)):
+        return Truth.unknown
+    diff = lhs - rhs
+    if diff.is_number:
+        # Numeric evaluation with error bounds can only prove
+        # inequality.
+        if interval.excludes_zero(diff):
+            return Truth.false
+        return Truth.unknown
+    # Polynomial difference.
+    if diff.is_polynomial() and not diff.has(sympy.Float):
+        poly = sympy.Poly(diff, *sorted(diff.free_symbols, key=str))
+        if poly.is_zero:
+            return Truth.true
+        elif poly.is_ground:
+            return Truth.false
+        return Truth.equation
+    return Truth.unknown
@@ -0,0 +1,154 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Numbers with uncertainty, e.g., 9.81 ± 0.02 m/s².
+
+A number with uncertainty is a sympy symbol (UncertainValue) which
+knows its value and standard uncertainty. The calculation is done
+symbolically, so that using the same value twice is correctly
+correlated. At the end, the uncertainty is propagated either
+
+  * linearly (first order): σ² = Σ (∂f/∂xᵢ σᵢ)², which is exact for
+    rational input, or
+  * by Monte-Carlo sampling: the expression is compiled with lambdify
+    and evaluated once on NumPy arrays of normally distributed
+    samples.
+
+Linear propagation gives the final PlusMinus(mean, std) object.
+Monte-Carlo gives a new UncertainValue(mean, std), so that further
+calculations with it work like with any other uncertain number. It is
+independent of the values it was sampled from, so montecarlo(a) - a
+does not cancel.
+
+"""
+
+import sympy
+from mpmath.libmp import prec_to_dps
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import unitbridge
+
+
+# Number of samples for Monte-Carlo propagation.
+SAMPLES = 100000
+
+# Fixed, so that the same input always gives the same result.
+SEED = 0
+
+
+class UncertainValue(sympy.Dummy):
+    """value ± sigma, normally distributed."""
+
+    def __new__(cls, value, sigma):
+        obj = super().__new__(cls, "u", real=True)
+        obj.value = sympy.sympify(value)
+        obj.sigma = sympy.sympify(sigma)
+        return obj
+
+    def _sympystr(self, printer):
+        return "({} ± {})".format(printer._print(self.value),
+                                  printer._print(self.sigma))
+
+
+class PlusMinus(sympy.Expr):
+    """The result of uncertainty propagation: mean ± std."""
+
+    def __new__(cls, mean, std):
+        return super().__new__(cls, sympy.sympify(mean), sympy.sympify(std))
+
+    @property
+    def mean(self):
+        return self.args[0]
+
+    @property
+    def std(self):
+        return self.args[1]
+
+    def _eval_evalf(self, prec):
+        dps = prec_to_dps(prec)
+        return self.func(self.mean.evalf(dps), self.std.evalf(dps))
+
+    def _sympystr(self, printer):
+        return "({} ± {})".format(printer._print(self.mean),
+                                  printer._print(self.std))
+
+
+def has_uncertainty(value):
+    if isinstance(value, unitbridge.Quantity):
+        value = value.magnitude
+    return isinstance(value, sympy.Basic) and value.has(UncertainValue)
+
+
+def _uncertain_values(expr):
+    # Sorted, so that the Monte-Carlo samples are reproducible.
+    return sorted(expr.atoms(UncertainValue), key=lambda u: u.dummy_index)
+
+
+def _apply(fn, value):
+    """Apply fn to every expression with uncertain values in value."""
+    if isinstance(value, unitbridge.Quantity):
+        if has_uncertainty(value):
+            return value.replace_magnitude(fn(value.magnitude))
+        return value
+    elif isinstance(value, sympy.MatrixBase):
+        return value.applyfunc(lambda x: _apply(fn, x))
+    elif isinstance(value, sympy.Basic) and value.has(UncertainValue):
+        return fn(value)
+    return value
+
+
+def _linear(expr):
+    uvalues = _uncertain_values(expr)
+    subs = {u: u.value for u in uvalues}
+    mean = expr.xreplace(subs)
+    variance = sympy.Add(*[(sympy.diff(expr, u).xreplace(subs) * u.sigma)**2
+                           for u in uvalues])
+    return PlusMinus(mean, sympy.sqrt(variance))
+
+
+def _monte_carlo(expr):
+    uvalues = _uncertain_values(expr)
+    if expr.free_symbols - set(uvalues):
+        raise ValueError("montecarlo() only works with numbers")
+    f = sympy.lambdify(uvalues, expr, "numpy")
+    rng = numpy.random.default_rng(SEED)
+    samples = [rng.normal(float(u.value), float(u.sigma), SAMPLES)
+               for u in uvalues]
+    with numpy.errstate(all="ignore"):
+        y = numpy.broadcast_to(f(*samples), (SAMPLES,))
+    if numpy.iscomplexobj(y):
+        if numpy.any(y.imag != 0):
+            raise ValueError("montecarlo() only works with real results")
+        y = y.real
+    if not numpy.all(numpy.isfinite(y)):
+        raise ValueError("montecarlo(): the result is not finite for some "
+                         "samples")
+    return UncertainValue(sympy.Float(float(numpy.mean(y))),
+                          sympy.Float(float(numpy.std(y, ddof=1))))
+
+
+def linear(value):
+    """Propagate uncertainties to first order."""
+    return _apply(_linear, value)
+
+
+def monte_carlo(value):
+    """Propagate uncertainties by sampling."""
+    if numpy is None:
+        raise ValueError("montecarlo() needs NumPy")
+    return _apply(_monte_carlo, value)
@@ -0,0 +1,288 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Numeric matrices with a unit.
+
+A sympy matrix of Quantity objects does all unit checks and arithmetic
+cell by cell. If all cells are numbers with units of the same
+dimensions, we instead store a NumPy array plus one shared unit and
+let NumPy do the work. Operators which can't handle these convert them
+back to sympy with to_sympy().
+
+"""
+
+import sympy
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .units import ureg
+from .exceptions import DimensionMismatchError
+from . import unitbridge
+from . import unitvec
+
+
+def _is_float(x):
+    """True for Floats and complex numbers made of Floats."""
+    if isinstance(x, sympy.Float):
+        return True
+    elif not (isinstance(x, sympy.Basic) and x.is_number):
+        return False
+    parts = x.as_real_imag()
+    return (all(isinstance(p, sympy.Float) or p == 0 for p in parts)
+            and any(isinstance(p, sympy.Float) for p in parts))
+
+
+class UnitArray:
+    """A float64 or complex128 matrix, all cells have the same unit.
+
+    array: 2d NumPy array
+    unit: unitvec.UnitVec
+
+    Like sympy matrices, * is the matrix product.
+
+    """
+
+    # Higher than unitbridge.Quantity, so that sympy and Quantity
+    # hand over to our operators.
+    _op_priority = 20000.0
+
+    def __init__(self, array, unit):
+        self.array = array
+        self.unit = unit
+
+    @classmethod
+    def from_cells(cls, rows):
+        """Create from a list of rows of evaluated cells.
+
+        Returns None if this is not possible, e.g., because a cell is
+        symbolic, exact, or has no unit. Exact numbers stay with sympy,
+        float64 would round them.
+
+        """
+        if numpy is None or not rows or not rows[0]:
+            return None
+        cells = [cell for row in rows for cell in row]
+        unit = None
+        values = []
+        for cell in cells:
+            if not isinstance(cell, unitbridge.Quantity) \
+               or cell._unit is None:
+                return None
+            mag = cell.magnitude
+            if not _is_float(mag):
+                return None
+            if unit is None:
+                unit = cell._unit
+            elif not cell._unit.same_dimensions(unit):
+                return None
+            values.append(cell._converted_magnitude(unit)
+                          if cell._unit is not unit else mag)
+        try:
+            values = [complex(v) if not v.is_real else float(v)
+                      for v in values]
+        except TypeError:
+            return None
+        array = numpy.array(values).reshape(len(rows), len(rows[0]))
+        return cls(array, unit)
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    def to_sympy(self):
+        """sympy.ImmutableMatrix of Quantity objects."""
+        def cell(x):
+            if numpy.iscomplexobj(x):
+                x = sympy.Float(x.real) + sympy.I * sympy.Float(x.imag)
+            else:
+                x = sympy.Float(float(x))
+            if self.unit.is_dimensionless:
+                return x * self.unit.scale
+            return unitbridge.Quantity._new(x, self.unit)
+        return sympy.ImmutableMatrix(
+            [[cell(x) for x in row] for row in self.array]
+        )
+
+    def convert_to(self, unit):
+        if isinstance(unit, unitbridge.Quantity) and unit._unit is not None:
+            target = unit._unit
+            factor = 1 / unit.magnitude
+        else:
+            target = unitvec.UnitVec.from_pint(
+                ureg.parse_units(unit) if isinstance(unit, str) else unit
+            )
+            factor = 1
+        if not self.unit.same_dimensions(target):
+            raise DimensionMismatchError(
+                detail="cannot convert {:~} to {:~}".format(self.unit.pint,
+                                                           target.pint)
+            )
+        factor = complex(factor * self.unit.scale / target.scale)
+        return self.__class__(self.array * _real(factor), target)
+
+    def transpose(self):
+        return self.__class__(self.array.T, self.unit)
+
+    # Arithmetic.
+
+    def _other(self, other):
+        """Return (array or scalar, UnitVec) for other, or None."""
+        if isinstance(other, UnitArray):
+            return other.array, other.unit
+        elif isinstance(other, unitbridge.Quantity) \
+             and other._unit is not None and other.magnitude.is_number:
+            return _real(complex(other.magnitude)), other._unit
+        elif isinstance(other, (int, float, complex)):
+            return other, unitvec.DIMENSIONLESS
+        elif isinstance(other, sympy.Basic) and other.is_number:
+            return _real(complex(other)), unitvec.DIMENSIONLESS
+        elif isinstance(other, sympy.MatrixBase) and other.is_Matrix:
+            other = UnitArray.from_cells(
+                [[_as_quantity(x) for x in other.row(i)]
+                 for i in range(other.rows)]
+            )
+            if other is not None:
+                return other.array, other.unit
+        return None
+
+    def _add(self, other, sign):
+        o = self._other(other)
+        if o is None or numpy.ndim(o[0]) == 0:
+            # Symbolic, or matrix + scalar, which sympy doesn't allow
+            # either.
+            return None
+        array, unit = o
+        if array.shape != self.array.shape:
+            raise sympy.ShapeError("Matrix size mismatch: {} + {}"
+                                   "".format(self.shape, array.shape))
+        if not unit.same_dimensions(self.unit):
+            raise DimensionMismatchError(
+                detail="cannot add {:~} and {:~}".format(self.unit.pint,
+                                                         unit.pint)
+            )
+        factor = unit.scale / self.unit.scale
+        if factor != 1:
+            array = array * float(factor)
+        return self.__class__(self.array + sign * array, self.unit)
+
+    def __add__(self, other):
+        retval = self._add(other, 1)
+        if retval is None:
+            return self.to_sympy() + other
+        return retval
+
+    def __radd__(self, other):
+        retval = self._add(other, 1)
+        if retval is None:
+            return other + self.to_sympy()
+        return retval
+
+    def __sub__(self, other):
+        retval = self._add(other, -1)
+        if retval is None:
+            return self.to_sympy() - other
+        return retval
+
+    def __rsub__(self, other):
+        retval = self._add(other, -1)
+        if retval is None:
+            return other - self.to_sympy()
+        return -retval
+
+    def __neg__(self):
+        return self.__class__(-self.array, self.unit)
+
+    def __pos__(self):
+        return self
+
+    def _mul(self, a, b, unit):
+        if numpy.ndim(a) == 0 or numpy.ndim(b) == 0:
+            return self.__class__(a * b, unit)
+        if a.shape[1] != b.shape[0]:
+            raise sympy.ShapeError("Matrix size mismatch: {} * {}"
+                                   "".format(a.shape, b.shape))
+        return self.__class__(a @ b, unit)
+
+    def __mul__(self, other):
+        o = self._other(other)
+        if o is None:
+            return self.to_sympy() * other
+        return self._mul(self.array, o[0], self.unit * o[1])
+
+    def __rmul__(self, other):
+        o = self._other(other)
+        if o is None:
+            return other * self.to_sympy()
+        return self._mul(o[0], self.array, o[1] * self.unit)
+
+    def __truediv__(self, other):
+        o = self._other(other)
+        if o is None or numpy.ndim(o[0]) != 0:
+            return self.to_sympy() / other
+        return self.__class__(self.array / o[0], self.unit / o[1])
+
+    def __rtruediv__(self, other):
+        return other / self.to_sympy()
+
+    def __pow__(self, other):
+        if isinstance(other, sympy.Integer) or isinstance(other, int):
+            n = int(other)
+            rows, cols = self.shape
+            if rows != cols:
+                raise sympy.NonSquareMatrixError()
+            if n >= 0:
+                return self.__class__(
+                    numpy.linalg.matrix_power(self.array, n),
+                    self.unit ** n
+                )
+        return self.to_sympy() ** other
+
+    def __rpow__(self, other):
+        return other ** self.to_sympy()
+
+    def __eq__(self, other):
+        if isinstance(other, UnitArray):
+            return (self.unit == other.unit
+                    and numpy.array_equal(self.array, other.array))
+        return self.to_sympy() == other
+
+    def __hash__(self):
+        return hash((self.array.tobytes(), self.unit))
+
+    def __str__(self):
+        return str(self.to_sympy())
+
+    def __repr__(self):
+        return "UnitArray({!r}, {!r})".format(self.array, self.unit)
+
+
+def _real(z):
+    return z.real if z.imag == 0 else z
+
+
+def _as_quantity(x):
+    # Numbers in a plain sympy matrix are dimensionless quantities.
+    if isinstance(x, unitbridge.Quantity):
+        return x
+    return unitbridge.Quantity._new(x, unitvec.DIMENSIONLESS)
+
+
+def to_sympy(value):
+    """Convert value to sympy if it is a UnitArray."""
+    if isinstance(value, UnitArray):
+        return value.to_sympy()
+    return value
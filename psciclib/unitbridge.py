@@ -20,13 +20,19 @@ from sympy.core import AtomicExpr
 from sympy.core.decorators import call_highest_priority
 
 from .units import ureg, Q_
+from . import unitvec
+from .exceptions import DimensionMismatchError
+from . import dimensions
 
 
 class Quantity(AtomicExpr):
     is_positive = True    # make sqrt(m**2) --> m
     is_commutative = True
 
-    __slots__ = ["quantity", "_str_rep"]
+    # Units are stored as UnitVec, arithmetic does not go through
+    # pint. Offset units (°C) can't be represented like that, for
+    # those _unit is None and pint does the work.
+    __slots__ = ["_magnitude", "_unit", "_quantity", "_str_rep"]
 
     # Use my operators! This may be replaced in the future, have a
     # look at sympy development.
@@ -35,18 +41,51 @@ class Quantity(AtomicExpr):
     def __new__(cls, quantity, **assumptions):
         # Also make this a "copy operator".
         if isinstance(quantity, cls):
+            if quantity._unit is not None and not assumptions:
+                return cls._new(quantity._magnitude, quantity._unit)
             quantity = quantity.quantity
         # Start creating a new object.
         obj = super().__new__(cls, **assumptions)
         if not isinstance(quantity, Q_):
             raise TypeError("quantity must be a pint Quantity.")
-        obj.quantity = Q_(sympy.sympify(quantity.magnitude),
-                          quantity.units)
-        obj._str_rep = ("{:~}".format(quantity))
+        magnitude = quantity.magnitude
+        if isinstance(magnitude, sympy.Basic):
+            obj._magnitude = magnitude
+            obj._quantity = quantity
+        else:
+            obj._magnitude = sympy.sympify(magnitude)
+            obj._quantity = None
+        try:
+            obj._unit = unitvec.UnitVec.from_pint(quantity.units)
+        except dimensions.Unsupported:
+            obj._unit = None
+            obj._quantity = Q_(obj._magnitude, quantity.units)
+        # The string is only rendered when it is needed, most
+        # intermediate results are never printed.
+        obj._str_rep = None
+        return obj
+
+    @classmethod
+    def _new(cls, magnitude, unit):
+        """Fast constructor from a sympy magnitude and a UnitVec."""
+        obj = AtomicExpr.__new__(cls)
+        obj._magnitude = magnitude
+        obj._unit = unit
+        obj._quantity = None
+        obj._str_rep = None
         return obj
 
+    @property
+    def quantity(self):
+        """The pint Quantity."""
+        if self._quantity is None:
+            self._quantity = Q_(self._magnitude, self._unit.pint)
+        return self._quantity
+
     def __str__(self):
-        return "{:~}".format(self.quantity)
+        if self._str_rep is None:
+            self._str_rep = "{:~}".format(self.quantity)
+        return self._str_rep
 
     def _sympystr(self, printer):
         # TODO: parenthesis :-(
@@ -54,20 +93,58 @@ class Quantity(AtomicExpr):
 
     @property
     def magnitude(self):
-        return self.quantity.magnitude
+        return self._magnitude
 
     @property
     def units(self):
-        return self.quantity.units
+        if self._unit is None:
+            return self.quantity.units
+        return self._unit.pint
 
     @property
     def unity_quantity(self):
         """Return self as a quantity where the magnitude in int(1)."""
-        return Q_(1, self.quantity.units)
+        return Q_(1, self.units)
+
+    def _compact(self, other=None):
+        """Can we skip pint?"""
+        return (self._unit is not None
+                and (not isinstance(other, Quantity)
+                     or other._unit is not None))
+
+    def _dimensionless_value(self):
+        # Like pint's .to(ureg.dimensionless).magnitude.
+        if self._unit.has_dimensions:
+            raise DimensionMismatchError(
+                self, "cannot convert {:~} to dimensionless"
+                "".format(self.units)
+            )
+        return self._magnitude * self._unit.scale
+
+    def _converted_magnitude(self, unit):
+        # Magnitude of self in the given UnitVec.
+        if not self._unit.same_dimensions(unit):
+            raise DimensionMismatchError(
+                self, "cannot convert {:~} to {:~}".format(self.units,
+                                                          unit.pint)
+            )
+        if self._unit is unit:
+            return self._magnitude
+        return self._magnitude * (self._unit.scale / unit.scale)
 
     def convert_to(self, unit):
         if isinstance(unit, self.__class__):
+            if self._compact(unit) and unit.magnitude == 1:
+                return self._new(self._converted_magnitude(unit._unit),
+                                 unit._unit)
             unit = unit.quantity
+        elif isinstance(unit, str) and self._compact():
+            try:
+                target = unitvec.UnitVec.from_pint(ureg.Unit(unit))
+            except dimensions.Unsupported:
+                target = None
+            if target is not None:
+                return self._new(self._converted_magnitude(target), target)
         # Get conversion factor (need that to get more precise floats, sadly).
         from_unit = Q_(1, self.quantity.units)
         factor = from_unit.to(unit).magnitude
@@ -79,18 +156,23 @@ class Quantity(AtomicExpr):
 
     def replace_magnitude(self, new_magnitude):
         """Return quantity with same unit but different magnitude."""
+        if self._compact():
+            return self._new(sympy.sympify(new_magnitude), self._unit)
         return self.__class__(Q_(new_magnitude, self.units))
 
-    def __abs__(self):
-        return self.__class__(Q_(sympy.Abs(self.magnitude), self.units))
-
     @call_highest_priority("__radd__")
     def __add__(self, other):
         if isinstance(other, sympy.Basic) and other.is_number:
             # Adding only works with the same units!
+            if self._compact():
+                return self._dimensionless_value() + other
             q = self.quantity.to(ureg.dimensionless).magnitude
             return q + other
         elif isinstance(other, self.__class__):
+            if self._compact(other):
+                return self._new(self._magnitude
+                                 + other._converted_magnitude(self._unit),
+                                 self._unit)
             # Pint can handle summing to physical quantities.
             return self.__class__(self.quantity + other.quantity)
         else:
@@ -101,9 +183,15 @@ class Quantity(AtomicExpr):
     def __radd__(self, other):
         if isinstance(other, sympy.Basic) and other.is_number:
             # Adding only works with the same units!
+            if self._compact():
+                return other + self._dimensionless_value()
             q = self.quantity.to(ureg.dimensionless).magnitude
             return other + q
         elif isinstance(other, self.__class__):
+            if self._compact(other):
+                return self._new(other._magnitude
+                                 + self._converted_magnitude(other._unit),
+                                 other._unit)
             # Pint can handle summing to physical quantities.
             return self.__class__(other.quantity + self.quantity)
         else:
@@ -114,9 +202,15 @@ class Quantity(AtomicExpr):
     def __sub__(self, other):
         if isinstance(other, sympy.Basic) and other.is_number:
             # Adding only works with the same units!
+            if self._compact():
+                return self._dimensionless_value() - other
             q = self.quantity.to(ureg.dimensionless).magnitude
             return q - other
         elif isinstance(other, self.__class__):
+            if self._compact(other):
+                return self._new(self._magnitude
+                                 - other._converted_magnitude(self._unit),
+                                 self._unit)
             # Pint can handle summing to physical quantities.
             return self.__class__(self.quantity - other.quantity)
         else:
@@ -127,9 +221,15 @@ class Quantity(AtomicExpr):
     def __rsub__(self, other):
         if isinstance(other, sympy.Basic) and other.is_number:
             # Adding only works with the same units!
+            if self._compact():
+                return other - self._dimensionless_value()
             q = self.quantity.to(ureg.dimensionless).magnitude
             return other - q
         elif isinstance(other, self.__class__):
+            if self._compact(other):
+                return self._new(other._magnitude
+                                 - self._converted_magnitude(other._unit),
+                                 other._unit)
             # Pint can handle summing to physical quantities.
             return self.__class__(other.quantity - self.quantity)
         else:
@@ -139,7 +239,12 @@ class Quantity(AtomicExpr):
     @call_highest_priority("__rmul__")
     def __mul__(self, other):
         if isinstance(other, self.__class__):
+            if self._compact(other):
+                return self._new(self._magnitude * other._magnitude,
+                                 self._unit * other._unit)
             return self.__class__(self.quantity * other.quantity)
+        elif self._compact():
+            return self._new(self._magnitude * other, self._unit)
         else:
             return self.__class__(
                 Q_(self.quantity.magnitude * other, self.quantity.units)
@@ -148,7 +253,12 @@ class Quantity(AtomicExpr):
     @call_highest_priority("__mul__")
     def __rmul__(self, other):
         if isinstance(other, self.__class__):
+            if self._compact(other):
+                return self._new(other._magnitude * self._magnitude,
+                                 other._unit * self._unit)
             return self.__class__(other.quantity * self.quantity)
+        elif self._compact():
+            return self._new(other * self._magnitude, self._unit)
         else:
             return self.__class__(
                 Q_(other * self.quantity.magnitude, self.quantity.units)
@@ -157,7 +267,12 @@ class Quantity(AtomicExpr):
     @call_highest_priority("__rmul__")
     def __truediv__(self, other):
         if isinstance(other, self.__class__):
+            if self._compact(other):
+                return self._new(self._magnitude / other._magnitude,
+                                 self._unit / other._unit)
             return self.__class__(self.quantity / other.quantity)
+        elif self._compact():
+            return self._new(self._magnitude / other, self._unit)
         else:
             return self.__class__(
                 Q_(self.quantity.magnitude / other, self.quantity.units)
@@ -167,7 +282,12 @@ class Quantity(AtomicExpr):
     @call_highest_priority("__mul__")
     def __rtruediv__(self, other):
         if isinstance(other, self.__class__):
+            if self._compact(other):
+                return self._new(other._magnitude / self._magnitude,
+                                 other._unit / self._unit)
             return self.__class__(other.quantity / self.quantity)
+        elif self._compact():
+            return self._new(other / self._magnitude, self._unit ** -1)
         else:
             return self.__class__(
                 Q_(other / self.quantity.magnitude, self.quantity.units ** (-1))
@@ -178,26 +298,35 @@ class Quantity(AtomicExpr):
     def __pow__(self, other):
         # Try to unwrap a quantity.
         if isinstance(other, self.__class__):
-            other = other.quantity.to(ureg.dimensionless).magnitude
-        # Convert number to float if possible.
-        if (isinstance(other, sympy.Basic)
-            and other.is_number and other.is_real and other.is_finite):
-            exp = float(other)
-        elif isinstance(other, (int, float)):
-            exp = other
-        else:
+            if other._compact():
+                other = other._dimensionless_value()
+            else:
+                other = other.quantity.to(ureg.dimensionless).magnitude
+        if isinstance(other, (int, float)):
+            other = sympy.sympify(other)
+        if not (isinstance(other, sympy.Basic)
+                and other.is_number and other.is_real and other.is_finite):
             # Raising to the power of something weird, stay symbolic.
             return super().__pow__(other)
-        return self.__class__(self.quantity ** exp)
+        if self._compact():
+            # Rational exponents stay exact.
+            exp = other if other.is_Rational else sympy.Float(other)
+            return self._new(self._magnitude ** exp, self._unit ** exp)
+        return self.__class__(self.quantity ** float(other))
 
     @call_highest_priority("__pow__")
     def __rpow__(self, other):
         # Try to convert to dimensionless.
-        u = self.quantity.to(ureg.dimensionless).magnitude
+        if self._compact():
+            u = self._dimensionless_value()
+        else:
+            u = self.quantity.to(ureg.dimensionless).magnitude
         # Raise.
         return other ** u
 
     def __abs__(self):
+        if self._compact():
+            return self._new(abs(self._magnitude), self._unit)
         return self.__class__(abs(self.quantity))
 
     def __eq__(self, other):
@@ -205,6 +334,12 @@ class Quantity(AtomicExpr):
         if isinstance(other, self.__class__):
             # TODO: 0kg != 0cm is not consistent with below, is
             # that OK??? Qalculate does it like this.
+            if self._compact(other):
+                return (self._unit.same_dimensions(other._unit)
+                        and bool(sympy.Eq(
+                            self._magnitude * self._unit.scale,
+                            other._magnitude * other._unit.scale
+                        ) is sympy.S.true))
             return self.quantity == other.quantity
         elif (
                 (
@@ -229,11 +364,14 @@ class Quantity(AtomicExpr):
     def __hash__(self):
         return hash(
             (self.__class__.__name__,
-             self.quantity.magnitude,
-             self.quantity.units)
+             self.magnitude,
+             self.units)
         )
 
     def evalf(self, *args, **kwargs):
+        if self._compact():
+            return self._new(self._magnitude.evalf(*args, **kwargs),
+                             self._unit)
         return self.__class__(Q_(self.quantity.magnitude.evalf(*args, **kwargs),
                                  self.quantity.units))
     n = evalf
@@ -0,0 +1,173 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Compact internal representation of units.
+
+A unit is stored as a vector of exponents over the base units plus an
+exact scale factor to those base units, e.g., km/h = 5/18 m s^-1.
+Multiplying, dividing, and comparing units is then cheap arithmetic on
+small tuples. pint is only needed to parse unit names and to print
+units; for printing we remember which pint units a unit was built
+from.
+
+"""
+
+import functools
+import itertools
+import operator
+
+import sympy
+
+from .units import ureg
+from . import dimensions
+
+
+# Position of every base unit in the exponent vectors. This only
+# grows (currencies may be defined late), shorter vectors are padded
+# with zeros.
+_base_index = {}
+
+
+def _position(name):
+    if name not in _base_index:
+        _base_index[name] = len(_base_index)
+    return _base_index[name]
+
+
+@functools.lru_cache(maxsize=None)
+def _is_dimensionless(pos):
+    name = next(name for name, p in _base_index.items() if p == pos)
+    return ureg.Unit(name).dimensionless
+
+
+def _trim(exps):
+    exps = list(exps)
+    while exps and exps[-1] == 0:
+        exps.pop()
+    return tuple(exps)
+
+
+class UnitVec:
+    """A unit as exponent vector and exact scale.
+
+    exps: tuple of exponents, indexed like _base_index
+    scale: 1 unit = scale base units, a sympy number
+    factors: tuple of (pint unit, exponent) pairs, only for printing
+
+    """
+
+    __slots__ = ["exps", "scale", "factors", "_pint"]
+
+    def __init__(self, exps, scale, factors):
+        self.exps = _trim(exps)
+        self.scale = scale
+        self.factors = factors
+        self._pint = None
+
+    @classmethod
+    @functools.lru_cache(maxsize=1024)
+    def from_pint(cls, units):
+        """Build from a pint unit.
+
+        Raises dimensions.Unsupported for offset units like °C, those
+        must be handled by pint.
+
+        """
+        scale, exponents = dimensions.base_form(units)
+        exps = [0] * len(_base_index)
+        for name, exp in exponents.items():
+            pos = _position(name)
+            if pos >= len(exps):
+                exps.extend([0] * (pos + 1 - len(exps)))
+            exps[pos] = exp
+        vec = cls(exps, scale, ((units, 1),))
+        vec._pint = units
+        return vec
+
+    @property
+    def pint(self):
+        """The pint unit, for printing."""
+        if self._pint is None:
+            self._pint = functools.reduce(
+                operator.mul,
+                (unit ** float(exp) if exp != 1 else unit
+                 for unit, exp in self.factors if exp != 0),
+                ureg.dimensionless
+            )
+        return self._pint
+
+    @property
+    def is_dimensionless(self):
+        """No units at all, angles like deg are still units here."""
+        return not self.exps
+
+    def base_exponents(self):
+        """Dict mapping base unit names to exponents."""
+        names = {pos: name for name, pos in _base_index.items()}
+        return {names[pos]: exp for pos, exp in enumerate(self.exps)
+                if exp != 0}
+
+    def dimensions(self):
+        """exps without the base units that pint treats as
+        dimensionless (radian, steradian, ...).
+
+        """
+        return _trim(0 if _is_dimensionless(pos) else exp
+                     for pos, exp in enumerate(self.exps))
+
+    @property
+    def has_dimensions(self):
+        return bool(self.dimensions())
+
+    def same_dimensions(self, other):
+        return (self.exps == other.exps
+                or self.dimensions() == other.dimensions())
+
+    def _combine(self, other, sign):
+        exps = tuple(a + sign * b
+                     for a, b in itertools.zip_longest(self.exps, other.exps,
+                                                       fillvalue=0))
+        factors = dict(self.factors)
+        for unit, exp in other.factors:
+            factors[unit] = factors.get(unit, 0) + sign * exp
+        return exps, tuple(factors.items())
+
+    def __mul__(self, other):
+        exps, factors = self._combine(other, 1)
+        return self.__class__(exps, self.scale * other.scale, factors)
+
+    def __truediv__(self, other):
+        exps, factors = self._combine(other, -1)
+        return self.__class__(exps, self.scale / other.scale, factors)
+
+    def __pow__(self, exp):
+        return self.__class__(tuple(e * exp for e in self.exps),
+                              self.scale ** exp,
+                              tuple((unit, e * exp)
+                                    for unit, e in self.factors))
+
+    def __eq__(self, other):
+        return (isinstance(other, UnitVec)
+                and self.exps == other.exps and self.scale == other.scale)
+
+    def __hash__(self):
+        return hash((self.exps, self.scale))
+
+    def __repr__(self):
+        return "UnitVec({!r}, {!r}, {!s})".format(self.exps, self.scale,
+                                                  self.pint)
+
+
+DIMENSIONLESS = UnitVec((), sympy.Integer(1), ())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Micro-benchmark for unit-heavy expressions.
+
+Run from the top directory with
+
+  python3 -m tests.bench_units
+
+"""
+
+import timeit
+
+from psciclib.parseexpr import parse
+from psciclib.units import ureg, Q_
+from psciclib.unitbridge import Quantity
+
+
+EXPRESSIONS = [
+    "3 km/hour * 2 hour + 5 m",
+    "1 ft + 2 in + 3 cm + 4 mm to m",
+    "(2m)^3 / (4 cm * 1 mm)",
+    "9.81 m/s^2 * 75 kg * 10 m to kJ",
+]
+
+
+def bench_arithmetic(n=2000):
+    """Chains of Quantity operations without parsing."""
+    a = Quantity(Q_(3, ureg.km / ureg.hour))
+    b = Quantity(Q_(2, ureg.hour))
+    c = Quantity(Q_(5, ureg.meter))
+    def run():
+        x = a * b
+        for _ in range(10):
+            x = (x + c) * b / b
+        return x
+    return timeit.timeit(run, number=n) / n
+
+
+def bench_expressions(n=20):
+    """Parse and evaluate whole expressions."""
+    def run():
+        for s in EXPRESSIONS:
+            parse(s).evaluate()
+    return timeit.timeit(run, number=n) / n
+
+
+def main():
+    print("Quantity arithmetic: {:8.1f} µs/chain"
+          "".format(bench_arithmetic() * 1e6))
+    print("parse + evaluate:    {:8.1f} ms/{} expressions"
+          "".format(bench_expressions() * 1e3, len(EXPRESSIONS)))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,14 +14,49 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import unittest
+import unittest.mock
 import random
 import sys
 import math
+import tempfile
+import os
+import io
+import time
 
 import sympy
 
 from psciclib.parseexpr import parse
 from psciclib.units import ureg
+from psciclib import simplifier
+from psciclib import truthtest
+from psciclib import solver
+from psciclib import exprcache
+from psciclib import paths
+from psciclib import dimensions
+from psciclib import unitvec
+from psciclib import unitbridge
+from psciclib import bestunits
+from psciclib import bulkconvert
+from psciclib import unitarray
+from psciclib import linalg
+from psciclib import stats
+from psciclib import interval
+from psciclib import resulthints
+from psciclib import bignum
+from psciclib import logscale
+from psciclib import bitops
+from psciclib import operators
+from psciclib.result import Mode, NumeralSystem
+from psciclib.exceptions import DimensionMismatchError, VariableLengthRowsError
+
+
+# The tests must not fill the real cache, TestExprCache uses a
+# temporary one.
+def setUpModule():
+    exprcache.ENABLED = False
+
+def tearDownModule():
+    exprcache.ENABLED = True
 
 
 # Helpers.
@@ -563,6 +598,117 @@ class TestUnits(TestCase):
                                (1*ureg.cm - 1*ureg.inch).to(ureg.meter))
 
 
+    def test_bulk_conversion(self):
+        self.assertEqual(list(bulkconvert.convert_array([1, 2.5], "km", "m")),
+                         [1000, 2500])
+        # pint's offsets are not exact, its factors and offsets are
+        # used as they are.
+        for x, y in zip(bulkconvert.convert_array([0, 100], "degC", "degF"),
+                        [32, 212]):
+            self.assertFloatEqual(x, y, rtol=1e-14)
+        factor, offset = bulkconvert.conversion("K", "degF")
+        self.assertFloatEqual(factor, 1.8, rtol=1e-15)
+        self.assertEqual(offset, -459.67)
+        lines = ["t,T", "1,0", "2,-273.15"]
+        self.assertEqual(list(bulkconvert.convert_lines(lines, "degC", "K",
+                                                        column=1)),
+                         ["t,T", "1,273.15", "2,0.0"])
+        with self.assertRaises(DimensionMismatchError):
+            bulkconvert.conversion("m", "s")
+
+    def test_unit_matrix(self):
+        def ev(s):
+            return parse(s).cmd.evaluate()
+        M = ev("[1.0m, 2.0cm; 3.0m, 4.0m]")
+        self.assertIsInstance(M, unitarray.UnitArray)
+        self.assertEqual(M.array.tolist(), [[1, 0.02], [3, 4]])
+        self.assertEqual((M * ev("[1.0s; 1.0s]")).array.tolist(),
+                         [[1.02], [7]])
+        self.assertEqual((M + M).convert_to("cm").array.tolist(),
+                         [[200, 4], [600, 800]])
+        with self.assertRaises(DimensionMismatchError):
+            M + ev("[1.0s, 1.0s; 1.0s, 1.0s]")
+        # Symbolic cells, exact cells and mixed units stay with sympy.
+        self.assertIsInstance(ev("[1.0m, x*1m]"), sympy.ImmutableMatrix)
+        self.assertIsInstance(ev("[1.0m, 1.0s]"), sympy.ImmutableMatrix)
+        M = ev("[1m, 1/3 m; 2^60 m, 1m]")
+        self.assertIsInstance(M, sympy.ImmutableMatrix)
+        self.assertEqual(M[1].magnitude, sympy.Rational(1, 3))
+        self.assertEqual(M[2].magnitude, 2**60)
+        # Results are sympy again.
+        M = parse("[1m, 2m] * 2").evaluate().raw_result
+        self.assertIsInstance(M, sympy.ImmutableMatrix)
+        self.assertFloatEqual(M[1].magnitude, 4)
+
+    def test_dimension_check(self):
+        with self.assertRaises(DimensionMismatchError) as cm:
+            pe("1 + (3m + 2s)")
+        self.assertEqual(str(cm.exception.where), "((3 · m) + (2 · s))")
+        with self.assertRaises(DimensionMismatchError):
+            pe("1km to s")
+        with self.assertRaises(DimensionMismatchError):
+            pe("2^(1m)")
+        # Dimensionless subtrees are evaluated without units.
+        self.assertEqual(pe("12 km/m"), 12000)
+        self.assertEqual(pe("1in / 1cm"), 2.54)
+
+    def test_angles(self):
+        # Radians are dimensionless, like in pint.
+        self.assertFloatEqual(pe("sin(30 deg)"), 0.5)
+        self.assertFloatEqual(pe("cos(pi rad)"), -1)
+        self.assertFloatEqual(pe("atan(1) to deg").magnitude, 45)
+        self.assertFloatEqual(pe("1 rpm to Hz").magnitude,
+                              2 * math.pi / 60)
+        self.assertFloatEqual(pe("1 deg + 1"), 1 + math.pi / 180)
+        self.assertFloatEqual(pe("1 deg * 1 m to m").magnitude,
+                              math.pi / 180)
+        # But they are kept as units.
+        q = pe("30 deg + 1 rad")
+        self.assertEqual(q.units, ureg.deg)
+        self.assertFloatEqual(q.magnitude, 30 + 180 / math.pi)
+        self.assertEqual(pe("2 sr").units, ureg.sr)
+        with self.assertRaises(DimensionMismatchError):
+            pe("1 m + 1 rad")
+
+    def test_exact_units(self):
+        # Units are combined exactly, without going through floats.
+        speed = unitbridge.Quantity(ureg.Quantity(3, ureg.km / ureg.hour))
+        time = unitbridge.Quantity(ureg.Quantity(2, ureg.hour))
+        self.assertIs((speed * time).convert_to("m").magnitude,
+                      sympy.Integer(6000))
+        self.assertFloatEqual(pe("1ft / 1in"), 12)
+        a = unitvec.UnitVec.from_pint(ureg.km)
+        b = unitvec.UnitVec.from_pint(ureg.hour)
+        self.assertTrue((a / b * b).same_dimensions(a))
+        self.assertEqual((a / b * b).scale, 1000)
+        self.assertTrue((a / a).is_dimensionless)
+        # Offset units are still handled by pint.
+        self.assertFloatEqual(pe("1degC to K").magnitude, 274.15)
+        self.assertEqual(pe("2 / (1 degC)").units, 1 / ureg.degC)
+        x = sympy.Symbol("x")
+        self.assertEqual(parse("x = 1 degC").evaluate().raw_result.x, x)
+        with self.assertRaises(dimensions.Unsupported):
+            dimensions.base_form(ureg.degC ** -1)
+
+    def test_best_units(self):
+        def best(s):
+            q = bestunits.to_best(parse(s).evaluate().raw_result)
+            return q.magnitude, q.units
+        m, u = best("75 kg * 9.81 m/s^2 * 10 m")
+        self.assertFloatEqual(m, 7.3575)
+        self.assertEqual(u, ureg.kJ)
+        self.assertEqual(best("5000 g"), (5, ureg.kg))
+        self.assertEqual(best("1 ft"), (sympy.Rational("304.8"), ureg.mm))
+        self.assertEqual(best("2 m * 3 m"), (6, ureg.m**2))
+        self.assertEqual(best("50000 m^2"), (50000, ureg.m**2))
+        self.assertEqual(best("5000000 m^2"), (5, ureg.km**2))
+        # Nothing nice available, use base units.
+        self.assertEqual(best("3 m*kg*A")[1], ureg.Unit("m*kg*A"))
+        # Derived units and prefixes are combined.
+        self.assertEqual(best("5 J/s"), (5, ureg.W))
+        self.assertEqual(best("3000000 W"), (3, ureg.MW))
+
+
 class TestFunctions(TestCase):
     def test_trig(self):
         a = rand(-1e6, 1e6)
@@ -595,6 +741,146 @@ class TestFunctions(TestCase):
             pe("ceil(2cm)")
         self.assertEqual(pe("abs(-2in)"), 2*ureg.inch)
 
+    def test_linear_algebra(self):
+        def ev(s):
+            return parse(s).evaluate().raw_result
+        # Small rational matrices stay exact.
+        self.assertEqual(ev("det([1, 2; 3, 4])"), -2)
+        self.assertEqual(ev("inv([2, 0; 0, 4])"),
+                         sympy.ImmutableMatrix([[sympy.Rational(1, 2), 0],
+                                                [0, sympy.Rational(1, 4)]]))
+        self.assertEqual(ev("solve([2, 0; 0, 4], [2; 4])"),
+                         sympy.ImmutableMatrix([1, 1]))
+        self.assertEqual(ev("eig([2, 1; 1, 2])"), sympy.ImmutableMatrix([1, 3]))
+        self.assertEqual(ev("svd([3, 0; 0, 4])"), sympy.ImmutableMatrix([4, 3]))
+        self.assertEqual(ev("rank([1, 2; 2, 4])"), 1)
+        self.assertEqual(ev("det([x, 1; 1, x])"), sympy.Symbol("x")**2 - 1)
+        # Floats and units.
+        self.assertFloatEqual(ev("det([1.5, 2; 3, 5])"), 1.5)
+        self.assertFloatEqual(ev("rank([1.0, 2; 2, 4])"), 1)
+        d = ev("det([1m, 2m; 3m, 4m])")
+        self.assertFloatEqual(d.magnitude, -2)
+        self.assertEqual(d.units, ureg.m**2)
+        x = ev("solve([2m, 0m; 0m, 4m], [2N; 4N])")
+        self.assertFloatEqual(x[0].magnitude, 1)
+        self.assertEqual(x[0].units, ureg.N / ureg.m)
+        with self.assertRaises(ValueError):
+            ev("inv([1.0, 2; 2, 4])")
+        with self.assertRaises(ValueError):
+            ev("det([1, 2, 3])")
+        # Big float matrices go to NumPy.
+        A = sympy.ImmutableMatrix(20, 20, lambda i, j: sympy.Float(
+            1.0 / (i + j + 1) + (1 if i == j else 0)))
+        ref = sympy.Matrix(A).det(method="lu")
+        self.assertFloatEqual(linalg.det(A), ref)
+        self.assertIsInstance(linalg.inv(A), unitarray.UnitArray)
+
+    def test_packed_matrix(self):
+        rows = ["{}, {}".format(i, -0.5 * i) for i in range(100)]
+        tree = parse("[" + "; ".join(rows) + "] * 2")
+        self.assertEqual(str(tree), "([100×2 matrix] · 2)")
+        M = tree.evaluate().raw_result
+        self.assertEqual(M.shape, (100, 2))
+        self.assertFloatEqual(M[99, 1], -99)
+        with self.assertRaises(VariableLengthRowsError):
+            parse("[" + "; ".join(rows) + "; 1]")
+        # Small literals are still exact, up to the size linalg
+        # handles exactly.
+        self.assertEqual(str(parse("[1, 2; 3, 4]")), "[1, 2; 3, 4]")
+        small = "[" + "; ".join(", ".join(["1"] * 10)
+                                for _ in range(10)) + "]"
+        self.assertNotIn("matrix", str(parse(small)))
+        # So are integers a float would round.
+        rows[0] = "9007199254740993, 0"
+        tree = parse("[" + "; ".join(rows) + "]")
+        self.assertNotIn("matrix", str(tree))
+        self.assertEqual(tree.evaluate().raw_result[0, 0], 2**53 + 1)
+        rows[0] = "9007199254740992, 0"
+        tree = parse("[" + "; ".join(rows) + "]")
+        self.assertEqual(str(tree), "[100×2 matrix]")
+
+    @unittest.skipIf(unitarray.numpy is None, "needs NumPy")
+    def test_load(self):
+        numpy = unitarray.numpy
+        with tempfile.TemporaryDirectory() as tmp:
+            npy = os.path.join(tmp, "m.npy")
+            numpy.save(npy, numpy.arange(4.0).reshape(2, 2))
+            csv = os.path.join(tmp, "v.csv")
+            with open(csv, "w") as f:
+                f.write("x\n1\n2\n3\n")
+            self.assertFloatEqual(pe('det(load("{}"))'.format(npy)), -2)
+            v = parse('load("{}") * 1m'.format(csv)).evaluate().raw_result
+            self.assertEqual(v.shape, (3, 1))
+            self.assertFloatEqual(v[2].magnitude, 3)
+            with self.assertRaises(ValueError):
+                pe('load("{}")'.format(os.path.join(tmp, "nothing.npy")))
+        with self.assertRaises(ValueError):
+            pe('sin("x")')
+
+    def test_statistics(self):
+        def ev(s):
+            return parse(s).evaluate().raw_result
+        # Exact data gives exact results.
+        self.assertEqual(ev("sum([1, 2, 3])"), 6)
+        self.assertEqual(ev("mean([1, 2; 3, 4])"), sympy.Rational(5, 2))
+        self.assertEqual(ev("median([3, 1, 2, 4])"), sympy.Rational(5, 2))
+        self.assertEqual(ev("var([1, 2, 3, 4])"), sympy.Rational(5, 3))
+        self.assertEqual(ev("min([3, 1, 2])"), 1)
+        self.assertEqual(ev("percentile([1, 2, 3, 4, 5], 25)"), 2)
+        self.assertEqual(ev("linreg([1, 2, 3], [3, 5, 7])"),
+                         sympy.ImmutableMatrix([2, 1]))
+        self.assertEqual(ev("sum([1, x])"), sympy.Symbol("x") + 1)
+        # Units.
+        q = ev("max([3m, 1km])")
+        self.assertFloatEqual(q.magnitude, 1000)
+        self.assertEqual(q.units, ureg.m)
+        self.assertEqual(ev("var([1m, 2m, 3m])").units, ureg.m**2)
+        fit = ev("linreg([1s, 2s, 3s], [2m, 4m, 6m])")
+        self.assertFloatEqual(fit[0].magnitude, 2)
+        self.assertEqual(fit[0].units, ureg.m / ureg.s)
+        with self.assertRaises(ValueError):
+            ev("sum([1m, 2s])")
+        # Big data goes to NumPy.
+        v = unitarray.UnitArray(unitarray.numpy.arange(2001.0).reshape(-1, 1),
+                                unitvec.DIMENSIONLESS)
+        self.assertFloatEqual(stats.median(v), 1000)
+        self.assertFloatEqual(stats.std(v), 577.78327)
+
+    def test_uncertainty(self):
+        def ev(s):
+            return parse(s).evaluate().raw_result
+        # Linear propagation is exact for exact input.
+        r = ev("(3 ± 1)^2")
+        self.assertEqual((r.mean, r.std), (9, 6))
+        # The same value twice is correlated, two values are not.
+        r = ev("(3 ± 1) - (3 ± 1)")
+        self.assertEqual(r.std, sympy.sqrt(2))
+        q = ev("9.81 ± 0.02 m/s^2 * 2 s")
+        self.assertFloatEqual(q.magnitude.mean, 19.62)
+        self.assertFloatEqual(q.magnitude.std, 0.04)
+        self.assertEqual(q.units, ureg.m / ureg.s)
+        # CODATA uncertainties.
+        q = ev("2 G± kg")
+        self.assertFloatEqual(q.magnitude.std, 6.2e-15)
+        self.assertFloatEqual(ev("G").magnitude, 6.67408e-11)
+        # Monte-Carlo agrees with the linear result for small errors.
+        r = ev("mc(sin(1 ± 0.01))")
+        self.assertLess(abs(r.mean - sympy.sin(1)), 1e-3)
+        self.assertLess(abs(r.std - 0.01 * sympy.cos(1)), 1e-4)
+        self.assertEqual(r, ev("montecarlo(sin(1 ± 0.01))"))
+        # The result of mc() is an uncertain value again.
+        r = ev("mc(1 ± 0.1) * 2")
+        self.assertLess(abs(r.mean - 2), 0.02)
+        self.assertLess(abs(r.std - 0.2), 0.02)
+        r = ev("mc(1 ± 0.1) + (1 ± 0.1)")
+        self.assertIsInstance(r.mean, sympy.Float)
+        self.assertLess(abs(r.std - math.sqrt(0.02)), 0.02)
+        # Derived constants have their CODATA uncertainty too.
+        self.assertFloatEqual(ev("α±").std, 1.7e-12)
+        self.assertFloatEqual(ev("faraday±").magnitude.std, 0.00059)
+        with self.assertRaises(ValueError):
+            ev("mc(x * (1 ± 0.1))")
+
 
 class TestEquality(TestCase):
     def test_identities(self):
@@ -606,6 +892,152 @@ class TestEquality(TestCase):
         self.assertFloatEqual(solutions[0], -4)
         self.assertFloatEqual(solutions[1], 1)
 
+    def test_polynomial(self):
+        solutions = pe("x^7 - 3x + 1 = 0").solutions
+        self.assertEqual(len(solutions), 7)
+        for sol in solutions:
+            sol = complex(sol)
+            self.assertFloatEqual(abs(sol**7 - 3*sol + 1), 0)
+        # Exact factors stay exact.
+        solutions = pe("x^5 = x").solutions
+        self.assertEqual(len(solutions), 5)
+        self.assertIn(sympy.Integer(0), solutions)
+        # Exact polynomials of high degree keep their closed forms.
+        x = sympy.Symbol("x")
+        res = parse("x^6 = 2").evaluate()
+        self.assertFalse(res.is_numerical)
+        self.assertIn(2**sympy.Rational(1, 6), res.raw_result.solutions)
+        res = parse("x^7 = 1").evaluate()
+        self.assertIn(sympy.cos(2 * sympy.pi / 7)
+                      + sympy.I * sympy.sin(2 * sympy.pi / 7),
+                      res.raw_result.solutions)
+        # Float coefficients are solved numerically, in their
+        # precision.
+        res = parse("x^5 - 1.5x + 0.3 = 0").evaluate()
+        self.assertTrue(res.is_numerical)
+        self.assertEqual(len(res.raw_result.solutions), 5)
+        poly = sympy.Poly(x**5 - sympy.Float(1.5) * x + sympy.Float(0.3))
+        for sol in solver.polyroots(poly):
+            self.assertLessEqual(sol.as_real_imag()[0]._prec, 60)
+        # Roots without closed form stay RootOf, but are printed from
+        # numerical roots of the whole polynomial.
+        res = parse("x^12 - 3x^5 + x - 7 = 0").evaluate()
+        rootofs = res.raw_result.solutions
+        self.assertTrue(all(isinstance(sol, sympy.CRootOf)
+                            for sol in rootofs))
+        values = solver.rootof_values(rootofs, 30)
+        self.assertEqual(len(set(values.values())), 12)
+        for sol in rootofs:
+            v = values[sol]
+            self.assertLess(abs((v**12 - 3*v**5 + v - 7).evalf(30)), 1e-25)
+            self.assertEqual(v.is_real, sol.is_real)
+        self.assertIn("1.2533351", res.as_html(Mode.to_float))
+        self.assertIn("1.2533351", res.as_html(Mode.try_exact))
+
+    def test_nsolve_interval(self):
+        res = parse("sin(x) = exp(x)").evaluate()
+        self.assertTrue(res.is_unsolved)
+        solutions = res.nsolve_interval(-10, 0).raw_result.solutions
+        self.assertEqual(len(solutions), 3)
+        for sol in solutions:
+            self.assertFloatEqual(math.sin(sol), math.exp(sol))
+        self.assertEqual(res.nsolve_interval(-10, 0, processes=1)
+                         .raw_result.solutions,
+                         solutions)
+
+    def test_fork_server(self):
+        # The GUI must not fork itself.
+        with unittest.mock.patch.object(solver, "START_METHOD", None):
+            solver.use_fork_server()
+            self.assertIn(solver.mp_context().get_start_method(),
+                          ("forkserver", "spawn"))
+            res = parse("sin(x) = exp(x)").evaluate((-10, 0))
+            if res.upgrade is not None:
+                self.assertIsNone(res.upgrade.result())
+            self.assertEqual(len(res.raw_result.solutions), 3)
+            x = sympy.Symbol("x")
+            self.assertEqual(
+                solver.nsolve_interval(sympy.Eq(sympy.sin(x), sympy.exp(x)),
+                                       -10, 0, processes=2),
+                list(res.raw_result.solutions)
+            )
+        self.assertEqual(solver.mp_context().get_start_method(), "fork")
+
+    def test_race_solve(self):
+        # sympy can't do this one, only the numerical solver finds the
+        # solutions in the given interval.
+        res = parse("sin(x) = exp(x)").evaluate((-10, 0))
+        self.assertTrue(res.is_numerical)
+        if res.upgrade is not None:
+            # Whether sympy gave up before the numerical solver was
+            # started or not, there is no exact solution.
+            self.assertIsNone(res.upgrade.result())
+        self.assertEqual(len(res.raw_result.solutions), 3)
+        res = parse("sin(x) = exp(x)").evaluate((-5, 0))
+        self.assertEqual(len(res.raw_result.solutions), 1)
+        # But sympy can do this one, right away or as an upgrade.
+        res = parse("x*exp(x) = 1").evaluate((-10, 10))
+        if res.is_numerical:
+            res = res.upgrade.result()
+        self.assertFalse(res.is_numerical)
+        self.assertEqual(res.raw_result.solutions, (sympy.LambertW(1),))
+
+    def test_race_solve_upgrade(self):
+        def slow(eq, x):
+            time.sleep(1)
+            return sympy.solve(eq, x)
+        with unittest.mock.patch.object(solver, "_symbolic", slow):
+            # The numerical solution is returned right away...
+            tic = time.monotonic()
+            res = parse("x*exp(x) = 1").evaluate((-10, 10))
+            self.assertLess(time.monotonic() - tic, 1)
+            self.assertTrue(res.is_numerical)
+            self.assertFloatEqual(res.raw_result.solutions[0],
+                                  0.56714329040978)
+            # ... and replaced by the exact one later.
+            upgraded = res.upgrade.result()
+            self.assertFalse(upgraded.is_numerical)
+            self.assertEqual(upgraded.raw_result.solutions,
+                             (sympy.LambertW(1),))
+            # Unless sympy runs out of time.
+            x = sympy.Symbol("x")
+            solutions, is_numerical, upgrade = solver.race_solve(
+                sympy.Eq(x * sympy.exp(x), 1), x, (-10, 10), budget=0.5
+            )
+            self.assertTrue(is_numerical)
+            self.assertEqual(upgrade.result(), [])
+
+    def test_system(self):
+        res = pe("x + y = 3; x - y = 1")
+        self.assertEqual(res.solutions, ((2, 1),))
+        # Independent subsystems.
+        x, y, z = sympy.symbols("x y z")
+        parts = solver.split_system([sympy.Eq(x + y, 3),
+                                     sympy.Eq(z**2, 4),
+                                     sympy.Eq(x - y, 1)],
+                                    [x, y, z])
+        self.assertEqual([p[1] for p in parts], [[x, y], [z]])
+        res = pe("x + y = 3; z^2 = 4; x - y = 1")
+        self.assertEqual(res.x, (x, y, z))
+        self.assertEqual(sorted(res.solutions), [(2, 1, -2), (2, 1, 2)])
+        # Numerical solution.
+        res = parse("x^2 + y^2 = 4; exp(x) + sin(y) = y").evaluate()
+        self.assertTrue(res.is_numerical)
+        for a, b in res.raw_result.solutions:
+            self.assertFloatEqual(a**2 + b**2, 4)
+            self.assertFloatEqual(sympy.exp(a) + sympy.sin(b), b)
+
+    def test_cheap_truth(self):
+        self.assertEqual(pe("sqrt(2)^2 = 2.0000001"), False)
+        self.assertEqual(pe("pi = 355/113"), False)
+        self.assertEqual(pe("e^pi = pi^e"), False)
+        self.assertEqual(pe("(x+1)^2 = x^2 + 2x + 1"), True)
+        self.assertEqual(pe("(x+1)^2 = x^2 + 2x"), False)
+        x = sympy.Symbol("x")
+        self.assertEqual(truthtest.decide(x**2, 4), truthtest.Truth.equation)
+        self.assertEqual(truthtest.decide(sympy.sin(x), x),
+                         truthtest.Truth.unknown)
+
     def test_with_units(self):
         self.assertEqual(pe("1cm = 1cm"), True)
         self.assertEqual(pe("100cm = 1m"), True)
@@ -622,5 +1054,359 @@ class TestEquality(TestCase):
         self.assertEqual(pe("2.54cm = 1in"), True)
 
     def test_solve_with_units(self):
-        # Does not work ATM
-        pass
+        solutions = pe("x + 1m = 3m").solutions
+        self.assertEqual(len(solutions), 1)
+        self.assertEqual(solutions[0].units, ureg.meter)
+        self.assertFloatEqual(solutions[0].magnitude, 2)
+        solutions = pe("x * 2s = 1km").solutions
+        self.assertEqual(solutions[0].units, ureg.meter / ureg.second)
+        self.assertFloatEqual(solutions[0].magnitude, 500)
+        solutions = sorted(pe("x^2 = 4m^2").solutions,
+                           key=lambda sol: sol.magnitude)
+        self.assertFloatEqual(solutions[0].magnitude, -2)
+        self.assertFloatEqual(solutions[1].magnitude, 2)
+        # Units cancel.
+        self.assertEqual(pe("x * 2m = 4m").solutions, (2,))
+        # Inconsistent units.
+        x = sympy.Symbol("x")
+        with self.assertRaises(DimensionMismatchError):
+            dimensions.nondimensionalize([
+                (x + parse("1m").evaluate().raw_result,
+                 parse("1s").evaluate().raw_result)
+            ])
+
+
+class TestSimplifier(TestCase):
+    def test_cheap_forms(self):
+        x = sympy.Symbol("x")
+        self.assertEqual(simplifier.simplify(sympy.sin(x)**2
+                                             + sympy.cos(x)**2),
+                         (1, True))
+        self.assertEqual(simplifier.simplify((x**2 - 1)/(x - 1)),
+                         (x + 1, True))
+        self.assertEqual(simplifier.simplify(sympy.Integer(3)), (3, True))
+        # Nothing is lost in tiny corrections.
+        expr = sympy.sqrt(2) + sympy.Rational(1, 10**30)
+        self.assertEqual(simplifier.simplify(expr), (expr, True))
+
+    def test_budget(self):
+        x = sympy.Symbol("x")
+        expr = sympy.sin(x)**2 + sympy.cos(x)**2 + sympy.exp(x)*x
+        simplified, complete = simplifier.simplify(expr, max_ops=1)
+        self.assertFalse(complete)
+        self.assertLessEqual(sympy.count_ops(simplified),
+                             sympy.count_ops(expr))
+        res = parse("sin(x)^2 + cos(x)^2 + x").evaluate()
+        self.assertFalse(res.simplify_incomplete)
+        # The full simplify() is stopped when the time is up.
+        def slow(self, *args, **kwargs):
+            time.sleep(10)
+        expr = sympy.exp(x) * x + sympy.sqrt(x)
+        with unittest.mock.patch.object(sympy.Basic, "simplify", slow):
+            tic = time.monotonic()
+            self.assertEqual(simplifier.simplify(expr, timeout=0.5),
+                             (expr, False))
+            self.assertLess(time.monotonic() - tic, 5)
+        # Units survive the trip to the worker process.
+        q = parse("x * 2 m + x * 3 m").evaluate().raw_result
+        simplified, complete = simplifier.simplify(q * sympy.exp(x))
+        self.assertTrue(complete)
+        self.assertTrue(simplified.has(unitbridge.Quantity))
+
+
+class TestPrecision(TestCase):
+    def test_certify(self):
+        enclosure = interval.certify(sympy.pi, 20)
+        self.assertTrue(enclosure.certified)
+        self.assertEqual(str(enclosure.value.evalf(20)),
+                         "3.1415926535897932385")
+        # Zero that sympy doesn't recognize, can't be certified.
+        expr = sympy.cos(1)**2 + sympy.sin(1)**2 - 1
+        self.assertFalse(interval.certify(expr, 8).certified)
+        self.assertIsNone(interval.certify(sympy.Symbol("x"), 8))
+
+    def test_unstable_hint(self):
+        res = parse("exp(1) m").evaluate()
+        self.assertEqual(res.as_html(digits=6), "2.71828 m")
+        self.assertFalse(res.precision_unstable)
+        res = parse("cos(1)^2 + sin(1)^2 - 1").evaluate()
+        res.as_html()
+        self.assertTrue(res.precision_unstable)
+        # Only for the last output.
+        res.as_html(Mode.try_exact)
+        self.assertFalse(res.precision_unstable)
+        self.assertIn(resulthints._precision_hint,
+                      resulthints.get_hints(res.raw_result, 8, False,
+                                            precision_unstable=True))
+
+    def test_huge_integers(self):
+        n = 3**10000
+        s = bignum.to_decimal(n)
+        self.assertEqual(len(s), 4772)
+        self.assertEqual(bignum.digit_count(n), 4772)
+        self.assertEqual(bignum.digit_count(10**5000), 5001)
+        self.assertEqual(bignum.digit_count(10**5000 - 1), 5000)
+        self.assertEqual(bignum.abbreviate(-n),
+                         "-{}…{} (4772 digits)".format(s[:20], s[-20:]))
+        self.assertEqual(bignum.abbreviate(12345), "12345")
+        res = parse("2^20000").evaluate()
+        self.assertTrue(res.has_abbreviated_digits)
+        self.assertTrue(res.as_html().endswith("09376 (6021 digits)"))
+        f = io.StringIO()
+        res.write_digits(f)
+        self.assertEqual(f.getvalue(), bignum.to_decimal(2**20000))
+        self.assertFalse(parse("2^200").evaluate().has_abbreviated_digits)
+
+    def test_other_bases(self):
+        self.assertEqual(bignum.fraction_digits(1, 3, 2, 8), (0, "01010101"))
+        # Rounding carries into the integer part.
+        self.assertEqual(bignum.fraction_digits(2**40 - 1, 2**40, 16, 8),
+                         (1, ""))
+        n = 3**100000
+        self.assertEqual(bignum.abbreviate(n, base=16),
+                         "{}…{} ({} digits)".format(
+                             format(n, "x")[:20], format(n, "x")[-20:],
+                             len(format(n, "x"))))
+        def as_base(expr, system):
+            return parse(expr).evaluate().as_string(numeral_system=system,
+                                                    digits=8)
+        self.assertEqual(as_base("-255", NumeralSystem.hexadecimal),
+                         "= -0xff")
+        self.assertEqual(as_base("10.75", NumeralSystem.binary),
+                         "= 0b1010.11")
+        self.assertEqual(as_base("0.999999999999", NumeralSystem.hexadecimal),
+                         "= 0x1")
+        # Huge floats are not converted to an integer first.
+        self.assertEqual(bignum.abbreviate_shifted(3, 100000, base=2),
+                         bignum.abbreviate(3 << 100000, base=2))
+        self.assertEqual(as_base("2.0^(2^1000)", NumeralSystem.hexadecimal),
+                         "= 0x1{}…{} ({} digits)".format(
+                             "0" * 19, "0" * 20, 2**1000 // 4 + 1))
+        self.assertTrue(as_base("-10.0^(10^12)", NumeralSystem.octal)
+                        .startswith("= -0o"))
+        self.assertEqual(as_base("2.0^(-2^1000)", NumeralSystem.binary),
+                         "= 0b0")
+        # Fractions in exact mode.
+        def as_html(expr, system):
+            return parse(expr).evaluate().as_html(Mode.try_exact,
+                                                  numeral_system=system)
+        self.assertEqual(as_html("3/7", NumeralSystem.hexadecimal),
+                         "<sup>0x3</sup>&frasl;<sub>0x7</sub>")
+        self.assertEqual(as_html("1/1000", NumeralSystem.binary),
+                         "<sup>0b1</sup>&frasl;<sub>0b1111101000</sub>")
+        self.assertEqual(as_html("10^-20", NumeralSystem.octal),
+                         "<sup>0o1</sup>&frasl;<sub>{}</sub>"
+                         "".format(oct(10**20)))
+
+    def test_logscale(self):
+        res = parse("9^9^9").evaluate()
+        self.assertIsInstance(res.raw_result, logscale.LogScale)
+        self.assertAlmostEqual(float(res.raw_result.log10),
+                               9**9 * math.log10(9), delta=1e-3)
+        self.assertTrue(res.as_html().startswith("≈ 10<sup>3.69693"))
+        # (10!)! has about 22 million digits.
+        res = parse("10!!").evaluate().raw_result
+        self.assertIsInstance(res, logscale.LogScale)
+        self.assertAlmostEqual(float(res.log10),
+                               math.lgamma(3628801) / math.log(10),
+                               delta=1e-3)
+        self.assertIsInstance(parse("2^10^7").evaluate().raw_result,
+                              logscale.LogScale)
+        # Small enough to be exact.
+        self.assertEqual(parse("2^1000").evaluate().raw_result, 2**1000)
+        self.assertEqual(parse("2^10^6 - 2^10^6").evaluate().raw_result, 0)
+        self.assertEqual(
+            parse("10^(10^5+1)/10^(10^5)").evaluate().raw_result, 10
+        )
+        self.assertEqual(parse("1000!").evaluate().raw_result,
+                         math.factorial(1000))
+        self.assertLess(parse("1/9^9^9").evaluate().raw_result.log10, 0)
+        self.assertEqual(parse("-(9^9^9)").evaluate().raw_result.sign, -1)
+        with self.assertRaises(ValueError):
+            parse("9^9^9^9^9").evaluate()
+
+    def test_logscale_arithmetic(self):
+        def log10(s):
+            res = parse(s).evaluate().raw_result
+            self.assertIsInstance(res, logscale.LogScale)
+            return float(res.log10)
+        big = 9**9 * math.log10(9)
+        self.assertAlmostEqual(log10("9^9^9 * 2"), big + math.log10(2),
+                               delta=1e-3)
+        self.assertAlmostEqual(log10("9^9^9 / 1000"), big - 3, delta=1e-3)
+        self.assertAlmostEqual(log10("9^9^9 + 9^9^9"), big + math.log10(2),
+                               delta=1e-3)
+        self.assertAlmostEqual(log10("9^9^9 * 9^9^9"), 2 * big, delta=1e-3)
+        self.assertAlmostEqual(log10("3 * 9^9^9 - 9^9^9"),
+                               big + math.log10(2), delta=1e-3)
+        # Back to normal numbers.
+        self.assertFloatEqual(parse("9^9^9 / 9^9^9").evaluate().raw_result,
+                              1)
+        self.assertFloatEqual(parse("log10(9^9^9)").evaluate().raw_result,
+                              big)
+        self.assertFloatEqual(parse("ln(9^9^9)").evaluate().raw_result,
+                              big * math.log(10))
+        # Only the orders of magnitude are known.
+        with self.assertRaises(ValueError):
+            parse("9^9^9 - 9^9^9").evaluate()
+
+    def test_logscale_printing(self):
+        for s in ("9^9^9 * 2", "log(9^9^9)", "[9^9^9, 1]", "(-9)^(9^9)",
+                  "9^9^9 * x"):
+            res = parse(s).evaluate()
+            for mode in Mode:
+                self.assertNotIn("LogScale", res.as_html(mode))
+                self.assertNotIn("LogScale", res.as_string(mode))
+        res = parse("(-9)^(9^9)").evaluate()
+        for mode in Mode:
+            self.assertTrue(res.as_html(mode).startswith("≈ −10<sup>"))
+            self.assertTrue(res.as_string(mode).startswith("≈ -10^("))
+
+    def test_float_factorial(self):
+        self.assertFloatEqual(parse("170.5!").evaluate().raw_result,
+                              sympy.gamma(sympy.Rational(343, 2)).evalf(30))
+        self.assertFloatEqual(parse("3.5!!").evaluate().raw_result,
+                              sympy.factorial(sympy.gamma(4.5)))
+        self.assertEqual(parse("(-2.0)!").evaluate().raw_result, sympy.zoo)
+        # The exponent alone would not fit into memory.
+        res = parse("1e100000!").evaluate().raw_result
+        self.assertIsInstance(res, logscale.LogScale)
+        self.assertFloatEqual(res.log10 / sympy.Float("1e100005"),
+                              0.99999566)
+        # Exact input stays exact.
+        self.assertEqual(parse("20!").evaluate().raw_result,
+                         math.factorial(20))
+
+
+class TestBitOperations(TestCase):
+
+    def test_operators(self):
+        self.assertEqual(pe("0xff & 0x0f"), 0x0f)
+        self.assertEqual(pe("0xf0 | 0x0f"), 0xff)
+        self.assertEqual(pe("0xff xor 0x0f"), 0xf0)
+        self.assertEqual(pe("5 and 3 or 8"), 9)
+        self.assertEqual(pe("~0"), -1)
+        self.assertEqual(pe("not 0b101"), -6)
+        self.assertEqual(pe("1 << 10"), 1024)
+        self.assertEqual(pe("-1024 >> 3"), -128)
+        # Lower precedence than arithmetic, like in Python.
+        self.assertEqual(pe("1 + 2 << 3"), 24)
+        self.assertEqual(pe("1 | 2 xor 3 & 1"), 1 | 2 ^ 3 & 1)
+        with self.assertRaises(ValueError):
+            pe("1.5 & 1")
+        with self.assertRaises(DimensionMismatchError):
+            pe("2m & 1")
+
+    def test_word_width(self):
+        self.assertEqual(pe("unsigned(~0, 8)"), 255)
+        self.assertEqual(pe("signed(0xff, 8)"), -1)
+        self.assertEqual(pe("sint(0x7f, 8)"), 127)
+        self.assertEqual(pe("unsigned(-1)"), 2**64 - 1)
+        self.assertEqual(pe("rol(0x81, 1, 8)"), 3)
+        self.assertEqual(pe("ror(1, 1, 8)"), 0x80)
+        self.assertEqual(bitops.rotate_left(1, 65), 2)
+        with self.assertRaises(ValueError):
+            bitops.shift_left(1, -1)
+        # Results too large to compute are refused.
+        with self.assertRaises(ValueError):
+            pe("1 << 10^12")
+        with self.assertRaises(ValueError):
+            pe("unsigned(-1, 10^12)")
+        self.assertEqual(pe("0 << 10^12"), 0)
+
+    def test_integer_fast_path(self):
+        # Only int_value() is used, evaluate() is not.
+        with unittest.mock.patch.object(operators._BitOperation, "evaluate",
+                                        side_effect=AssertionError):
+            res = parse("(0xdeadbeef << 7 xor 0x1234567) >> 3").evaluate()
+        self.assertIsInstance(res.raw_result, sympy.Integer)
+        self.assertEqual(res.raw_result, (0xdeadbeef << 7 ^ 0x1234567) >> 3)
+        # Falls back to sympy where the result is not an integer.
+        self.assertEqual(parse("2^-1 + 3").evaluate().raw_result,
+                         sympy.Rational(7, 2))
+        self.assertEqual(pe("7 // 0"), sympy.zoo)
+        self.assertIsInstance(pe("9^9^9"), logscale.LogScale)
+        self.assertEqual(pe("(2 + 3)! // 7"), 17)
+
+
+class TestExprCache(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.old = (paths.CACHE_DIR, paths.SHARED_CACHE_DIR,
+                    exprcache.MAX_BYTES, exprcache.ENABLED)
+        paths.CACHE_DIR = os.path.join(self.tmpdir.name, "user")
+        paths.SHARED_CACHE_DIR = os.path.join(self.tmpdir.name, "shared")
+        os.mkdir(paths.CACHE_DIR)
+        exprcache.close()
+        exprcache.ENABLED = True
+
+    def tearDown(self):
+        exprcache.close()
+        (paths.CACHE_DIR, paths.SHARED_CACHE_DIR,
+         exprcache.MAX_BYTES, exprcache.ENABLED) = self.old
+        self.tmpdir.cleanup()
+
+    def test_shared(self):
+        x = sympy.Symbol("x")
+        # The shared cache is only used if it is set up explicitly.
+        paths.SHARED_CACHE_DIR = None
+        exprcache.put("simplify", x, x + 0)
+        self.assertTrue(os.path.exists(os.path.join(paths.CACHE_DIR,
+                                                    exprcache.FILENAME)))
+        exprcache.close()
+        # Set up, but not there.
+        paths.SHARED_CACHE_DIR = os.path.join(self.tmpdir.name, "shared")
+        self.assertEqual(exprcache.get("simplify", x + 0), x)
+        exprcache.close()
+        os.mkdir(paths.SHARED_CACHE_DIR)
+        self.assertIsNone(exprcache.get("simplify", x + 0))
+        exprcache.put("simplify", x, x + 0)
+        self.assertTrue(os.path.exists(os.path.join(paths.SHARED_CACHE_DIR,
+                                                    exprcache.FILENAME)))
+
+    def test_no_eval(self):
+        x = sympy.Symbol("x", positive=True)
+        for expr in (sympy.sqrt(2) * x - sympy.Float("1.5"),
+                     sympy.Function("f")(x), -sympy.oo,
+                     sympy.Matrix([[1, x]]).as_immutable(),
+                     [(sympy.Integer(2), -sympy.I / 3)]):
+            self.assertEqual(exprcache._load(exprcache._dump(expr)), expr)
+        exprcache.put("simplify", x, x)
+        conn = exprcache._connect()
+        for value in ("Add('__import__(\"os\").remove(\"foo\")')",
+                      "Integer({})".format(10**1200),
+                      "Float('1.5', precision=1000000000)",
+                      "factorial(Integer(1000000))"):
+            with conn:
+                conn.execute("UPDATE cache SET value = ?", (value,))
+            self.assertIsNone(exprcache.get("simplify", x))
+        # Not evaluated, no huge integer is computed.
+        with conn:
+            conn.execute("UPDATE cache SET value = ?",
+                         ("Pow(Integer(9), Integer(999999999))",))
+        self.assertIsInstance(exprcache.get("simplify", x), sympy.Pow)
+        # Results that can't be rebuilt are not stored.
+        y = sympy.Symbol("y")
+        exprcache.put("simplify", sympy.factorial(y), y)
+        self.assertIsNone(exprcache.get("simplify", y))
+
+    def test_roundtrip(self):
+        x = sympy.Symbol("x")
+        eq = sympy.Eq(x**2, 2)
+        self.assertIsNone(exprcache.get("solve", eq, x))
+        exprcache.put("solve", [-sympy.sqrt(2), sympy.sqrt(2)], eq, x)
+        self.assertEqual(exprcache.get("solve", eq, x),
+                         [-sympy.sqrt(2), sympy.sqrt(2)])
+        self.assertIsNone(exprcache.get("simplify", eq))
+        # Units are not cached.
+        q = parse("2m").evaluate().raw_result
+        exprcache.put("simplify", q, q)
+        self.assertIsNone(exprcache.get("simplify", q))
+
+    def test_eviction(self):
+        x = sympy.Symbol("x")
+        exprcache.MAX_BYTES = 1000
+        for i in range(100):
+            exprcache.put("simplify", x + i, x + i)
+        self.assertIsNone(exprcache.get("simplify", x))
+        self.assertEqual(exprcache.get("simplify", x + 99), x + 99)
@@ -0,0 +1,106 @@
+# Copyright (C) 2016  Tobias Brink
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+# No display needed.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+try:
+    from PyQt5 import QtCore, QtWidgets
+except ImportError:
+    QtWidgets = None
+
+from psciclib.parseexpr import parse
+from psciclib.result import Mode, NumeralSystem, UnitMode
+from psciclib import exprcache, bignum
+
+
+# The tests must not fill the real cache.
+def setUpModule():
+    exprcache.ENABLED = False
+
+def tearDownModule():
+    exprcache.ENABLED = True
+
+
+@unittest.skipIf(QtWidgets is None, "PyQt5 is not installed")
+class TestOutputWidget(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = (QtWidgets.QApplication.instance()
+                   or QtWidgets.QApplication([]))
+
+    def test_digits_buttons(self):
+        from psciclib.gui.widgets.outputwidget import OutputWidget
+        widget = OutputWidget()
+        args = (Mode.try_exact, NumeralSystem.decimal, 15, UnitMode.none)
+        widget.update_output(parse("2^20000").evaluate(), *args)
+        self.assertFalse(widget.digits_buttons.isHidden())
+        widget.update_output(parse("2^20").evaluate(), *args)
+        self.assertTrue(widget.digits_buttons.isHidden())
+        widget.update_output(None, *args)
+        self.assertIsNone(widget.result)
+
+    def test_digits_writer(self):
+        import io
+        import tempfile
+        from psciclib.gui.widgets.outputwidget import DigitsWriter
+        res = parse("2^20000").evaluate()
+        buf = io.StringIO()
+        writer = DigitsWriter(res, buf)
+        percents = []
+        writer.progress.connect(percents.append,
+                                type=QtCore.Qt.DirectConnection)
+        writer.start()
+        self.assertTrue(writer.wait(10000))
+        self.assertEqual(buf.getvalue(), bignum.to_decimal(2**20000))
+        self.assertFalse(writer.cancelled)
+        self.assertEqual(percents[-1], 100)
+        # A cancelled file is removed again.
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "digits.txt")
+            writer = DigitsWriter(res, path)
+            writer.cancel()
+            writer.run()
+            self.assertTrue(writer.cancelled)
+            self.assertFalse(os.path.exists(path))
+
+
+@unittest.skipIf(QtWidgets is None, "PyQt5 is not installed")
+class TestOutputCtrls(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = (QtWidgets.QApplication.instance()
+                   or QtWidgets.QApplication([]))
+
+    def test_interval(self):
+        from psciclib.gui.widgets.outputctrls import OutputCtrls
+        ctrls = OutputCtrls()
+        self.assertEqual(ctrls.interval, (-10, 10))
+        intervals = []
+        ctrls.interval_changed.connect(lambda *i: intervals.append(i))
+        lower, upper = ctrls.interval_choosers
+        lower.setValue(-5)
+        upper.setValue(-7.5)
+        self.assertEqual(intervals, [(-5, 10), (-7.5, -5)])
+
+
+
+if __name__ == "__main__":
+    unittest.main()